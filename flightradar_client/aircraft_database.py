@@ -0,0 +1,208 @@
+"""
+Aircraft database.
+
+Looks up registration, type and operator of aircrafts by their 24-bit ICAO
+address in a compiled, memory-mapped database file. The file contains fixed
+width records sorted by address, so that lookups are binary searches and
+several processes share the same pages of the file.
+"""
+import csv
+import functools
+import logging
+import mmap
+import struct
+from typing import Optional
+
+from .exceptions import FlightradarException
+
+_LOGGER = logging.getLogger(__name__)
+
+MAGIC = b"FRAD"
+VERSION = 1
+HEADER = struct.Struct(">4sHI")
+ADDRESS_SIZE = 3
+REGISTRATION_SIZE = 12
+TYPE_SIZE = 8
+OPERATOR_SIZE = 40
+RECORD = struct.Struct(
+    ">{}s{}s{}s{}s".format(ADDRESS_SIZE, REGISTRATION_SIZE, TYPE_SIZE, OPERATOR_SIZE)
+)
+
+DEFAULT_CACHE_SIZE = 1024
+
+DEFAULT_ICAO24_COLUMN = "icao24"
+DEFAULT_REGISTRATION_COLUMN = "registration"
+DEFAULT_TYPE_COLUMN = "typecode"
+DEFAULT_OPERATOR_COLUMN = "operator"
+
+
+def _address(mode_s: str) -> Optional[bytes]:
+    """Convert the hex representation of an ICAO address into bytes."""
+    try:
+        value = int(mode_s, 16)
+    except (TypeError, ValueError):
+        return None
+    if not 0 <= value <= 0xFFFFFF:
+        return None
+    return value.to_bytes(ADDRESS_SIZE, "big")
+
+
+def _encode(value: Optional[str], size: int) -> bytes:
+    """Encode a text field, truncated to the field size."""
+    encoded = (value or "").strip().encode("utf-8")[:size]
+    # Do not leave a partial multi-byte character behind.
+    return encoded.decode("utf-8", "ignore").encode("utf-8")
+
+
+def _decode(value: bytes) -> Optional[str]:
+    """Decode a zero padded text field."""
+    return value.rstrip(b"\x00").decode("utf-8") or None
+
+
+class AircraftInfo:
+    """Details of a single aircraft."""
+
+    __slots__ = ("_registration", "_aircraft_type", "_operator")
+
+    def __init__(
+        self,
+        registration: Optional[str],
+        aircraft_type: Optional[str],
+        operator: Optional[str],
+    ) -> None:
+        """Initialise aircraft info."""
+        self._registration = registration
+        self._aircraft_type = aircraft_type
+        self._operator = operator
+
+    def __repr__(self) -> str:
+        """Return string representation of this aircraft info."""
+        return "<{}(registration={}, type={})>".format(
+            self.__class__.__name__, self._registration, self._aircraft_type
+        )
+
+    @property
+    def registration(self) -> Optional[str]:
+        """Return the registration."""
+        return self._registration
+
+    @property
+    def aircraft_type(self) -> Optional[str]:
+        """Return the ICAO aircraft type designator."""
+        return self._aircraft_type
+
+    @property
+    def operator(self) -> Optional[str]:
+        """Return the operator."""
+        return self._operator
+
+
+def compile_database(
+    csv_path: str,
+    output_path: str,
+    icao24_column: str = DEFAULT_ICAO24_COLUMN,
+    registration_column: str = DEFAULT_REGISTRATION_COLUMN,
+    type_column: str = DEFAULT_TYPE_COLUMN,
+    operator_column: str = DEFAULT_OPERATOR_COLUMN,
+) -> int:
+    """Compile a CSV aircraft database into a database file.
+
+    Rows with invalid addresses are skipped, the last row wins for duplicate
+    addresses. Returns the number of records written.
+    """
+    records = {}
+    with open(csv_path, newline="", encoding="utf-8") as fptr:
+        for row in csv.DictReader(fptr):
+            address = _address(row.get(icao24_column))
+            if address is None:
+                continue
+            records[address] = RECORD.pack(
+                address,
+                _encode(row.get(registration_column), REGISTRATION_SIZE),
+                _encode(row.get(type_column), TYPE_SIZE),
+                _encode(row.get(operator_column), OPERATOR_SIZE),
+            )
+    with open(output_path, "wb") as fptr:
+        fptr.write(HEADER.pack(MAGIC, VERSION, len(records)))
+        for address in sorted(records):
+            fptr.write(records[address])
+    _LOGGER.debug("Compiled %s records into %s", len(records), output_path)
+    return len(records)
+
+
+class AircraftDatabase:
+    """Memory-mapped aircraft database with a small LRU cache in front."""
+
+    def __init__(self, path: str, cache_size: int = DEFAULT_CACHE_SIZE) -> None:
+        """Open the compiled database file."""
+        self._path = path
+        with open(path, "rb") as fptr:
+            try:
+                self._mmap = mmap.mmap(fptr.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as error:
+                raise FlightradarException(
+                    "Invalid aircraft database {}".format(path)
+                ) from error
+        if len(self._mmap) < HEADER.size:
+            self._mmap.close()
+            raise FlightradarException("Invalid aircraft database {}".format(path))
+        magic, version, self._count = HEADER.unpack_from(self._mmap, 0)
+        if (
+            magic != MAGIC
+            or version != VERSION
+            or len(self._mmap) != HEADER.size + self._count * RECORD.size
+        ):
+            self._mmap.close()
+            raise FlightradarException("Invalid aircraft database {}".format(path))
+        self._cached_lookup = functools.lru_cache(maxsize=cache_size)(self._lookup)
+
+    def __repr__(self) -> str:
+        """Return string representation of this database."""
+        return "<{}(path={}, records={})>".format(
+            self.__class__.__name__, self._path, self._count
+        )
+
+    def __len__(self) -> int:
+        """Return the number of records."""
+        return self._count
+
+    def __enter__(self) -> "AircraftDatabase":
+        """Use database as context manager."""
+        return self
+
+    def __exit__(self, *args) -> None:
+        """Close database when leaving context."""
+        self.close()
+
+    def close(self) -> None:
+        """Close the memory-mapped file."""
+        self._cached_lookup.cache_clear()
+        self._mmap.close()
+
+    def lookup(self, mode_s: str) -> Optional[AircraftInfo]:
+        """Return the details of the aircraft with the provided ICAO address."""
+        return self._cached_lookup(mode_s)
+
+    def _lookup(self, mode_s: str) -> Optional[AircraftInfo]:
+        """Find the aircraft with the provided ICAO address."""
+        address = _address(mode_s)
+        if address is None:
+            return None
+        low = 0
+        high = self._count
+        while low < high:
+            middle = (low + high) // 2
+            offset = HEADER.size + middle * RECORD.size
+            key = self._mmap[offset : offset + ADDRESS_SIZE]
+            if key < address:
+                low = middle + 1
+            elif key > address:
+                high = middle
+            else:
+                _, registration, aircraft_type, operator = RECORD.unpack_from(
+                    self._mmap, offset
+                )
+                return AircraftInfo(
+                    _decode(registration), _decode(aircraft_type), _decode(operator)
+                )
+        return None
@@ -0,0 +1,115 @@
+"""
+Closest approach prediction.
+
+Predicts for each aircraft how close it will pass home and when, assuming
+it keeps its current speed and track. Distances are computed on a plane
+tangent at home, which is accurate enough within receiver range.
+"""
+import logging
+import math
+from typing import Dict, Optional, Tuple
+
+from .consts import INVALID_COORDINATES
+from .feed_entry import FeedEntry
+from .proximity import KM_PER_DEGREE, KNOTS_TO_KM_PER_SECOND
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Approach:
+    """Predicted closest approach of an aircraft to home."""
+
+    __slots__ = ("distance", "seconds")
+
+    def __init__(self, distance: float, seconds: float) -> None:
+        """Initialise approach."""
+        # Distance in km at the closest approach.
+        self.distance = distance
+        # Seconds until the closest approach, 0 if moving away.
+        self.seconds = seconds
+
+    def __repr__(self) -> str:
+        """Return string representation of this approach."""
+        return "<{}(distance={:.2f}, seconds={:.0f})>".format(
+            self.__class__.__name__, self.distance, self.seconds
+        )
+
+    def __eq__(self, other) -> bool:
+        """Check whether both approaches are the same."""
+        return isinstance(other, Approach) and (self.distance, self.seconds) == (
+            other.distance,
+            other.seconds,
+        )
+
+
+def predict_approach(
+    home_coordinates: Tuple[float, float],
+    coordinates: Optional[Tuple[float, float]],
+    speed: Optional[float],
+    track: Optional[float],
+    home_scale: float = None,
+) -> Optional[Approach]:
+    """Predict the closest approach to home.
+
+    Not available without valid coordinates, speed and track. The km per
+    degree of longitude at home can be passed in when predicting many.
+    """
+    if (
+        home_coordinates is None
+        or coordinates is None
+        or None in coordinates
+        or coordinates == INVALID_COORDINATES
+        or speed is None
+        or track is None
+    ):
+        return None
+    if home_scale is None:
+        home_scale = KM_PER_DEGREE * math.cos(math.radians(home_coordinates[0]))
+    north = (coordinates[0] - home_coordinates[0]) * KM_PER_DEGREE
+    east = (coordinates[1] - home_coordinates[1]) * home_scale
+    speed = speed * KNOTS_TO_KM_PER_SECOND
+    if speed <= 0:
+        return Approach(math.hypot(north, east), 0.0)
+    track = math.radians(track)
+    velocity_east = speed * math.sin(track)
+    velocity_north = speed * math.cos(track)
+    seconds = -(east * velocity_east + north * velocity_north) / (speed * speed)
+    if seconds <= 0:
+        return Approach(math.hypot(north, east), 0.0)
+    return Approach(
+        math.hypot(north + velocity_north * seconds, east + velocity_east * seconds),
+        seconds,
+    )
+
+
+def closest_approach(entry: FeedEntry) -> Optional[Approach]:
+    """Predict the closest approach of a feed entry to its home."""
+    return predict_approach(
+        entry.home_coordinates, entry.coordinates, entry.speed, entry.track
+    )
+
+
+def closest_approaches(
+    feed_entries: Optional[Dict[str, FeedEntry]]
+) -> Dict[str, Approach]:
+    """Predict the closest approaches of all feed entries in one pass.
+
+    Entries without a prediction are left out.
+    """
+    result = {}
+    scales = {}
+    for external_id, entry in (feed_entries or {}).items():
+        home_coordinates = entry.home_coordinates
+        if home_coordinates is None:
+            continue
+        # All entries of a feed usually share the home coordinates.
+        home_scale = scales.get(home_coordinates)
+        if home_scale is None:
+            home_scale = KM_PER_DEGREE * math.cos(math.radians(home_coordinates[0]))
+            scales[home_coordinates] = home_scale
+        approach = predict_approach(
+            home_coordinates, entry.coordinates, entry.speed, entry.track, home_scale
+        )
+        if approach is not None:
+            result[external_id] = approach
+    return result
@@ -0,0 +1,395 @@
+"""
+Offline batch processor.
+
+Replays recorded Dump1090 or Flightradar JSON snapshots, or SBS-1 messages,
+through the feed aggregator and writes one track file per aircraft.
+"""
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import csv
+import json
+import logging
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .consts import DEFAULT_HOME_COORDINATES, UPDATE_OK
+from .dump1090_aircrafts import parse_aircrafts
+from .exceptions import FlightradarException
+from .feed_aggregator import FeedAggregator
+from .feed_entry import FeedEntry
+from .fr24feed_flights import parse_flights
+from .metrics import FeedMetrics, MetricsRegistry
+from .sbs1 import DEFAULT_SNAPSHOT_INTERVAL, SBS1Parser
+
+_LOGGER = logging.getLogger(__name__)
+
+FORMAT_DUMP1090 = "dump1090"
+FORMAT_FR24FEED = "fr24feed"
+FORMAT_SBS1 = "sbs1"
+FORMATS = (FORMAT_DUMP1090, FORMAT_FR24FEED, FORMAT_SBS1)
+
+JSON_LINES_SUFFIXES = (".jsonl", ".ndjson")
+
+DEFAULT_MAX_OPEN_FILES = 64
+
+TRACK_COLUMNS = [
+    "updated",
+    "latitude",
+    "longitude",
+    "altitude",
+    "track",
+    "speed",
+    "vert_rate",
+    "squawk",
+    "callsign",
+]
+
+
+class RecordedFeed:
+    """Feed replaying recorded snapshots instead of fetching them."""
+
+    def __init__(self, home_coordinates: Tuple[float, float]) -> None:
+        """Initialise feed."""
+        self._home_coordinates = home_coordinates
+        self._snapshot = None
+        self._metrics = FeedMetrics("recorded", MetricsRegistry())
+
+    def __repr__(self) -> str:
+        """Return string representation of this feed."""
+        return "<{}(home={})>".format(self.__class__.__name__, self._home_coordinates)
+
+    @property
+    def metrics(self) -> FeedMetrics:
+        """Return the metrics of this feed."""
+        return self._metrics
+
+    def load(self, snapshot: List[Dict]) -> None:
+        """Provide the snapshot returned by the next update."""
+        self._snapshot = snapshot
+
+    async def update(self) -> Tuple[str, Optional[Dict[str, FeedEntry]]]:
+        """Return the entries of the loaded snapshot."""
+        snapshot, self._snapshot = self._snapshot, None
+        if snapshot:
+            self._metrics.aircrafts_parsed.inc(len(snapshot))
+            return UPDATE_OK, {
+                entry.external_id: entry
+                for entry in (
+                    FeedEntry(self._home_coordinates, data) for data in snapshot
+                )
+            }
+        return UPDATE_OK, None
+
+
+class RecordedFeedAggregator(FeedAggregator):
+    """Aggregates recorded snapshots replayed one after the other."""
+
+    def __init__(
+        self,
+        home_coordinates: Tuple[float, float] = DEFAULT_HOME_COORDINATES,
+        filter_radius: float = None,
+    ) -> None:
+        """Initialise feed aggregator."""
+        super().__init__(filter_radius)
+        self._feed = RecordedFeed(home_coordinates)
+
+    @property
+    def feed(self) -> RecordedFeed:
+        """Return the recorded feed."""
+        return self._feed
+
+    async def replay(
+        self, snapshot: List[Dict]
+    ) -> Tuple[str, Optional[Dict[str, FeedEntry]]]:
+        """Aggregate the provided snapshot and return filtered entries."""
+        self._feed.load(snapshot)
+        return await self.update()
+
+
+class TrackWriter:
+    """Writes track points to one CSV file per aircraft.
+
+    Files left behind by a previous run are replaced. Only a limited number
+    of files is kept open at any time, the least recently used file is
+    closed when another one needs to be opened, and appended to when
+    opened again.
+    """
+
+    def __init__(
+        self, directory: str, max_open_files: int = DEFAULT_MAX_OPEN_FILES
+    ) -> None:
+        """Initialise track writer."""
+        self._directory = directory
+        self._max_open_files = max_open_files
+        self._files = collections.OrderedDict()
+        self._written = set()
+        os.makedirs(directory, exist_ok=True)
+
+    def __repr__(self) -> str:
+        """Return string representation of this track writer."""
+        return "<{}(directory={})>".format(self.__class__.__name__, self._directory)
+
+    def write(self, entry: FeedEntry) -> None:
+        """Append the current position of the provided entry to its track."""
+        writer = self._writer(entry.external_id)
+        updated = entry.updated
+        writer.writerow(
+            [
+                updated.isoformat() if updated else "",
+                entry.coordinates[0],
+                entry.coordinates[1],
+                entry.altitude,
+                entry.track,
+                entry.speed,
+                entry.vert_rate,
+                entry.squawk,
+                entry.callsign,
+            ]
+        )
+
+    def close(self) -> None:
+        """Close all open files."""
+        while self._files:
+            _, (fptr, _) = self._files.popitem(False)
+            fptr.close()
+
+    def _writer(self, external_id: str):
+        """Return the CSV writer for the provided aircraft."""
+        if external_id in self._files:
+            self._files.move_to_end(external_id)
+            return self._files[external_id][1]
+        if len(self._files) >= self._max_open_files:
+            _, (fptr, _) = self._files.popitem(False)
+            fptr.close()
+        path = os.path.join(self._directory, "{}.csv".format(external_id))
+        new_file = external_id not in self._written
+        fptr = open(path, "w" if new_file else "a", newline="", encoding="utf-8")
+        writer = csv.writer(fptr)
+        if new_file:
+            self._written.add(external_id)
+            writer.writerow(TRACK_COLUMNS)
+        self._files[external_id] = (fptr, writer)
+        return writer
+
+
+def read_snapshots(
+    path: str, data_format: str, interval: float = DEFAULT_SNAPSHOT_INTERVAL
+) -> Iterator[List[Dict]]:
+    """Read the recorded snapshots one after the other from the provided file.
+
+    JSON files contain a single snapshot, JSON lines files (``.jsonl`` or
+    ``.ndjson``) contain one snapshot per line.
+    """
+    with open(path, encoding="utf-8") as fptr:
+        if data_format == FORMAT_SBS1:
+            yield from SBS1Parser(interval).parse(fptr)
+            return
+        parse = parse_aircrafts if data_format == FORMAT_DUMP1090 else parse_flights
+        if path.endswith(JSON_LINES_SUFFIXES):
+            for line in fptr:
+                if line.strip():
+                    yield parse(json.loads(line))
+        else:
+            yield parse(json.load(fptr))
+
+
+def process_file(
+    path: str,
+    data_format: str,
+    output: str,
+    home_coordinates: Tuple[float, float] = DEFAULT_HOME_COORDINATES,
+    filter_radius: float = None,
+    interval: float = DEFAULT_SNAPSHOT_INTERVAL,
+    name: str = None,
+) -> Dict:
+    """Write the tracks of all aircrafts in the provided file.
+
+    Tracks are stored in a sub-directory of the output directory named after
+    the input file, or the provided name. Returns a summary of the processed
+    data.
+    """
+    directory = os.path.join(
+        output, name or os.path.splitext(os.path.basename(path))[0]
+    )
+    return asyncio.run(
+        _process_file(
+            path, data_format, directory, home_coordinates, filter_radius, interval
+        )
+    )
+
+
+async def _process_file(
+    path: str,
+    data_format: str,
+    directory: str,
+    home_coordinates: Tuple[float, float],
+    filter_radius: Optional[float],
+    interval: float,
+) -> Dict:
+    """Replay all snapshots of the provided file."""
+    aggregator = RecordedFeedAggregator(home_coordinates, filter_radius)
+    writer = TrackWriter(directory)
+    snapshots = 0
+    points = 0
+    aircrafts = set()
+    try:
+        for snapshot in read_snapshots(path, data_format, interval):
+            snapshots += 1
+            _, entries = await aggregator.replay(snapshot)
+            if entries:
+                for entry in entries.values():
+                    writer.write(entry)
+                    aircrafts.add(entry.external_id)
+                points += len(entries)
+    finally:
+        writer.close()
+    _LOGGER.debug("Processed %s snapshots from %s", snapshots, path)
+    return {
+        "path": path,
+        "snapshots": snapshots,
+        "points": points,
+        "aircrafts": len(aircrafts),
+    }
+
+
+def process_files(
+    paths: List[str],
+    data_format: str,
+    output: str,
+    home_coordinates: Tuple[float, float] = DEFAULT_HOME_COORDINATES,
+    filter_radius: float = None,
+    interval: float = DEFAULT_SNAPSHOT_INTERVAL,
+    workers: int = None,
+) -> List[Dict]:
+    """Process the provided files in parallel and return their summaries.
+
+    Tracks are stored in sub-directories named after the paths of the
+    files relative to the directory containing all of them.
+    """
+    names = _output_names(paths)
+    if workers == 1:
+        return [
+            process_file(
+                path,
+                data_format,
+                output,
+                home_coordinates,
+                filter_radius,
+                interval,
+                name,
+            )
+            for path, name in zip(paths, names)
+        ]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                process_file,
+                path,
+                data_format,
+                output,
+                home_coordinates,
+                filter_radius,
+                interval,
+                name,
+            )
+            for path, name in zip(paths, names)
+        ]
+        return [future.result() for future in futures]
+
+
+def _output_names(paths: List[str]) -> List[str]:
+    """Return the names of the track directories of the provided files."""
+    if not paths:
+        return []
+    absolute_paths = [os.path.abspath(path) for path in paths]
+    base = os.path.commonpath([os.path.dirname(path) for path in absolute_paths])
+    names = [
+        os.path.splitext(os.path.relpath(path, base))[0] for path in absolute_paths
+    ]
+    seen = {}
+    for path, name in zip(paths, names):
+        if name in seen:
+            raise FlightradarException(
+                "Tracks of {} and {} would be written to {}".format(
+                    seen[name], path, name
+                )
+            )
+        seen[name] = path
+    return names
+
+
+def _expand_paths(paths: List[str]) -> List[str]:
+    """Replace directories by the files they contain."""
+    result = []
+    for path in paths:
+        if os.path.isdir(path):
+            result.extend(
+                sorted(
+                    os.path.join(path, name)
+                    for name in os.listdir(path)
+                    if os.path.isfile(os.path.join(path, name))
+                )
+            )
+        else:
+            result.append(path)
+    return result
+
+
+def main(argv: List[str] = None) -> int:
+    """Run the batch processor from the command line."""
+    parser = argparse.ArgumentParser(
+        prog="flightradar-batch",
+        description="Convert recorded receiver output into per-aircraft tracks.",
+    )
+    parser.add_argument("inputs", nargs="+", help="recorded files or directories")
+    parser.add_argument(
+        "-f", "--format", required=True, choices=FORMATS, help="recorded data format"
+    )
+    parser.add_argument(
+        "-o", "--output", required=True, help="directory to write tracks to"
+    )
+    parser.add_argument(
+        "--home",
+        nargs=2,
+        type=float,
+        metavar=("LATITUDE", "LONGITUDE"),
+        default=DEFAULT_HOME_COORDINATES,
+        help="home coordinates used for distance filtering",
+    )
+    parser.add_argument(
+        "--radius", type=float, help="only include aircrafts within this radius (km)"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=DEFAULT_SNAPSHOT_INTERVAL,
+        help="snapshot interval in seconds for SBS-1 messages",
+    )
+    parser.add_argument("-j", "--workers", type=int, help="number of worker processes")
+    args = parser.parse_args(argv)
+    if args.radius and args.home == DEFAULT_HOME_COORDINATES:
+        parser.error("--radius requires --home")
+    try:
+        summaries = process_files(
+            _expand_paths(args.inputs),
+            args.format,
+            args.output,
+            tuple(args.home),
+            args.radius,
+            args.interval,
+            args.workers,
+        )
+    except FlightradarException as error:
+        parser.error(str(error))
+    for summary in summaries:
+        print(
+            "{path}: {snapshots} snapshots, {points} points, "
+            "{aircrafts} aircrafts".format(**summary)
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,291 @@
+"""
+Broadcast server.
+
+Re-serves the current feed entries to many clients over WebSocket or
+Server-Sent Events. After each update only the differences to the previous
+update are serialised, once, and the same message is pushed to all
+subscribers. Newly connected clients first receive a keyframe containing all
+aircrafts.
+"""
+import asyncio
+import json
+import logging
+from typing import Dict, Optional
+
+from aiohttp import WSMsgType, web
+
+from .feed_entry import FeedEntry
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 9192
+DEFAULT_WEBSOCKET_PATH = "/ws"
+DEFAULT_EVENTS_PATH = "/events"
+DEFAULT_QUEUE_SIZE = 100
+
+EVENT_DELTA = "delta"
+EVENT_KEYFRAME = "keyframe"
+
+
+def entry_fields(entry: FeedEntry) -> Dict:
+    """Return the fields of an entry sent to clients."""
+    coordinates = entry.coordinates or (None, None)
+    updated = entry.updated
+    return {
+        "latitude": coordinates[0],
+        "longitude": coordinates[1],
+        "altitude": entry.altitude,
+        "callsign": entry.callsign,
+        "speed": entry.speed,
+        "track": entry.track,
+        "squawk": entry.squawk,
+        "vert_rate": entry.vert_rate,
+        "updated": updated.timestamp() if updated else None,
+    }
+
+
+def compute_delta(previous: Dict[str, Dict], current: Dict[str, Dict]) -> Dict:
+    """Return added and removed aircrafts and the changed fields of others.
+
+    Returns an empty dict if nothing has changed.
+    """
+    added = {}
+    changed = {}
+    for external_id, fields in current.items():
+        previous_fields = previous.get(external_id)
+        if previous_fields is None:
+            added[external_id] = fields
+        elif previous_fields != fields:
+            changed[external_id] = {
+                key: value
+                for key, value in fields.items()
+                if previous_fields.get(key) != value
+            }
+    removed = [external_id for external_id in previous if external_id not in current]
+    delta = {}
+    if added:
+        delta["added"] = added
+    if changed:
+        delta["changed"] = changed
+    if removed:
+        delta["removed"] = removed
+    return delta
+
+
+class BroadcastMessage:
+    """Message serialised once and sent to all subscribers."""
+
+    __slots__ = ("_event", "_data", "_event_stream")
+
+    def __init__(self, event: str, data: str) -> None:
+        """Initialise message."""
+        self._event = event
+        self._data = data
+        self._event_stream = None
+
+    def __repr__(self) -> str:
+        """Return string representation of this message."""
+        return "<{}(event={}, size={})>".format(
+            self.__class__.__name__, self._event, len(self._data)
+        )
+
+    @property
+    def event(self) -> str:
+        """Return the type of message."""
+        return self._event
+
+    @property
+    def data(self) -> str:
+        """Return the JSON serialised message."""
+        return self._data
+
+    @property
+    def event_stream(self) -> bytes:
+        """Return the message formatted as server-sent event."""
+        if self._event_stream is None:
+            self._event_stream = "event: {}\ndata: {}\n\n".format(
+                self._event, self._data
+            ).encode("utf-8")
+        return self._event_stream
+
+
+class _Subscriber:
+    """Queue of messages for a single client."""
+
+    def __init__(self, queue_size: int) -> None:
+        """Initialise subscriber."""
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def push(self, message: Optional[BroadcastMessage]) -> bool:
+        """Queue message, return False if the client is falling behind."""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def reset(self, message: Optional[BroadcastMessage]) -> None:
+        """Replace all queued messages."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+
+class BroadcastServer:
+    """Pushes feed entry deltas to WebSocket and Server-Sent Events clients.
+
+    Use the update method as listener of a feed manager. Clients that fall
+    more than the queue size behind have their queue replaced with a new
+    keyframe.
+    """
+
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        websocket_path: str = DEFAULT_WEBSOCKET_PATH,
+        events_path: str = DEFAULT_EVENTS_PATH,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ) -> None:
+        """Initialise broadcast server."""
+        self._host = host
+        self._port = port
+        self._websocket_path = websocket_path
+        self._events_path = events_path
+        self._queue_size = queue_size
+        self._state = {}
+        self._sequence = 0
+        self._keyframe = None
+        self._subscribers = set()
+        self._runner = None
+
+    def __repr__(self) -> str:
+        """Return string representation of this server."""
+        return "<{}(host={}, port={}, subscribers={})>".format(
+            self.__class__.__name__, self._host, self._port, len(self._subscribers)
+        )
+
+    @property
+    def sequence(self) -> int:
+        """Return the sequence number of the latest delta."""
+        return self._sequence
+
+    @property
+    def subscribers(self) -> int:
+        """Return the number of connected clients."""
+        return len(self._subscribers)
+
+    @property
+    def port(self) -> Optional[int]:
+        """Return the port the server is listening on."""
+        if self._runner and self._runner.addresses:
+            return self._runner.addresses[0][1]
+        return None
+
+    def application(self) -> web.Application:
+        """Return the web application serving the broadcasts."""
+        app = web.Application()
+        app.router.add_get(self._websocket_path, self._handle_websocket)
+        app.router.add_get(self._events_path, self._handle_events)
+        return app
+
+    async def start(self) -> None:
+        """Start serving on the configured host and port."""
+        self._runner = web.AppRunner(self.application())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self._host, self._port)
+        await site.start()
+        _LOGGER.debug("Broadcasting on %s:%s", self._host, self.port)
+
+    async def stop(self) -> None:
+        """Disconnect all clients and stop serving."""
+        for subscriber in self._subscribers:
+            subscriber.reset(None)
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def keyframe(self) -> BroadcastMessage:
+        """Return the message containing all current aircrafts."""
+        if self._keyframe is None:
+            self._keyframe = BroadcastMessage(
+                EVENT_KEYFRAME,
+                _dumps({"sequence": self._sequence, "aircraft": self._state}),
+            )
+        return self._keyframe
+
+    async def update(self, feed_entries: Optional[Dict[str, FeedEntry]]) -> None:
+        """Push the changes since the previous update to all clients."""
+        current = {
+            external_id: entry_fields(entry)
+            for external_id, entry in (feed_entries or {}).items()
+        }
+        delta = compute_delta(self._state, current)
+        self._state = current
+        if not delta:
+            return
+        self._sequence += 1
+        self._keyframe = None
+        delta["sequence"] = self._sequence
+        message = BroadcastMessage(EVENT_DELTA, _dumps(delta))
+        for subscriber in self._subscribers:
+            if not subscriber.push(message):
+                _LOGGER.debug("Subscriber falling behind, sending keyframe")
+                subscriber.reset(self.keyframe())
+
+    def _subscribe(self) -> _Subscriber:
+        """Register a new client, starting with a keyframe."""
+        subscriber = _Subscriber(self._queue_size)
+        subscriber.push(self.keyframe())
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    async def _handle_websocket(self, request: web.Request) -> web.WebSocketResponse:
+        """Send messages to a WebSocket client until it disconnects."""
+        websocket = web.WebSocketResponse()
+        await websocket.prepare(request)
+        subscriber = self._subscribe()
+
+        async def _send() -> None:
+            """Send queued messages."""
+            while True:
+                message = await subscriber.queue.get()
+                if message is None:
+                    await websocket.close()
+                    return
+                await websocket.send_str(message.data)
+
+        sender = asyncio.ensure_future(_send())
+        try:
+            async for message in websocket:
+                if message.type == WSMsgType.ERROR:
+                    break
+        finally:
+            self._subscribers.discard(subscriber)
+            sender.cancel()
+        return websocket
+
+    async def _handle_events(self, request: web.Request) -> web.StreamResponse:
+        """Send messages as server-sent events until the client disconnects."""
+        response = web.StreamResponse(
+            headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+        )
+        await response.prepare(request)
+        subscriber = self._subscribe()
+        try:
+            while True:
+                message = await subscriber.queue.get()
+                if message is None:
+                    break
+                await response.write(message.event_stream)
+        except ConnectionResetError:
+            _LOGGER.debug("Event stream client disconnected")
+        finally:
+            self._subscribers.discard(subscriber)
+        return response
+
+
+def _dumps(value: Dict) -> str:
+    """Serialise value as compact JSON."""
+    return json.dumps(value, separators=(",", ":"))
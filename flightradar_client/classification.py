@@ -0,0 +1,224 @@
+"""
+Aircraft classification.
+
+Determines the country of registration from the 24-bit ICAO address
+allocation blocks and the airline from the ICAO designator at the start of
+the callsign.
+"""
+import bisect
+import logging
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from .exceptions import FlightradarException
+
+_LOGGER = logging.getLogger(__name__)
+
+# ICAO address blocks allocated to states (ICAO Annex 10, Volume III) as
+# (first address, last address, ISO 3166-1 alpha-2 country code).
+DEFAULT_ADDRESS_BLOCKS = (
+    (0x008000, 0x00FFFF, "ZA"),
+    (0x010000, 0x017FFF, "EG"),
+    (0x06A000, 0x06A3FF, "QA"),
+    (0x0D0000, 0x0D7FFF, "MX"),
+    (0x100000, 0x1FFFFF, "RU"),
+    (0x300000, 0x33FFFF, "IT"),
+    (0x340000, 0x37FFFF, "ES"),
+    (0x380000, 0x3BFFFF, "FR"),
+    (0x3C0000, 0x3FFFFF, "DE"),
+    (0x400000, 0x43FFFF, "GB"),
+    (0x440000, 0x447FFF, "AT"),
+    (0x448000, 0x44FFFF, "BE"),
+    (0x458000, 0x45FFFF, "DK"),
+    (0x460000, 0x467FFF, "FI"),
+    (0x468000, 0x46FFFF, "GR"),
+    (0x470000, 0x477FFF, "HU"),
+    (0x478000, 0x47FFFF, "NO"),
+    (0x480000, 0x487FFF, "NL"),
+    (0x488000, 0x48FFFF, "PL"),
+    (0x490000, 0x497FFF, "PT"),
+    (0x498000, 0x49FFFF, "CZ"),
+    (0x4A8000, 0x4AFFFF, "SE"),
+    (0x4B0000, 0x4B7FFF, "CH"),
+    (0x4B8000, 0x4BFFFF, "TR"),
+    (0x4CA000, 0x4CAFFF, "IE"),
+    (0x508000, 0x50FFFF, "UA"),
+    (0x710000, 0x717FFF, "SA"),
+    (0x718000, 0x71FFFF, "KR"),
+    (0x738000, 0x73FFFF, "IL"),
+    (0x750000, 0x757FFF, "MY"),
+    (0x758000, 0x75FFFF, "PH"),
+    (0x768000, 0x76FFFF, "SG"),
+    (0x780000, 0x7BFFFF, "CN"),
+    (0x7C0000, 0x7FFFFF, "AU"),
+    (0x800000, 0x83FFFF, "IN"),
+    (0x840000, 0x87FFFF, "JP"),
+    (0x880000, 0x887FFF, "TH"),
+    (0x888000, 0x88FFFF, "VN"),
+    (0x896000, 0x896FFF, "AE"),
+    (0x899000, 0x8993FF, "TW"),
+    (0x8A0000, 0x8A7FFF, "ID"),
+    (0xA00000, 0xAFFFFF, "US"),
+    (0xC00000, 0xC3FFFF, "CA"),
+    (0xC80000, 0xC87FFF, "NZ"),
+    (0xE00000, 0xE3FFFF, "AR"),
+    (0xE40000, 0xE7FFFF, "BR"),
+    (0xE80000, 0xE80FFF, "CL"),
+)
+
+# ICAO airline designators and airline names.
+DEFAULT_AIRLINES = {
+    "AAL": "American Airlines",
+    "ACA": "Air Canada",
+    "AFR": "Air France",
+    "ANA": "All Nippon Airways",
+    "ANZ": "Air New Zealand",
+    "AXM": "AirAsia",
+    "BAW": "British Airways",
+    "CCA": "Air China",
+    "CES": "China Eastern Airlines",
+    "CPA": "Cathay Pacific",
+    "CSN": "China Southern Airlines",
+    "DAL": "Delta Air Lines",
+    "DLH": "Lufthansa",
+    "ETD": "Etihad Airways",
+    "EZY": "easyJet",
+    "FDX": "FedEx Express",
+    "FJI": "Fiji Airways",
+    "GIA": "Garuda Indonesia",
+    "JAL": "Japan Airlines",
+    "JST": "Jetstar Airways",
+    "KAL": "Korean Air",
+    "KLM": "KLM Royal Dutch Airlines",
+    "MAS": "Malaysia Airlines",
+    "NWK": "Network Aviation",
+    "QFA": "Qantas",
+    "QLK": "QantasLink",
+    "QTR": "Qatar Airways",
+    "RXA": "Regional Express",
+    "RYR": "Ryanair",
+    "SIA": "Singapore Airlines",
+    "SWA": "Southwest Airlines",
+    "TGW": "Scoot",
+    "THA": "Thai Airways",
+    "THY": "Turkish Airlines",
+    "UAE": "Emirates",
+    "UAL": "United Airlines",
+    "UPS": "UPS Airlines",
+    "UTY": "Alliance Airlines",
+    "VIR": "Virgin Atlantic",
+    "VOZ": "Virgin Australia",
+}
+
+
+class AddressBlockTable:
+    """Table of disjoint address blocks searchable by bisection."""
+
+    def __init__(self, blocks: Iterable[Tuple[int, int, str]]) -> None:
+        """Initialise address block table."""
+        blocks = sorted(blocks)
+        for previous, block in zip(blocks, blocks[1:]):
+            if block[0] <= previous[1]:
+                raise FlightradarException(
+                    "Address blocks {} and {} overlap".format(previous, block)
+                )
+        self._starts = [block[0] for block in blocks]
+        self._ends = [block[1] for block in blocks]
+        self._values = [block[2] for block in blocks]
+
+    def __repr__(self) -> str:
+        """Return string representation of this table."""
+        return "<{}(blocks={})>".format(self.__class__.__name__, len(self._starts))
+
+    def lookup(self, mode_s: Optional[str]) -> Optional[str]:
+        """Return the value of the block containing the provided address."""
+        try:
+            address = int(mode_s, 16)
+        except (TypeError, ValueError):
+            return None
+        index = bisect.bisect_right(self._starts, address) - 1
+        if index >= 0 and address <= self._ends[index]:
+            return self._values[index]
+        return None
+
+
+class PrefixTrie:
+    """Character trie mapping prefixes to values."""
+
+    # Key of the value stored at a node, cannot clash with single characters.
+    _VALUE = ""
+
+    def __init__(self, entries: Dict[str, str] = None) -> None:
+        """Initialise prefix trie."""
+        self._root = {}
+        self._size = 0
+        for prefix, value in (entries or {}).items():
+            self.insert(prefix, value)
+
+    def __repr__(self) -> str:
+        """Return string representation of this trie."""
+        return "<{}(size={})>".format(self.__class__.__name__, self._size)
+
+    def __len__(self) -> int:
+        """Return the number of prefixes."""
+        return self._size
+
+    def insert(self, prefix: str, value: str) -> None:
+        """Add prefix with its value."""
+        node = self._root
+        for character in prefix:
+            node = node.setdefault(character, {})
+        if self._VALUE not in node:
+            self._size += 1
+        node[self._VALUE] = value
+
+    def longest_prefix(self, text: str) -> Optional[Tuple[str, str]]:
+        """Return the longest prefix of the text and its value."""
+        node = self._root
+        result = None
+        for index, character in enumerate(text):
+            node = node.get(character)
+            if node is None:
+                break
+            if self._VALUE in node:
+                result = (text[: index + 1], node[self._VALUE])
+        return result
+
+
+DEFAULT_ADDRESS_BLOCK_TABLE = AddressBlockTable(DEFAULT_ADDRESS_BLOCKS)
+DEFAULT_AIRLINE_TRIE = PrefixTrie(DEFAULT_AIRLINES)
+
+
+def country_for_address(
+    mode_s: Optional[str], table: AddressBlockTable = DEFAULT_ADDRESS_BLOCK_TABLE
+) -> Optional[str]:
+    """Return the country code the ICAO address is allocated to."""
+    return table.lookup(mode_s)
+
+
+def airline_for_callsign(
+    callsign: Optional[str], trie: PrefixTrie = DEFAULT_AIRLINE_TRIE
+) -> Optional[Tuple[str, str]]:
+    """Return designator and name of the airline operating the flight.
+
+    Only callsigns consisting of the designator followed by a flight number
+    are considered, to avoid matching registrations used as callsign.
+    """
+    if not callsign:
+        return None
+    callsign = callsign.strip().upper()
+    match = trie.longest_prefix(callsign)
+    if match and len(callsign) > len(match[0]) and callsign[len(match[0])].isdigit():
+        return match
+    return None
+
+
+def country_filter(countries: Iterable[str]) -> Callable:
+    """Return filter predicate keeping entries registered in the countries."""
+    countries = frozenset(countries)
+    return lambda entry: entry.country in countries
+
+
+def airline_filter(designators: Iterable[str]) -> Callable:
+    """Return filter predicate keeping entries operated by the airlines."""
+    designators = frozenset(designators)
+    return lambda entry: entry.airline_designator in designators
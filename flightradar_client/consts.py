@@ -23,3 +23,4 @@ UPDATE_OK = "OK"
 UPDATE_ERROR = "ERROR"
 INVALID_COORDINATES = (0, 0)
 NONE_COORDINATES = (None, None)
+DEFAULT_HOME_COORDINATES = (0.0, 0.0)
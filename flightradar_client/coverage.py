@@ -0,0 +1,399 @@
+"""
+Receiver coverage statistics.
+
+Accumulates the polar range coverage of a receiver: the maximum distance and
+a distance histogram per bearing sector and altitude band, plus the number
+of position reports over time. All values are kept in fixed size numeric
+arrays, so memory usage stays constant however long the receiver runs.
+"""
+import array
+import datetime
+import logging
+import math
+import os
+import struct
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .consts import INVALID_COORDINATES
+from .exceptions import FlightradarException
+from .feed_entry import FeedEntry
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SECTORS = 36
+DEFAULT_ALTITUDE_BANDS = (10000, 20000, 30000)
+DEFAULT_MAX_RANGE = 500.0
+DEFAULT_RANGE_BINS = 100
+DEFAULT_RATE_RESOLUTION = datetime.timedelta(minutes=1)
+DEFAULT_RATE_SLOTS = 1440
+
+EARTH_RADIUS = 6371.0088
+
+MAGIC = b"FRCV"
+VERSION = 1
+HEADER = struct.Struct("<4sBHHHdHI")
+
+
+class CoverageSnapshot:
+    """Copy of the coverage statistics at a point in time.
+
+    Cells are indexed by altitude band first, then by bearing sector.
+    """
+
+    def __init__(
+        self,
+        sectors: int,
+        altitude_bands: Tuple[int, ...],
+        max_range: float,
+        max_ranges: array.array,
+        histograms: array.array,
+        rates: List[Tuple[datetime.datetime, float]],
+    ) -> None:
+        """Initialise snapshot."""
+        self._sectors = sectors
+        self._altitude_bands = altitude_bands
+        self._max_range = max_range
+        self._max_ranges = max_ranges
+        self._histograms = histograms
+        self._range_bins = len(histograms) // len(max_ranges)
+        self._rates = rates
+
+    def __repr__(self) -> str:
+        """Return string representation of this snapshot."""
+        return "<{}(sectors={}, bands={}, positions={})>".format(
+            self.__class__.__name__,
+            self._sectors,
+            len(self._altitude_bands) + 1,
+            sum(self._histograms),
+        )
+
+    @property
+    def sector_size(self) -> float:
+        """Return the width of a bearing sector in degrees."""
+        return 360.0 / self._sectors
+
+    @property
+    def altitude_bands(self) -> Tuple[int, ...]:
+        """Return the upper altitude limits in feet of all bands but the last."""
+        return self._altitude_bands
+
+    @property
+    def max_ranges(self) -> List[List[float]]:
+        """Return the maximum distance in km per altitude band and sector."""
+        return self._by_band(list(self._max_ranges))
+
+    @property
+    def counts(self) -> List[List[int]]:
+        """Return the number of positions per altitude band and sector."""
+        bins = self._range_bins
+        return self._by_band(
+            [
+                sum(self._histograms[cell * bins : (cell + 1) * bins])
+                for cell in range(len(self._max_ranges))
+            ]
+        )
+
+    @property
+    def rates(self) -> List[Tuple[datetime.datetime, float]]:
+        """Return position reports per second, oldest period first."""
+        return self._rates
+
+    def percentile(self, percentile: float) -> List[List[Optional[float]]]:
+        """Return the distance in km covering the percentage of positions.
+
+        Values are per altitude band and sector, None if nothing was seen.
+        """
+        bins = self._range_bins
+        bin_size = self._max_range / bins
+        result = []
+        for cell, max_range in enumerate(self._max_ranges):
+            histogram = self._histograms[cell * bins : (cell + 1) * bins]
+            total = sum(histogram)
+            if not total:
+                result.append(None)
+                continue
+            threshold = total * percentile / 100.0
+            cumulative = 0
+            for index, count in enumerate(histogram):
+                cumulative += count
+                if cumulative >= threshold:
+                    break
+            # Upper edge of the bin, but never further than actually seen.
+            result.append(min((index + 1) * bin_size, max_range))
+        return self._by_band(result)
+
+    def _by_band(self, values: List) -> List[List]:
+        """Split values of all cells into one list per altitude band."""
+        sectors = self._sectors
+        return [
+            values[band * sectors : (band + 1) * sectors]
+            for band in range(len(values) // sectors)
+        ]
+
+
+class CoverageAccumulator:
+    """Incrementally accumulates the range coverage of a receiver.
+
+    Use the update method as listener of a feed manager. Distances beyond
+    the maximum range are counted in the last bin of the histogram.
+    """
+
+    def __init__(
+        self,
+        home_coordinates: Tuple[float, float],
+        sectors: int = DEFAULT_SECTORS,
+        altitude_bands: Sequence[int] = DEFAULT_ALTITUDE_BANDS,
+        max_range: float = DEFAULT_MAX_RANGE,
+        range_bins: int = DEFAULT_RANGE_BINS,
+        rate_resolution: datetime.timedelta = DEFAULT_RATE_RESOLUTION,
+        rate_slots: int = DEFAULT_RATE_SLOTS,
+    ) -> None:
+        """Initialise coverage accumulator."""
+        self._home_coordinates = home_coordinates
+        self._sectors = sectors
+        self._altitude_bands = tuple(altitude_bands)
+        self._max_range = max_range
+        self._range_bins = range_bins
+        self._rate_resolution = int(rate_resolution.total_seconds())
+        self._rate_slots = rate_slots
+        if sectors < 1 or range_bins < 1 or rate_slots < 1 or max_range <= 0:
+            raise FlightradarException("Invalid coverage dimensions")
+        if self._rate_resolution < 1:
+            raise FlightradarException("Rate resolution must be at least 1 second")
+        # Trigonometry of the home position, needed for every position.
+        self._home_latitude = math.radians(home_coordinates[0])
+        self._home_longitude = math.radians(home_coordinates[1])
+        self._sin_home_latitude = math.sin(self._home_latitude)
+        self._cos_home_latitude = math.cos(self._home_latitude)
+        self._allocate()
+
+    def __repr__(self) -> str:
+        """Return string representation of this accumulator."""
+        return "<{}(home={}, sectors={}, bands={})>".format(
+            self.__class__.__name__,
+            self._home_coordinates,
+            self._sectors,
+            len(self._altitude_bands) + 1,
+        )
+
+    def _allocate(self) -> None:
+        """Allocate the arrays, all values zero."""
+        cells = self._sectors * (len(self._altitude_bands) + 1)
+        self._max_ranges = array.array("d", [0.0]) * cells
+        self._histograms = array.array("L", [0]) * (cells * self._range_bins)
+        # Number of reports per period, and the period each slot belongs to.
+        self._reports = array.array("L", [0]) * self._rate_slots
+        self._periods = array.array("q", [-1]) * self._rate_slots
+
+    @property
+    def home_coordinates(self) -> Tuple[float, float]:
+        """Return the coordinates of the receiver."""
+        return self._home_coordinates
+
+    async def update(
+        self, feed_entries: Optional[Dict[str, FeedEntry]], now: float = None
+    ) -> None:
+        """Add the positions of all feed entries."""
+        self.add(feed_entries.values() if feed_entries else (), now)
+
+    def add(self, entries, now: float = None) -> int:
+        """Add the positions of the entries, return the number added."""
+        bins = self._range_bins
+        bin_size = self._max_range / bins
+        sectors = self._sectors
+        sector_size = 360.0 / sectors
+        max_ranges = self._max_ranges
+        histograms = self._histograms
+        added = 0
+        for entry in entries:
+            coordinates = entry.coordinates
+            if (
+                coordinates is None
+                or None in coordinates
+                or coordinates == INVALID_COORDINATES
+            ):
+                continue
+            distance, bearing = self._polar(coordinates)
+            cell = self._band(entry.altitude) * sectors + min(
+                int(bearing / sector_size), sectors - 1
+            )
+            if distance > max_ranges[cell]:
+                max_ranges[cell] = distance
+            histograms[cell * bins + min(int(distance / bin_size), bins - 1)] += 1
+            added += 1
+        self._count_reports(added, time.time() if now is None else now)
+        return added
+
+    def _polar(self, coordinates: Tuple[float, float]) -> Tuple[float, float]:
+        """Return distance in km and bearing in degrees from home."""
+        latitude = math.radians(coordinates[0])
+        delta_longitude = math.radians(coordinates[1]) - self._home_longitude
+        sin_latitude = math.sin(latitude)
+        cos_latitude = math.cos(latitude)
+        cos_delta_longitude = math.cos(delta_longitude)
+        half_delta_latitude = math.sin((latitude - self._home_latitude) / 2)
+        half_delta_longitude = math.sin(delta_longitude / 2)
+        a = (
+            half_delta_latitude * half_delta_latitude
+            + self._cos_home_latitude
+            * cos_latitude
+            * half_delta_longitude
+            * half_delta_longitude
+        )
+        distance = 2 * EARTH_RADIUS * math.asin(math.sqrt(min(a, 1.0)))
+        bearing = math.degrees(
+            math.atan2(
+                math.sin(delta_longitude) * cos_latitude,
+                self._cos_home_latitude * sin_latitude
+                - self._sin_home_latitude * cos_latitude * cos_delta_longitude,
+            )
+        )
+        return distance, bearing % 360.0
+
+    def _band(self, altitude) -> int:
+        """Return the index of the altitude band, ground and unknown are 0."""
+        if not altitude or altitude == "ground":
+            return 0
+        for index, limit in enumerate(self._altitude_bands):
+            if altitude < limit:
+                return index
+        return len(self._altitude_bands)
+
+    def _count_reports(self, reports: int, now: float) -> None:
+        """Add the reports to the period containing the timestamp."""
+        period = int(now // self._rate_resolution)
+        slot = period % self._rate_slots
+        if self._periods[slot] != period:
+            self._periods[slot] = period
+            self._reports[slot] = 0
+        self._reports[slot] += reports
+
+    def snapshot(self) -> CoverageSnapshot:
+        """Return a copy of the current statistics."""
+        periods = sorted(
+            (period, slot) for slot, period in enumerate(self._periods) if period >= 0
+        )
+        rates = [
+            (
+                datetime.datetime.fromtimestamp(
+                    period * self._rate_resolution, tz=datetime.timezone.utc
+                ),
+                self._reports[slot] / self._rate_resolution,
+            )
+            for period, slot in periods
+        ]
+        return CoverageSnapshot(
+            self._sectors,
+            self._altitude_bands,
+            self._max_range,
+            array.array("d", self._max_ranges),
+            array.array("L", self._histograms),
+            rates,
+        )
+
+    def reset(self) -> None:
+        """Discard all statistics."""
+        self._allocate()
+
+    def to_bytes(self) -> bytes:
+        """Return the statistics in the compact binary format."""
+        header = HEADER.pack(
+            MAGIC,
+            VERSION,
+            self._sectors,
+            len(self._altitude_bands),
+            self._range_bins,
+            self._max_range,
+            self._rate_slots,
+            self._rate_resolution,
+        )
+        # Counters and distances are stored with 32 bits each.
+        parts = [
+            array.array("i", self._altitude_bands),
+            array.array("f", self._max_ranges),
+            array.array("I", self._histograms),
+            array.array("I", self._reports),
+            array.array("q", self._periods),
+        ]
+        if sys.byteorder == "big":
+            for part in parts:
+                part.byteswap()
+        return header + b"".join(part.tobytes() for part in parts)
+
+    @classmethod
+    def from_bytes(
+        cls, data: bytes, home_coordinates: Tuple[float, float]
+    ) -> "CoverageAccumulator":
+        """Restore statistics from the compact binary format."""
+        try:
+            (
+                magic,
+                version,
+                sectors,
+                band_count,
+                range_bins,
+                max_range,
+                rate_slots,
+                rate_resolution,
+            ) = HEADER.unpack_from(data, 0)
+        except struct.error as error:
+            raise FlightradarException("Truncated coverage data") from error
+        if magic != MAGIC or version != VERSION:
+            raise FlightradarException("Invalid coverage data")
+        cells = sectors * (band_count + 1)
+        layout = (
+            ("i", band_count),
+            ("f", cells),
+            ("I", cells * range_bins),
+            ("I", rate_slots),
+            ("q", rate_slots),
+        )
+        expected = HEADER.size + sum(
+            array.array(code).itemsize * count for code, count in layout
+        )
+        if len(data) != expected:
+            raise FlightradarException("Invalid coverage data length")
+        parts = []
+        offset = HEADER.size
+        for code, count in layout:
+            part = array.array(code)
+            size = part.itemsize * count
+            part.frombytes(data[offset : offset + size])
+            if sys.byteorder == "big":
+                part.byteswap()
+            parts.append(part)
+            offset += size
+        bands, max_ranges, histograms, reports, periods = parts
+        accumulator = cls(
+            home_coordinates,
+            sectors,
+            tuple(bands),
+            max_range,
+            range_bins,
+            datetime.timedelta(seconds=rate_resolution),
+            rate_slots,
+        )
+        accumulator._max_ranges = array.array("d", max_ranges)
+        accumulator._histograms = array.array("L", histograms)
+        accumulator._reports = array.array("L", reports)
+        accumulator._periods = periods
+        return accumulator
+
+    def save(self, path: str) -> None:
+        """Write the statistics to a file, replacing it atomically."""
+        temporary = "{}.tmp".format(path)
+        with open(temporary, "wb") as file:
+            file.write(self.to_bytes())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(
+        cls, path: str, home_coordinates: Tuple[float, float]
+    ) -> "CoverageAccumulator":
+        """Read statistics previously written to a file."""
+        with open(path, "rb") as file:
+            return cls.from_bytes(file.read(), home_coordinates)
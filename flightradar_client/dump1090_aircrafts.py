@@ -3,10 +3,11 @@ Local Dump1090 Aircrafts Feed.
 
 Fetches JSON feed from a local Dump1090 aircrafts feed.
 """
+import concurrent.futures
 import logging
-from typing import Awaitable, Callable, Dict, List, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
-from aiohttp import ClientSession
+from aiohttp import ClientSession, ClientTimeout
 
 from .consts import (
     ATTR_ALTITUDE,
@@ -24,10 +25,12 @@ from .consts import (
     ATTR_UPDATED,
     ATTR_VERT_RATE,
 )
-from .feed import Feed
+from .feed import DEFAULT_TIMEOUT, Feed
 from .feed_aggregator import FeedAggregator
 from .feed_entry import FeedEntry
 from .feed_manager import FeedManagerBase
+from .filters import PushdownFilter, RawFields
+from .utils import INTERN_TABLE, InternTable
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -36,6 +39,19 @@ DEFAULT_PORT = 8888
 
 URL_TEMPLATE = "http://{}:{}/data/aircraft.json"
 
+# Raw keys of the parsed data keys, to check aircrafts before parsing them.
+AIRCRAFT_FIELDS = {
+    ATTR_MODE_S: ATTR_HEX,
+    ATTR_LATITUDE: ATTR_LAT,
+    ATTR_LONGITUDE: ATTR_LON,
+    ATTR_TRACK: ATTR_TRACK,
+    ATTR_ALTITUDE: ATTR_ALTITUDE,
+    ATTR_SPEED: ATTR_SPEED,
+    ATTR_SQUAWK: ATTR_SQUAWK,
+    ATTR_VERT_RATE: ATTR_VERT_RATE,
+    ATTR_CALLSIGN: ATTR_FLIGHT,
+}
+
 
 class Dump1090AircraftsFeedManager(FeedManagerBase):
     """Feed Manager for Dump1090 Aircrafts feed."""
@@ -51,6 +67,13 @@ class Dump1090AircraftsFeedManager(FeedManagerBase):
         url: str = None,
         hostname: str = DEFAULT_HOSTNAME,
         port: int = DEFAULT_PORT,
+        executor: concurrent.futures.Executor = None,
+        reuse_entries: bool = False,
+        coalesce_updates: bool = False,
+        persistent_timestamp: bool = False,
+        mirror_urls: List[str] = None,
+        timeout: ClientTimeout = DEFAULT_TIMEOUT,
+        intern_table: InternTable = INTERN_TABLE,
     ) -> None:
         """Initialize the NSW Rural Fire Services Feed Manager."""
         feed = Dump1090AircraftsFeedAggregator(
@@ -60,8 +83,20 @@ class Dump1090AircraftsFeedManager(FeedManagerBase):
             url=url,
             hostname=hostname,
             port=port,
+            executor=executor,
+            mirror_urls=mirror_urls,
+            timeout=timeout,
+            reuse_entries=reuse_entries,
+            intern_table=intern_table,
+        )
+        super().__init__(
+            feed,
+            generate_callback,
+            update_callback,
+            remove_callback,
+            persistent_timestamp=persistent_timestamp,
+            coalesce_updates=coalesce_updates,
         )
-        super().__init__(feed, generate_callback, update_callback, remove_callback)
 
 
 class Dump1090AircraftsFeedAggregator(FeedAggregator):
@@ -75,9 +110,16 @@ class Dump1090AircraftsFeedAggregator(FeedAggregator):
         url: str = None,
         hostname: str = DEFAULT_HOSTNAME,
         port: int = DEFAULT_PORT,
+        executor: concurrent.futures.Executor = None,
+        reuse_entries: bool = False,
+        mirror_urls: List[str] = None,
+        timeout: ClientTimeout = DEFAULT_TIMEOUT,
+        intern_table: InternTable = INTERN_TABLE,
     ) -> None:
         """Initialise feed aggregator."""
-        super().__init__(filter_radius)
+        super().__init__(
+            filter_radius, reuse_entries=reuse_entries, intern_table=intern_table
+        )
         self._feed = Dump1090AircraftsFeed(
             home_coordinates,
             websession,
@@ -86,6 +128,10 @@ class Dump1090AircraftsFeedAggregator(FeedAggregator):
             url,
             hostname,
             port,
+            executor,
+            mirror_urls,
+            timeout,
+            intern_table,
         )
 
     @property
@@ -106,6 +152,10 @@ class Dump1090AircraftsFeed(Feed):
         url: str = None,
         hostname: str = DEFAULT_HOSTNAME,
         port: int = DEFAULT_PORT,
+        executor: concurrent.futures.Executor = None,
+        mirror_urls: List[str] = None,
+        timeout: ClientTimeout = DEFAULT_TIMEOUT,
+        intern_table: InternTable = INTERN_TABLE,
     ) -> None:
         super().__init__(
             home_coordinates,
@@ -115,6 +165,10 @@ class Dump1090AircraftsFeed(Feed):
             url,
             hostname,
             port,
+            executor,
+            mirror_urls,
+            timeout,
+            intern_table,
         )
 
     def _create_url(self, hostname: str, port: int) -> str:
@@ -123,28 +177,54 @@ class Dump1090AircraftsFeed(Feed):
 
     def _new_entry(self, home_coordinates: Tuple[float, float], feed_data) -> FeedEntry:
         """Generate a new entry."""
-        return FeedEntry(home_coordinates, feed_data)
+        return FeedEntry(home_coordinates, feed_data, self.intern_table)
 
-    def _parse(self, parsed_json: Dict) -> List[Dict]:
+    def _parse(self, parsed_json: Dict, dropped: List[Dict] = None) -> List[Dict]:
         """Parse the provided JSON data."""
-        result = []
-        timestamp = None if "now" not in parsed_json else parsed_json["now"]
-        if "aircraft" in parsed_json:
-            aircrafts = parsed_json["aircraft"]
-            for entry in aircrafts:
-                result.append(
-                    {
-                        ATTR_MODE_S: entry.get(ATTR_HEX, None),
-                        ATTR_LATITUDE: entry.get(ATTR_LAT, None),
-                        ATTR_LONGITUDE: entry.get(ATTR_LON, None),
-                        ATTR_TRACK: entry.get(ATTR_TRACK, None),
-                        ATTR_ALTITUDE: entry.get(ATTR_ALTITUDE, None),
-                        ATTR_SPEED: entry.get(ATTR_SPEED, None),
-                        ATTR_SQUAWK: entry.get(ATTR_SQUAWK, None),
-                        ATTR_UPDATED: timestamp,
-                        ATTR_VERT_RATE: entry.get(ATTR_VERT_RATE, None),
-                        ATTR_CALLSIGN: entry.get(ATTR_FLIGHT, None),
-                    }
-                )
-        _LOGGER.debug("Parser result = %s", result)
-        return result
+        return parse_aircrafts(parsed_json, self.pushdown_filter, dropped)
+
+    def _parser(
+        self,
+    ) -> Callable[[Dict, Optional[PushdownFilter], List[Dict]], List[Dict]]:
+        """Return the function parsing the JSON data in an executor."""
+        return parse_aircrafts
+
+
+def parse_aircrafts(
+    parsed_json: Dict,
+    predicate: Callable[[Dict], bool] = None,
+    dropped: List[Dict] = None,
+) -> List[Dict]:
+    """Parse the provided Dump1090 aircrafts JSON data.
+
+    Only aircrafts satisfying the optional predicate are returned. The
+    predicate checks the raw fields, before the data is built. Identifier,
+    callsign and coordinates of the others are added to dropped, if given.
+    """
+    result = []
+    timestamp = None if "now" not in parsed_json else parsed_json["now"]
+    fields = RawFields(AIRCRAFT_FIELDS)
+    if "aircraft" in parsed_json:
+        aircrafts = parsed_json["aircraft"]
+        for entry in aircrafts:
+            # Drop aircrafts excluded by the filters before creating entries.
+            if predicate is not None and not predicate(fields.wrap(entry)):
+                if dropped is not None:
+                    dropped.append(fields.extract())
+                continue
+            result.append(
+                {
+                    ATTR_MODE_S: entry.get(ATTR_HEX, None),
+                    ATTR_LATITUDE: entry.get(ATTR_LAT, None),
+                    ATTR_LONGITUDE: entry.get(ATTR_LON, None),
+                    ATTR_TRACK: entry.get(ATTR_TRACK, None),
+                    ATTR_ALTITUDE: entry.get(ATTR_ALTITUDE, None),
+                    ATTR_SPEED: entry.get(ATTR_SPEED, None),
+                    ATTR_SQUAWK: entry.get(ATTR_SQUAWK, None),
+                    ATTR_UPDATED: timestamp,
+                    ATTR_VERT_RATE: entry.get(ATTR_VERT_RATE, None),
+                    ATTR_CALLSIGN: entry.get(ATTR_FLIGHT, None),
+                }
+            )
+    _LOGGER.debug("Parser result = %s", result)
+    return result
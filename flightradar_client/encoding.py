@@ -0,0 +1,353 @@
+"""
+Binary snapshot encoding.
+
+Encodes feed entries into a compact binary message for transfer between
+processes and for archival. A message consists of a header, a table of the
+strings used in the message and one fixed width record per aircraft. Each
+record has a bit mask of the fields present, coordinates in millionths of a
+degree and track and speed in tenths, which reproduces the values delivered
+by the feeds exactly.
+
+Keyframes contain all aircrafts, deltas only the aircrafts that have been
+added, changed or removed since the previous snapshot.
+"""
+import logging
+import struct
+from typing import Dict, List, Optional, Tuple
+
+from .consts import (
+    ATTR_ALTITUDE,
+    ATTR_CALLSIGN,
+    ATTR_LATITUDE,
+    ATTR_LONGITUDE,
+    ATTR_MODE_S,
+    ATTR_SPEED,
+    ATTR_SQUAWK,
+    ATTR_TRACK,
+    ATTR_UPDATED,
+    ATTR_VERT_RATE,
+)
+from .exceptions import FlightradarException
+from .feed_entry import FeedEntry
+from .utils import intern_data
+
+_LOGGER = logging.getLogger(__name__)
+
+MAGIC = b"FRSN"
+VERSION = 1
+KIND_KEYFRAME = 0
+KIND_DELTA = 1
+
+HEADER = struct.Struct("<4sBBII")
+STRING_LENGTH = struct.Struct("<H")
+RECORD = struct.Struct("<HIiiiHHiHHd")
+
+FIELDS = (
+    ATTR_MODE_S,
+    ATTR_LATITUDE,
+    ATTR_LONGITUDE,
+    ATTR_TRACK,
+    ATTR_ALTITUDE,
+    ATTR_SPEED,
+    ATTR_SQUAWK,
+    ATTR_UPDATED,
+    ATTR_VERT_RATE,
+    ATTR_CALLSIGN,
+)
+FIELD_BITS = {field: 1 << index for index, field in enumerate(FIELDS)}
+FLAG_ALTITUDE_GROUND = 1 << 10
+FLAG_MODE_S_TEXT = 1 << 11
+FLAG_MODE_S_LOWER = 1 << 12
+FLAG_REMOVED = 1 << 15
+
+COORDINATE_SCALE = 1000000
+TENTHS_SCALE = 10
+
+DEFAULT_KEYFRAME_INTERVAL = 60
+
+
+class _StringTable:
+    """Strings of a message, each stored once."""
+
+    def __init__(self) -> None:
+        """Initialise string table."""
+        self._indexes = {}
+        self._strings = []
+
+    def index(self, value: str) -> int:
+        """Return the index of the string, adding it if necessary."""
+        index = self._indexes.get(value)
+        if index is None:
+            index = len(self._strings)
+            self._indexes[value] = index
+            self._strings.append(value)
+        return index
+
+    def encode(self) -> bytes:
+        """Return the encoded strings."""
+        parts = []
+        for value in self._strings:
+            encoded = value.encode("utf-8")
+            parts.append(STRING_LENGTH.pack(len(encoded)))
+            parts.append(encoded)
+        return b"".join(parts)
+
+    def __len__(self) -> int:
+        """Return the number of strings."""
+        return len(self._strings)
+
+
+def _pack_record(data: Dict, strings: _StringTable) -> bytes:
+    """Encode the data of a single aircraft."""
+    mask = 0
+    for field in FIELDS:
+        if data.get(field) is not None:
+            mask |= FIELD_BITS[field]
+    mode_s = data.get(ATTR_MODE_S)
+    address, flags = _pack_mode_s(mode_s, strings)
+    mask |= flags
+    altitude = data.get(ATTR_ALTITUDE)
+    if altitude == "ground":
+        mask |= FLAG_ALTITUDE_GROUND
+        altitude = 0
+    squawk = data.get(ATTR_SQUAWK)
+    callsign = data.get(ATTR_CALLSIGN)
+    updated = data.get(ATTR_UPDATED)
+    try:
+        return RECORD.pack(
+            mask,
+            address,
+            _scale(data.get(ATTR_LATITUDE), COORDINATE_SCALE),
+            _scale(data.get(ATTR_LONGITUDE), COORDINATE_SCALE),
+            _scale(altitude, 1),
+            _scale(data.get(ATTR_TRACK), TENTHS_SCALE),
+            _scale(data.get(ATTR_SPEED), TENTHS_SCALE),
+            _scale(data.get(ATTR_VERT_RATE), 1),
+            strings.index(squawk) if squawk is not None else 0,
+            strings.index(callsign) if callsign is not None else 0,
+            float(updated) if updated is not None else 0.0,
+        )
+    except (struct.error, TypeError, ValueError) as error:
+        raise FlightradarException(
+            "Unable to encode aircraft {}: {}".format(mode_s, error)
+        ) from error
+
+
+def _pack_mode_s(mode_s: Optional[str], strings: _StringTable) -> Tuple[int, int]:
+    """Encode the ICAO address as number, or as string if not in hex format."""
+    if mode_s is None:
+        return 0, 0
+    if len(mode_s) == 6:
+        try:
+            address = int(mode_s, 16)
+        except ValueError:
+            address = None
+        if address is not None:
+            if format(address, "06X") == mode_s:
+                return address, 0
+            if format(address, "06x") == mode_s:
+                return address, FLAG_MODE_S_LOWER
+    return strings.index(mode_s), FLAG_MODE_S_TEXT
+
+
+def _pack_removed(external_id: str, strings: _StringTable) -> bytes:
+    """Encode the removal of an aircraft."""
+    # Only the external id is used, all other values are zero.
+    return RECORD.pack(
+        FLAG_REMOVED | FLAG_MODE_S_TEXT,
+        strings.index(external_id),
+        *([0] * (len(FIELDS) - 2) + [0.0]),
+    )
+
+
+def _scale(value, scale: int) -> int:
+    """Quantise a numeric value."""
+    if value is None:
+        return 0
+    return int(round(value * scale))
+
+
+def _unscale(value: int, scale: int):
+    """Restore a quantised value, as int if it is a whole number."""
+    if value % scale == 0:
+        return value // scale
+    return value / scale
+
+
+def _message(kind: int, strings: _StringTable, records: List[bytes]) -> bytes:
+    """Assemble a message."""
+    return b"".join(
+        [
+            HEADER.pack(MAGIC, VERSION, kind, len(strings), len(records)),
+            strings.encode(),
+        ]
+        + records
+    )
+
+
+def encode_snapshot(feed_entries: Dict[str, FeedEntry]) -> bytes:
+    """Encode all feed entries as keyframe."""
+    strings = _StringTable()
+    records = [
+        _pack_record(entry.data, strings)
+        for entry in feed_entries.values()
+        if entry.data
+    ]
+    return _message(KIND_KEYFRAME, strings, records)
+
+
+def encode_delta(
+    previous: Dict[str, FeedEntry], current: Dict[str, FeedEntry]
+) -> bytes:
+    """Encode the changes between two snapshots of feed entries."""
+    strings = _StringTable()
+    records = []
+    for external_id, entry in current.items():
+        if not entry.data:
+            continue
+        previous_entry = previous.get(external_id)
+        if previous_entry is None or previous_entry.data != entry.data:
+            records.append(_pack_record(entry.data, strings))
+    for external_id in previous:
+        if external_id not in current:
+            records.append(_pack_removed(external_id, strings))
+    return _message(KIND_DELTA, strings, records)
+
+
+def decode_message(data: bytes) -> Tuple[int, List[Dict], List[str]]:
+    """Decode a message into its kind, aircraft data and removed ids.
+
+    Records are read directly from the buffer without copying it.
+    """
+    view = memoryview(data)
+    try:
+        magic, version, kind, string_count, record_count = HEADER.unpack_from(view, 0)
+    except struct.error as error:
+        raise FlightradarException("Truncated snapshot message") from error
+    if magic != MAGIC or version != VERSION:
+        raise FlightradarException("Invalid snapshot message")
+    offset = HEADER.size
+    strings = []
+    try:
+        for _ in range(string_count):
+            (length,) = STRING_LENGTH.unpack_from(view, offset)
+            offset += STRING_LENGTH.size
+            strings.append(str(view[offset : offset + length], "utf-8"))
+            offset += length
+        if len(view) != offset + record_count * RECORD.size:
+            raise FlightradarException("Invalid snapshot message length")
+        aircrafts = []
+        removed = []
+        for record in RECORD.iter_unpack(view[offset:]):
+            if record[0] & FLAG_REMOVED:
+                removed.append(strings[record[1]])
+            else:
+                aircrafts.append(_unpack_record(record, strings))
+    except (struct.error, IndexError, UnicodeDecodeError) as error:
+        raise FlightradarException("Invalid snapshot message") from error
+    return kind, aircrafts, removed
+
+
+def _unpack_record(record: Tuple, strings: List[str]) -> Dict:
+    """Decode the data of a single aircraft."""
+    (
+        mask,
+        address,
+        latitude,
+        longitude,
+        altitude,
+        track,
+        speed,
+        vert_rate,
+        squawk,
+        callsign,
+        updated,
+    ) = record
+    if mask & FLAG_MODE_S_TEXT:
+        mode_s = strings[address]
+    elif mask & FLAG_MODE_S_LOWER:
+        mode_s = format(address, "06x")
+    else:
+        mode_s = format(address, "06X")
+    values = {
+        ATTR_MODE_S: mode_s,
+        ATTR_LATITUDE: latitude / COORDINATE_SCALE,
+        ATTR_LONGITUDE: longitude / COORDINATE_SCALE,
+        ATTR_TRACK: _unscale(track, TENTHS_SCALE),
+        ATTR_ALTITUDE: "ground" if mask & FLAG_ALTITUDE_GROUND else altitude,
+        ATTR_SPEED: _unscale(speed, TENTHS_SCALE),
+        ATTR_SQUAWK: strings[squawk] if mask & FIELD_BITS[ATTR_SQUAWK] else None,
+        ATTR_UPDATED: _unscale_timestamp(updated),
+        ATTR_VERT_RATE: vert_rate,
+        ATTR_CALLSIGN: strings[callsign] if mask & FIELD_BITS[ATTR_CALLSIGN] else None,
+    }
+    return {
+        field: values[field] if mask & FIELD_BITS[field] else None for field in FIELDS
+    }
+
+
+def _unscale_timestamp(value: float):
+    """Restore a timestamp, as int if it is a whole number."""
+    return int(value) if value.is_integer() else value
+
+
+def decode(
+    data: bytes,
+    previous: Dict[str, FeedEntry] = None,
+    home_coordinates: Tuple[float, float] = None,
+) -> Dict[str, FeedEntry]:
+    """Decode a message into feed entries.
+
+    Deltas are applied to the previously decoded feed entries, unchanged
+    entries are carried over.
+    """
+    kind, aircrafts, removed = decode_message(data)
+    if kind == KIND_DELTA:
+        if previous is None:
+            raise FlightradarException("Delta received without previous snapshot")
+        feed_entries = dict(previous)
+        for external_id in removed:
+            feed_entries.pop(external_id, None)
+    else:
+        feed_entries = {}
+    for aircraft in aircrafts:
+        intern_data(aircraft)
+        feed_entries[aircraft[ATTR_MODE_S]] = FeedEntry(home_coordinates, aircraft)
+    return feed_entries
+
+
+class SnapshotEncoder:
+    """Encodes consecutive snapshots as deltas with regular keyframes."""
+
+    def __init__(self, keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL) -> None:
+        """Initialise snapshot encoder."""
+        self._keyframe_interval = keyframe_interval
+        self._previous = None
+        self._deltas = 0
+
+    def __repr__(self) -> str:
+        """Return string representation of this encoder."""
+        return "<{}(keyframe_interval={})>".format(
+            self.__class__.__name__, self._keyframe_interval
+        )
+
+    def encode(self, feed_entries: Optional[Dict[str, FeedEntry]]) -> bytes:
+        """Encode the snapshot as keyframe or as delta to the previous one."""
+        feed_entries = feed_entries or {}
+        if self._previous is None or self._deltas >= self._keyframe_interval:
+            message = encode_snapshot(feed_entries)
+            self._deltas = 0
+        else:
+            message = encode_delta(self._previous, feed_entries)
+            self._deltas += 1
+        # Keep a copy of the data, entries may be updated in place.
+        self._previous = {
+            external_id: FeedEntry(entry.home_coordinates, dict(entry.data))
+            for external_id, entry in feed_entries.items()
+            if entry.data
+        }
+        return message
+
+    def reset(self) -> None:
+        """Start with a keyframe again, for example for a new receiver."""
+        self._previous = None
@@ -1,17 +1,32 @@
 """Feed."""
 import asyncio
+import collections
+import concurrent.futures
+import json
 import logging
-from typing import Dict, List, Optional, Tuple
+import math
+import time
+from typing import Callable, Dict, List, Optional, Tuple
 
 import aiohttp
 from aiohttp import ClientSession, client_exceptions
 
-from .consts import UPDATE_ERROR, UPDATE_OK
+from .consts import ATTR_MODE_S, UPDATE_ERROR, UPDATE_OK
 from .exceptions import FlightradarException
 from .feed_entry import FeedEntry
+from .filters import PushdownFilter, radius_bounding_box, within_radius
+from .metrics import FeedMetrics
+from .utils import INTERN_TABLE, InternTable, intern_data
 
 _LOGGER = logging.getLogger(__name__)
 
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=10)
+DEFAULT_HEDGE_PERCENTILE = 0.95
+# Delay before the first hedged request, until enough latencies are known.
+DEFAULT_HEDGE_DELAY = 1.0
+LATENCY_SAMPLES = 100
+MIN_LATENCY_SAMPLES = 10
+
 
 class Feed:
     """Data format independent feed."""
@@ -25,11 +40,29 @@ class Feed:
         url=None,
         hostname=None,
         port=None,
+        executor: concurrent.futures.Executor = None,
+        mirror_urls: List[str] = None,
+        timeout: aiohttp.ClientTimeout = DEFAULT_TIMEOUT,
+        intern_table: InternTable = INTERN_TABLE,
     ) -> None:
-        """Initialise feed."""
+        """Initialise feed.
+
+        JSON decoding and parsing run inline on the event loop, unless an
+        executor (thread or process pool) is provided to run them in.
+        Mirror urls serve the same data as the url; if a request is slower
+        than the hedge percentile of recent requests, or fails, the same
+        request is sent to the next mirror and the first answer is used.
+        Identifiers are interned through the intern table, feeds of busy
+        receivers can be given a table of their own.
+        """
         self._home_coordinates = home_coordinates
         self._apply_filters = apply_filters
         self._filter_radius = filter_radius
+        self._filter_box = (
+            radius_bounding_box(home_coordinates, filter_radius)
+            if filter_radius
+            else None
+        )
         if websession is None:
             raise FlightradarException("Session must not be None")
         self._websession = websession
@@ -37,6 +70,21 @@ class Feed:
             self._url = url
         else:
             self._url = self._create_url(hostname, port)
+        self._mirror_urls = list(mirror_urls or [])
+        self._timeout = timeout or DEFAULT_TIMEOUT
+        self._hedge_percentile = DEFAULT_HEDGE_PERCENTILE
+        self._latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        self._intern_table = intern_table
+        if executor is not None and self._parser() is None:
+            raise FlightradarException(
+                "{} does not support parsing in an executor".format(
+                    self.__class__.__name__
+                )
+            )
+        self._executor = executor
+        self._pushdown_filter = None
+        self._dropped = {}
+        self._metrics = FeedMetrics(self._url)
 
     def __repr__(self) -> str:
         """Return string representation of this feed."""
@@ -47,6 +95,60 @@ class Feed:
             self._filter_radius,
         )
 
+    @property
+    def url(self) -> str:
+        """Return the url data is retrieved from."""
+        return self._url
+
+    @property
+    def mirror_urls(self) -> List[str]:
+        """Return the urls serving the same data as the url."""
+        return self._mirror_urls
+
+    @property
+    def timeout(self) -> aiohttp.ClientTimeout:
+        """Return the timeouts of each request."""
+        return self._timeout
+
+    @property
+    def hedge_percentile(self) -> float:
+        """Return the percentile of recent latencies to hedge requests at."""
+        return self._hedge_percentile
+
+    @hedge_percentile.setter
+    def hedge_percentile(self, value: float) -> None:
+        """Set the percentile of recent latencies to hedge requests at."""
+        self._hedge_percentile = value
+
+    @property
+    def intern_table(self) -> InternTable:
+        """Return the table identifiers are interned through."""
+        return self._intern_table
+
+    @property
+    def metrics(self) -> FeedMetrics:
+        """Return the metrics of this feed."""
+        return self._metrics
+
+    @property
+    def pushdown_filter(self) -> Optional[PushdownFilter]:
+        """Return the filter applied to the data while parsing."""
+        return self._pushdown_filter
+
+    @pushdown_filter.setter
+    def pushdown_filter(self, value: Optional[PushdownFilter]) -> None:
+        """Set the filter applied to the data while parsing."""
+        self._pushdown_filter = value
+
+    @property
+    def dropped(self) -> Dict[str, Dict]:
+        """Return the data of the aircrafts dropped by the pushdown filter.
+
+        Only holds the identifier, callsign and coordinates of each aircraft
+        dropped in the latest update.
+        """
+        return self._dropped
+
     def _create_url(self, hostname, port) -> str:
         """Generate the url to retrieve data from."""
         pass
@@ -55,62 +157,182 @@ class Feed:
         """Generate a new entry."""
         pass
 
-    def _parse(self, parsed_json: Dict) -> List[Dict]:
+    def _parse(self, parsed_json: Dict, dropped: List[Dict] = None) -> List[Dict]:
         """Parse the provided JSON data."""
         pass
 
-    async def update(self) -> Tuple[str, Optional[Dict[str, FeedEntry]]]:
-        """Update from external source and return filtered entries."""
-        status, data = await self._fetch()
-        if status == UPDATE_OK:
-            if data:
-                feed_entries = []
-                # Extract data from feed entries.
-                for entry in data:
-                    # Generate proper data objects.
-                    feed_entries.append(self._new_entry(self._home_coordinates, entry))
-                filtered_entries = self._filter_entries(feed_entries)
-                # Rebuild the entries and use external id as key.
-                result_entries = {
-                    entry.external_id: entry for entry in filtered_entries
-                }
-                return UPDATE_OK, result_entries
-            else:
-                # Should not happen.
-                return UPDATE_OK, None
-        else:
+    def _parser(self) -> Optional[Callable]:
+        """Return the function parsing the JSON data in an executor.
+
+        It is called with the JSON data, the pushdown filter and the list
+        to add the dropped aircrafts to, and has to
+        be a module level function to run in a process pool. Feeds without
+        one cannot be used with an executor.
+        """
+        return None
+
+    def create_entry(self, data: Dict) -> FeedEntry:
+        """Create a feed entry of parsed data."""
+        return self._new_entry(self._home_coordinates, data)
+
+    async def fetch_data(self) -> Tuple[str, Optional[Dict[str, Dict]]]:
+        """Update from external source and return the parsed data.
+
+        The data is keyed by external id; unlike update, no entries are
+        created and no filters are applied.
+        """
+        status, parsed = await self._fetch()
+        data, dropped = parsed or (None, [])
+        # Identifiers are interned here, so that data parsed in other
+        # processes is too.
+        self._dropped = {
+            record[ATTR_MODE_S]: intern_data(record, self._intern_table)
+            for record in dropped
+        }
+        if status != UPDATE_OK:
             # Error happened while fetching the feed.
             return UPDATE_ERROR, None
+        if not data:
+            # Should not happen.
+            return UPDATE_OK, None
+        self._metrics.aircrafts_parsed.inc(len(data))
+        return UPDATE_OK, {
+            values[ATTR_MODE_S]: intern_data(values, self._intern_table)
+            for values in data
+        }
 
-    async def _fetch(self) -> Tuple[str, Optional[List[Dict]]]:
-        """Fetch JSON data from external source."""
+    async def update(self) -> Tuple[str, Optional[Dict[str, FeedEntry]]]:
+        """Update from external source and return filtered entries."""
+        status, data = await self.fetch_data()
+        if not data:
+            return status, None
+        # Generate proper data objects.
+        feed_entries = [self.create_entry(values) for values in data.values()]
+        filtered_entries = self._filter_entries(feed_entries)
+        if self._apply_filters:
+            self._metrics.aircrafts_filtered.inc(
+                len(feed_entries) - len(filtered_entries)
+            )
+            self._metrics.aircrafts_kept.inc(len(filtered_entries))
+        # Rebuild the entries and use external id as key.
+        return UPDATE_OK, {entry.external_id: entry for entry in filtered_entries}
+
+    def _hedge_delay(self) -> float:
+        """Return the seconds to wait for an answer before hedging.
+
+        Latencies are the times until the response headers were received.
+        Requests cancelled or timed out before are included with the time
+        they took until then, as their latency was at least that long.
+        """
+        if len(self._latencies) < MIN_LATENCY_SAMPLES:
+            return DEFAULT_HEDGE_DELAY
+        latencies = sorted(self._latencies)
+        index = math.ceil(self._hedge_percentile * len(latencies)) - 1
+        return latencies[min(max(index, 0), len(latencies) - 1)]
+
+    async def _fetch(self) -> Tuple[str, Optional[Tuple[List[Dict], List[Dict]]]]:
+        """Fetch JSON data from the url, hedged with the mirror urls."""
+        if not self._mirror_urls:
+            return await self._fetch_url(self._url)
+        urls = collections.deque([self._url] + self._mirror_urls)
+        delay = self._hedge_delay()
+        tasks = {}
+        pending = set()
+        try:
+            while True:
+                if urls:
+                    if pending:
+                        self._metrics.hedged_requests.inc()
+                    url = urls.popleft()
+                    task = asyncio.ensure_future(self._fetch_url(url))
+                    tasks[task] = url
+                    pending.add(task)
+                elif not pending:
+                    return UPDATE_ERROR, None
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=delay if urls else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    try:
+                        status, parsed = task.result()
+                    except Exception as error:
+                        # For example invalid JSON, the other urls may answer.
+                        _LOGGER.warning(
+                            "Fetching data from %s failed with %s", tasks[task], error
+                        )
+                        self._metrics.error("invalid")
+                        continue
+                    if status == UPDATE_OK:
+                        return status, parsed
+        finally:
+            # Cancel the requests still running, the answer is not needed.
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+
+    async def _fetch_url(
+        self, url: str
+    ) -> Tuple[str, Optional[Tuple[List[Dict], List[Dict]]]]:
+        """Fetch JSON data from external source.
+
+        Return the data of the aircrafts parsed, and of those dropped.
+        """
+        start = time.perf_counter()
+        latency = None
         try:
-            timeout = aiohttp.ClientTimeout(total=10)
             async with self._websession.request(
-                "GET", self._url, timeout=timeout
+                "GET", url, timeout=self._timeout
             ) as response:
+                latency = time.perf_counter() - start
+                self._latencies.append(latency)
+                self._metrics.response(response.status)
                 try:
                     # Raise error if status >= 400.
                     response.raise_for_status()
-                    data = await response.json()
-
-                    entries = self._parse(data)
-                    return UPDATE_OK, entries
+                    if self._executor is None:
+                        data = await response.json()
+                        # The body has already been read to decode the JSON.
+                        body = await response.read()
+                        dropped = [] if self._pushdown_filter else None
+                        parsed = self._parse(data, dropped), dropped or []
+                    else:
+                        body = await response.read()
+                        _check_content_type(response)
+                        parsed = await asyncio.get_running_loop().run_in_executor(
+                            self._executor,
+                            decode_and_parse,
+                            body,
+                            self._parser(),
+                            self._pushdown_filter,
+                        )
+                    duration = time.perf_counter() - start
+                    self._metrics.payload_bytes.observe(len(body))
+                    self._metrics.fetch_duration.observe(duration)
+                    return UPDATE_OK, parsed
                 except client_exceptions.ClientError as client_error:
                     _LOGGER.warning(
-                        "Fetching data from %s failed with %s", self._url, client_error
+                        "Fetching data from %s failed with %s", url, client_error
                     )
+                    self._metrics.error("client")
                     return UPDATE_ERROR, None
         except aiohttp.ClientError as client_error:
-            _LOGGER.warning(
-                "Fetching data from %s failed with %s", self._url, client_error
-            )
+            _LOGGER.warning("Fetching data from %s failed with %s", url, client_error)
+            self._metrics.error("client")
             return UPDATE_ERROR, None
         except asyncio.TimeoutError as timeout_error:
-            _LOGGER.warning(
-                "Fetching data from %s failed with %s", self._url, timeout_error
-            )
+            _LOGGER.warning("Fetching data from %s failed with %s", url, timeout_error)
+            self._metrics.error("timeout")
+            if latency is None:
+                self._latencies.append(time.perf_counter() - start)
             return UPDATE_ERROR, None
+        except asyncio.CancelledError:
+            # Hedged by a faster request, the latency is at least this long.
+            if latency is None:
+                self._latencies.append(time.perf_counter() - start)
+            raise
 
     def _filter_entries(self, entries: List[FeedEntry]) -> List[FeedEntry]:
         """Filter the provided entries."""
@@ -126,14 +348,49 @@ class Feed:
             )
             # Always remove entries on the ground (altitude: 0).
             filtered_entries = list(
-                filter(lambda entry: entry.altitude > 0, filtered_entries)
+                filter(
+                    lambda entry: entry.altitude is not None and entry.altitude > 0,
+                    filtered_entries,
+                )
             )
             # Filter by distance.
             if self._filter_radius:
                 filtered_entries = list(
                     filter(
-                        lambda entry: entry.distance_to_home <= self._filter_radius,
+                        lambda entry: within_radius(
+                            self._home_coordinates,
+                            entry.coordinates,
+                            self._filter_radius,
+                            self._filter_box,
+                        ),
                         filtered_entries,
                     )
                 )
         return filtered_entries
+
+
+def decode_and_parse(
+    body: bytes,
+    parser: Callable[[Dict, Optional[PushdownFilter], List[Dict]], List[Dict]],
+    pushdown_filter: Optional[PushdownFilter] = None,
+) -> Tuple[List[Dict], List[Dict]]:
+    """Decode the JSON body and parse it, in an executor.
+
+    Return the data of the aircrafts parsed, and of those dropped.
+    """
+    dropped = []
+    return parser(json.loads(body), pushdown_filter, dropped), dropped
+
+
+def _check_content_type(response: aiohttp.ClientResponse) -> None:
+    """Reject responses that are not JSON, like response.json() does."""
+    if "json" not in response.content_type:
+        raise client_exceptions.ContentTypeError(
+            response.request_info,
+            response.history,
+            status=response.status,
+            message="Attempt to decode JSON with unexpected mimetype: {}".format(
+                response.content_type
+            ),
+            headers=response.headers,
+        )
@@ -1,8 +1,9 @@
 """Feed aggregator base class."""
-import collections
+import datetime
 import logging
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
+from .aircraft_database import AircraftDatabase
 from .consts import (
     ATTR_CALLSIGN,
     ATTR_LATITUDE,
@@ -13,12 +14,15 @@ from .consts import (
 )
 from .feed import Feed
 from .feed_entry import FeedEntry
+from .filters import FilterPipeline, radius_bounding_box, within_radius
+from .metrics import FeedMetrics
+from .smoothing import PositionSmoother
 from .statistics import Statistics
-from .utils import FixedSizeDict
+from .utils import INTERN_TABLE, FixedSizeDict, InternTable
+from .window import DEFAULT_WINDOW_DURATION, SnapshotWindow
 
 _LOGGER = logging.getLogger(__name__)
 
-DEFAULT_AGGREGATOR_STACK_SIZE = 10
 DEFAULT_CALLSIGNS_CACHE_SIZE = 250
 DEFAULT_COORDINATES_CACHE_SIZE = 250
 
@@ -26,15 +30,36 @@ DEFAULT_COORDINATES_CACHE_SIZE = 250
 class FeedAggregator:
     """Aggregates date received from the feed over a period of time."""
 
-    def __init__(self, filter_radius: float = None) -> None:
-        """Initialise feed aggregator."""
+    def __init__(
+        self,
+        filter_radius: float = None,
+        aircraft_database: AircraftDatabase = None,
+        reuse_entries: bool = False,
+        window_duration: datetime.timedelta = DEFAULT_WINDOW_DURATION,
+        intern_table: InternTable = INTERN_TABLE,
+    ) -> None:
+        """Initialise feed aggregator.
+
+        With reuse_entries, one entry per aircraft is kept and updated in
+        place for as long as the aircraft is in the feed, if the feed is a
+        Feed whose parsed data can be fetched. All aircrafts
+        received within the window duration are kept track of in the window.
+        Callsigns are interned through the intern table, which should be the
+        one of the feed.
+        """
         self._filter_radius = filter_radius
-        self._stack = collections.deque(
-            DEFAULT_AGGREGATOR_STACK_SIZE * [[]], DEFAULT_AGGREGATOR_STACK_SIZE
-        )
+        self._aircraft_database = aircraft_database
+        self._smoother = None
+        self._window = SnapshotWindow(window_duration)
         self._callsigns = FixedSizeDict(max=DEFAULT_CALLSIGNS_CACHE_SIZE)
         self._coordinates = FixedSizeDict(max=DEFAULT_COORDINATES_CACHE_SIZE)
         self._statistics = Statistics()
+        self._filters = []
+        self._pushdown_base = None
+        self._pushdown_versions = None
+        self._reuse_entries = reuse_entries
+        self._intern_table = intern_table
+        self._entries = {}
 
     def __repr__(self) -> str:
         """Return string representation of this feed aggregator."""
@@ -45,22 +70,132 @@ class FeedAggregator:
         """Return the external feed access."""
         return None
 
+    @property
+    def aircraft_database(self) -> Optional[AircraftDatabase]:
+        """Return the database aircraft details are looked up in."""
+        return self._aircraft_database
+
+    @aircraft_database.setter
+    def aircraft_database(self, value: Optional[AircraftDatabase]) -> None:
+        """Set the database aircraft details are looked up in."""
+        self._aircraft_database = value
+
+    @property
+    def smoother(self) -> Optional[PositionSmoother]:
+        """Return the smoother applied to the positions received."""
+        return self._smoother
+
+    @smoother.setter
+    def smoother(self, value: Optional[PositionSmoother]) -> None:
+        """Set the smoother applied to the positions received."""
+        self._smoother = value
+
+    @property
+    def callsigns(self) -> FixedSizeDict:
+        """Return the cache of the latest callsign by external id."""
+        return self._callsigns
+
+    @property
+    def coordinates(self) -> FixedSizeDict:
+        """Return the cache of the latest coordinates by external id."""
+        return self._coordinates
+
+    @property
+    def statistics(self) -> Statistics:
+        """Return the statistics of all aircrafts seen."""
+        return self._statistics
+
+    @property
+    def window(self) -> SnapshotWindow:
+        """Return the aircrafts received within the recent window."""
+        return self._window
+
+    @property
+    def metrics(self) -> Optional[FeedMetrics]:
+        """Return the metrics of the external feed, if it has any."""
+        return getattr(self.feed, "metrics", None)
+
+    def add_filter(self, predicate: Callable[[FeedEntry], bool]) -> None:
+        """Add predicate that entries must satisfy to be included.
+
+        The checks of a filter pipeline on the parsed data are also pushed
+        down into the feed, to drop excluded aircrafts while parsing. Checks
+        added to the pipeline later on are pushed down on the next update.
+        """
+        self._filters.append(predicate)
+        self._sync_pushdown()
+
+    def _sync_pushdown(self) -> None:
+        """Push the checks of all filter pipelines down into the feed."""
+        if not isinstance(self.feed, Feed):
+            return
+        pipelines = [
+            predicate
+            for predicate in self._filters
+            if isinstance(predicate, FilterPipeline)
+        ]
+        versions = [(id(pipeline), pipeline.version) for pipeline in pipelines]
+        if versions == self._pushdown_versions:
+            return
+        if self._pushdown_versions is None:
+            # Keep the checks the feed was set up with.
+            self._pushdown_base = self.feed.pushdown_filter
+        self._pushdown_versions = versions
+        pushdown_filter = self._pushdown_base
+        for pipeline in pipelines:
+            pipeline_filter = pipeline.pushdown()
+            if pipeline_filter is not None:
+                pushdown_filter = pipeline_filter.merge(pushdown_filter)
+        self.feed.pushdown_filter = pushdown_filter
+
     async def update(self) -> Tuple[str, Optional[Dict[str, FeedEntry]]]:
         """Update from external source, aggregate with previous data and
         return filtered entries."""
-        status, data = await self.feed.update()
+        self._sync_pushdown()
+        if self._reuse_entries and isinstance(self.feed, Feed):
+            # Entries are only created for new aircrafts, the kept entries
+            # are updated with the parsed data.
+            status, parsed = await self.feed.fetch_data()
+            filled = set()
+            if parsed:
+                # Fill in some gaps in data received.
+                filled = await self._update_cache(parsed)
+            data = self._reuse(parsed)
+        else:
+            status, data = await self.feed.update()
+            filled = set()
+            if data:
+                # Fill in some gaps in data received.
+                filled = await self._update_cache(
+                    {key: entry.data for key, entry in data.items()}, data
+                )
+        # Aircrafts dropped while parsing still count for caches and statistics.
+        dropped = self.feed.dropped if isinstance(self.feed, Feed) else {}
+        if dropped:
+            await self._update_cache(dropped)
         if status == UPDATE_OK:
-            self._stack.pop()
-            self._stack.appendleft(data)
-        if data:
-            # Fill in some gaps in data received.
-            await self._update_cache(data)
+            if self._smoother is not None:
+                self._smoother.apply(data, filled)
+            self._window.add(data)
+        if data or dropped:
+            data = data or {}
             # Update statistics
-            await self._statistics.retrieval_successful(data.keys())
+            await self._statistics.retrieval_successful(data.keys() | dropped.keys())
             # Filter entries.
             filtered_entries = await self._filter_entries(data.values())
+            metrics = self.metrics
+            if metrics is not None:
+                metrics.aircrafts_filtered.inc(
+                    len(data) + len(dropped) - len(filtered_entries)
+                )
+                metrics.aircrafts_kept.inc(len(filtered_entries))
             # Insert statistics data.
             await self._insert_statistics_data(filtered_entries)
+            # Provide access to aircraft details.
+            if self._aircraft_database is not None:
+                for entry in filtered_entries:
+                    if entry.aircraft_database is not self._aircraft_database:
+                        entry.aircraft_database = self._aircraft_database
             # filtered_entries = self._insert_statistics_data(filtered_entries)
             # Rebuild the entries and use external id as key.
             result_entries = {entry.external_id: entry for entry in filtered_entries}
@@ -69,35 +204,89 @@ class FeedAggregator:
         await self._statistics.retrieval_unsuccessful()
         return status, None
 
-    async def _update_cache(self, data: [str, FeedEntry]) -> None:
-        for key in data:
+    def _reuse(
+        self, parsed: Optional[Dict[str, Dict]]
+    ) -> Optional[Dict[str, FeedEntry]]:
+        """Update the kept entries with the parsed data and return them.
+
+        Entries are only created for aircrafts new in the feed.
+        """
+        entries = {}
+        for key, values in (parsed or {}).items():
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self.feed.create_entry(values)
+            else:
+                entry.update_data(values)
+            entries[key] = entry
+        # Entries of aircrafts no longer in the feed are released.
+        self._entries = entries
+        return entries if parsed else None
+
+    async def _update_cache(
+        self, data: Dict[str, Dict], entries: Dict[str, FeedEntry] = None
+    ) -> Set[str]:
+        """Fill in missing callsigns and coordinates from previous updates.
+
+        The data is filled in directly, or through the entries holding it.
+        Return the keys of the data with coordinates filled in.
+        """
+        filled = set()
+        # Lookups of missing values: callsign hits and misses, coordinates
+        # hits and misses.
+        lookups = [0, 0, 0, 0]
+
+        def _fill(key: str, values: Dict, attribute: str, value) -> None:
+            if entries is None:
+                values[attribute] = value
+            else:
+                entries[key].override(attribute, value)
+
+        for key, values in data.items():
+            callsign = values.get(ATTR_CALLSIGN)
+            callsign = self._intern_table.intern(callsign.strip()) if callsign else None
             # Keep record of callsigns.
-            if key not in self._callsigns and data[key].callsign:
-                self._callsigns[key] = data[key].callsign
+            if key not in self._callsigns and callsign:
+                self._callsigns[key] = callsign
             # Fill in callsign from previous update if currently missing.
-            if not data[key].callsign and key in self._callsigns:
-                data[key].override(ATTR_CALLSIGN, self._callsigns[key])
+            if not callsign:
+                if key in self._callsigns:
+                    _fill(key, values, ATTR_CALLSIGN, self._callsigns[key])
+                    lookups[0] += 1
+                else:
+                    lookups[1] += 1
             # Keep record of latest coordinates.
             # Here we are considering (lat=0, lon=0) as unwanted
             # coordinates, despite the fact that they are valid.
             # Typically, coordinates (0, 0) indicate that the correct
             # coordinates have not been received.
-            if (
-                data[key].coordinates
-                and data[key].coordinates != INVALID_COORDINATES
-                and data[key].coordinates != NONE_COORDINATES
-            ):
-                self._coordinates[key] = data[key].coordinates
+            coordinates = (values.get(ATTR_LATITUDE), values.get(ATTR_LONGITUDE))
+            if coordinates != INVALID_COORDINATES and coordinates != NONE_COORDINATES:
+                self._coordinates[key] = coordinates
             # Fill in missing coordinates.
-            if (
-                not data[key].coordinates
-                or data[key].coordinates == INVALID_COORDINATES
-                or data[key].coordinates == NONE_COORDINATES
-            ) and key in self._coordinates:
-                data[key].override(ATTR_LATITUDE, self._coordinates[key][0])
-                data[key].override(ATTR_LONGITUDE, self._coordinates[key][1])
+            elif key in self._coordinates:
+                _fill(key, values, ATTR_LATITUDE, self._coordinates[key][0])
+                _fill(key, values, ATTR_LONGITUDE, self._coordinates[key][1])
+                filled.add(key)
+                lookups[2] += 1
+            else:
+                lookups[3] += 1
+        metrics = self.metrics
+        if metrics is not None:
+            for (cache, hit), count in zip(
+                (
+                    ("callsign", True),
+                    ("callsign", False),
+                    ("coordinates", True),
+                    ("coordinates", False),
+                ),
+                lookups,
+            ):
+                if count:
+                    metrics.cache_lookup(cache, hit, count)
         _LOGGER.debug("Callsigns = %s", self._callsigns)
         _LOGGER.debug("Coordinates = %s", self._coordinates)
+        return filled
 
     async def _filter_entries(self, entries: List[FeedEntry]) -> List[FeedEntry]:
         """Filter the provided entries."""
@@ -113,16 +302,30 @@ class FeedAggregator:
         )
         # Always remove entries on the ground (altitude: 0).
         filtered_entries = list(
-            filter(lambda entry: entry.altitude > 0, filtered_entries)
+            filter(
+                lambda entry: entry.altitude is not None and entry.altitude > 0,
+                filtered_entries,
+            )
         )
         # Filter by distance.
         if self._filter_radius:
-            filtered_entries = list(
-                filter(
-                    lambda entry: entry.distance_to_home <= self._filter_radius,
-                    filtered_entries,
+            # Entries share their home coordinates, so boxes are computed once.
+            boxes = {}
+
+            def _within_radius(entry: FeedEntry) -> bool:
+                home_coordinates = entry.home_coordinates
+                box = boxes.get(home_coordinates)
+                if box is None:
+                    box = radius_bounding_box(home_coordinates, self._filter_radius)
+                    boxes[home_coordinates] = box
+                return within_radius(
+                    home_coordinates, entry.coordinates, self._filter_radius, box
                 )
-            )
+
+            filtered_entries = list(filter(_within_radius, filtered_entries))
+        # Apply additional filters.
+        for predicate in self._filters:
+            filtered_entries = list(filter(predicate, filtered_entries))
         return filtered_entries
 
     async def _insert_statistics_data(self, entries: List[FeedEntry]) -> None:
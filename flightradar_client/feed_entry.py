@@ -5,6 +5,8 @@ from typing import Dict, Optional, Tuple
 
 from haversine import haversine
 
+from .aircraft_database import AircraftDatabase, AircraftInfo
+from .classification import airline_for_callsign, country_for_address
 from .consts import (
     ATTR_ALTITUDE,
     ATTR_CALLSIGN,
@@ -18,18 +20,35 @@ from .consts import (
     ATTR_VERT_RATE,
 )
 from .statistics import StatisticsData
+from .utils import INTERN_TABLE, InternTable
 
 _LOGGER = logging.getLogger(__name__)
 
+# Marker for aircraft details that have not been looked up yet.
+_NOT_LOADED = object()
+
 
 class FeedEntry:
     """Feed entry class."""
 
-    def __init__(self, home_coordinates: Tuple[float, float], data: Dict) -> None:
+    def __init__(
+        self,
+        home_coordinates: Tuple[float, float],
+        data: Dict,
+        intern_table: InternTable = INTERN_TABLE,
+    ) -> None:
         """Initialise this feed entry."""
         self._home_coordinates = home_coordinates
         self._data = data
+        self._intern_table = intern_table
         self._statistics = None
+        self._aircraft_database = None
+        self._aircraft_info = _NOT_LOADED
+        self._country = _NOT_LOADED
+        self._airline = _NOT_LOADED
+        self._callsign = _NOT_LOADED
+        self._estimates = None
+        self._version = 1
 
     def __repr__(self) -> str:
         """Return string representation of this entry."""
@@ -39,15 +58,72 @@ class FeedEntry:
         """Override value in original data."""
         if self._data:
             self._data[key] = value
+            if key == ATTR_CALLSIGN:
+                self._airline = _NOT_LOADED
+                self._callsign = _NOT_LOADED
+            elif key == ATTR_MODE_S:
+                self._country = _NOT_LOADED
+
+    def update_data(self, data: Dict) -> bool:
+        """Replace the data in place, return whether anything has changed."""
+        if data == self._data:
+            return False
+        if self._data is None:
+            self._data = dict(data)
+        else:
+            if data.get(ATTR_CALLSIGN) != self._data.get(ATTR_CALLSIGN):
+                self._airline = _NOT_LOADED
+                self._callsign = _NOT_LOADED
+            if data.get(ATTR_MODE_S) != self._data.get(ATTR_MODE_S):
+                self._country = _NOT_LOADED
+                self._aircraft_info = _NOT_LOADED
+            self._data.clear()
+            self._data.update(data)
+        self._version += 1
+        return True
+
+    @property
+    def estimates(self) -> Optional[Dict]:
+        """Return the estimated values used instead of the data received."""
+        return self._estimates
+
+    @estimates.setter
+    def estimates(self, value: Optional[Dict]) -> None:
+        """Set estimated values, kept apart from the data received.
+
+        Coordinates, speed and track can be estimated, for example by a
+        position smoother. Estimates do not change the version.
+        """
+        self._estimates = value
+
+    @property
+    def version(self) -> int:
+        """Return the version of the data, increased with every change."""
+        return self._version
+
+    @property
+    def data(self) -> Optional[Dict]:
+        """Return the original data of this entry."""
+        return self._data
 
     @property
     def coordinates(self) -> Optional[Tuple[float, float]]:
         """Return the coordinates of this entry."""
         if self._data:
+            if self._estimates and ATTR_LATITUDE in self._estimates:
+                return (
+                    self._estimates[ATTR_LATITUDE],
+                    self._estimates[ATTR_LONGITUDE],
+                )
             coordinates = (self._data[ATTR_LATITUDE], self._data[ATTR_LONGITUDE])
             return coordinates
         return None
 
+    @property
+    def home_coordinates(self) -> Optional[Tuple[float, float]]:
+        """Return the home coordinates used to calculate the distance."""
+        return self._home_coordinates
+
     @property
     def distance_to_home(self) -> float:
         """Return the distance in km of this entry to the home coordinates."""
@@ -74,16 +150,20 @@ class FeedEntry:
     def callsign(self) -> Optional[str]:
         """Return the callsign of this entry."""
         if self._data:
-            callsign = self._data[ATTR_CALLSIGN]
-            if callsign:
-                callsign = callsign.strip()
-            return callsign
+            if self._callsign is _NOT_LOADED:
+                callsign = self._data[ATTR_CALLSIGN]
+                if callsign:
+                    callsign = self._intern_table.intern(callsign.strip())
+                self._callsign = callsign
+            return self._callsign
         return None
 
     @property
     def speed(self) -> Optional[int]:
         """Return the speed of this entry."""
         if self._data:
+            if self._estimates and ATTR_SPEED in self._estimates:
+                return self._estimates[ATTR_SPEED]
             return self._data[ATTR_SPEED]
         return None
 
@@ -91,6 +171,8 @@ class FeedEntry:
     def track(self) -> Optional[int]:
         """Return the track of this entry."""
         if self._data:
+            if self._estimates and ATTR_TRACK in self._estimates:
+                return self._estimates[ATTR_TRACK]
             return self._data[ATTR_TRACK]
         return None
 
@@ -129,3 +211,66 @@ class FeedEntry:
     def statistics(self, value: Optional[StatisticsData]) -> None:
         """Set statistics value."""
         self._statistics = value
+
+    @property
+    def aircraft_database(self) -> Optional[AircraftDatabase]:
+        """Return the database aircraft details are looked up in."""
+        return self._aircraft_database
+
+    @aircraft_database.setter
+    def aircraft_database(self, value: Optional[AircraftDatabase]) -> None:
+        """Set the database aircraft details are looked up in."""
+        self._aircraft_database = value
+        self._aircraft_info = _NOT_LOADED
+
+    @property
+    def aircraft_info(self) -> Optional[AircraftInfo]:
+        """Return the aircraft details, looked up on first access."""
+        if self._aircraft_info is _NOT_LOADED:
+            self._aircraft_info = None
+            if self._aircraft_database is not None and self.external_id:
+                self._aircraft_info = self._aircraft_database.lookup(self.external_id)
+        return self._aircraft_info
+
+    @property
+    def registration(self) -> Optional[str]:
+        """Return the registration of this entry."""
+        aircraft_info = self.aircraft_info
+        return aircraft_info.registration if aircraft_info else None
+
+    @property
+    def aircraft_type(self) -> Optional[str]:
+        """Return the ICAO aircraft type designator of this entry."""
+        aircraft_info = self.aircraft_info
+        return aircraft_info.aircraft_type if aircraft_info else None
+
+    @property
+    def operator(self) -> Optional[str]:
+        """Return the operator of this entry."""
+        aircraft_info = self.aircraft_info
+        return aircraft_info.operator if aircraft_info else None
+
+    @property
+    def country(self) -> Optional[str]:
+        """Return the code of the country the aircraft is registered in."""
+        if self._country is _NOT_LOADED:
+            self._country = country_for_address(self.external_id)
+        return self._country
+
+    @property
+    def airline_designator(self) -> Optional[str]:
+        """Return the ICAO designator of the airline operating the flight."""
+        airline = self._airline_match()
+        return airline[0] if airline else None
+
+    @property
+    def airline(self) -> Optional[str]:
+        """Return the name of the airline operating the flight."""
+        airline = self._airline_match()
+        return airline[1] if airline else None
+
+    def _airline_match(self) -> Optional[Tuple[str, str]]:
+        """Return designator and name of the airline, looked up once."""
+        if self._airline is _NOT_LOADED:
+            self._airline = airline_for_callsign(self.callsign)
+        return self._airline
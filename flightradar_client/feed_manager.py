@@ -3,11 +3,14 @@ Base class for the feed manager.
 
 This allows managing feeds and their entries throughout their life-cycle.
 """
+import datetime
 import logging
-from typing import Awaitable, Callable, Set
+import time
+from typing import Awaitable, Callable, Dict, Optional, Set
 
 from .consts import UPDATE_OK
 from .feed_aggregator import FeedAggregator
+from .feed_entry import FeedEntry
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -22,8 +25,15 @@ class FeedManagerBase:
         update_callback: Callable[[str], Awaitable[None]],
         remove_callback: Callable[[str], Awaitable[None]],
         persistent_timestamp: bool = False,
+        coalesce_updates: bool = False,
     ) -> None:
-        """Initialise feed manager."""
+        """Initialise feed manager.
+
+        With coalesce_updates only one update runs at a time. Updates
+        requested in the meantime are merged into a single follow-up update
+        of the latest feed data. With persistent_timestamp the timestamp of
+        the most recent entry is kept, and restored with the manager state.
+        """
         self._feed = feed
         self.feed_entries = {}
         self._managed_external_ids = set()
@@ -31,18 +41,79 @@ class FeedManagerBase:
         self._update_callback = update_callback
         self._remove_callback = remove_callback
         self._persistent_timestamp = persistent_timestamp
+        self._last_timestamp = None
+        self._listeners = []
+        self._coalesce_updates = coalesce_updates
+        self._updating = False
+        self._update_pending = False
 
     def __repr__(self) -> str:
         """Return string representation of this feed."""
         return "<{}(feed={})>".format(self.__class__.__name__, self._feed)
 
+    @property
+    def managed_external_ids(self) -> Set[str]:
+        """Return the external ids of all entities generated."""
+        return self._managed_external_ids
+
+    @property
+    def persistent_timestamp(self) -> bool:
+        """Return whether the timestamp of the latest entry is kept."""
+        return self._persistent_timestamp
+
+    @property
+    def last_timestamp(self) -> Optional[datetime.datetime]:
+        """Return the timestamp of the most recent entry received."""
+        return self._last_timestamp
+
+    @last_timestamp.setter
+    def last_timestamp(self, value: Optional[datetime.datetime]) -> None:
+        """Set the timestamp of the most recent entry received."""
+        self._last_timestamp = value
+
+    def add_listener(
+        self, listener: Callable[[Dict[str, FeedEntry]], Awaitable[None]]
+    ) -> None:
+        """Add listener called with all current feed entries after each update."""
+        self._listeners.append(listener)
+
+    def remove_listener(
+        self, listener: Callable[[Dict[str, FeedEntry]], Awaitable[None]]
+    ) -> None:
+        """Remove previously added listener."""
+        self._listeners.remove(listener)
+
     async def update(self, event) -> None:
         """Update the feed and then update connected entities."""
+        if not self._coalesce_updates:
+            await self._update()
+            return
+        if self._updating:
+            # Picked up by the running update once it has finished.
+            self._update_pending = True
+            metrics = getattr(self._feed, "metrics", None)
+            if metrics is not None:
+                metrics.updates_coalesced.inc()
+            return
+        self._updating = True
+        try:
+            while True:
+                self._update_pending = False
+                await self._update()
+                if not self._update_pending:
+                    break
+        finally:
+            self._updating = False
+
+    async def _update(self) -> None:
+        """Update the feed once and then update connected entities."""
         status, feed_entries = await self._feed.update()
         if status == UPDATE_OK:
             _LOGGER.debug("Data retrieved %s", feed_entries)
             # Keep a copy of all feed entries for future lookups by entities.
-            self.feed_entries = feed_entries
+            self.feed_entries = feed_entries or {}
+            if self._persistent_timestamp:
+                self._update_last_timestamp()
             # For entity management the external ids from the feed are used.
             feed_external_ids = set(self.feed_entries)
             remove_external_ids = self._managed_external_ids.difference(
@@ -61,28 +132,64 @@ class FeedManagerBase:
             _LOGGER.warning(
                 "Update not successful, no data received from %s", self._feed
             )
+            metrics = getattr(self._feed, "metrics", None)
+            if metrics is not None:
+                metrics.error("update")
             # Remove all entities.
             await self._remove_entities(self._managed_external_ids.copy())
             # Remove all feed entries and managed external ids.
             self.feed_entries.clear()
             self._managed_external_ids.clear()
+        await self._notify_listeners()
+
+    def _update_last_timestamp(self) -> None:
+        """Keep the timestamp of the most recent entry."""
+        for entry in self.feed_entries.values():
+            updated = entry.updated
+            if updated and (
+                self._last_timestamp is None or updated > self._last_timestamp
+            ):
+                self._last_timestamp = updated
+
+    async def _notify_listeners(self) -> None:
+        """Pass the current feed entries on to all listeners."""
+        for listener in self._listeners:
+            await listener(self.feed_entries)
+
+    def _timed(
+        self, name: str, callback: Callable[[str], Awaitable[None]]
+    ) -> Callable[[str], Awaitable[None]]:
+        """Return the callback, recording its duration if the feed has metrics."""
+        metrics = getattr(self._feed, "metrics", None)
+        if metrics is None:
+            return callback
+
+        async def _callback(external_id: str) -> None:
+            start = time.perf_counter()
+            await callback(external_id)
+            metrics.callback_duration(name, time.perf_counter() - start)
+
+        return _callback
 
     async def _generate_new_entities(self, external_ids: Set[str]) -> None:
         """Generate new entities for events."""
+        generate_callback = self._timed("generate", self._generate_callback)
         for external_id in external_ids:
-            await self._generate_callback(external_id)
+            await generate_callback(external_id)
             _LOGGER.debug("New entity added %s", external_id)
             self._managed_external_ids.add(external_id)
 
     async def _update_entities(self, external_ids: Set[str]) -> None:
         """Update entities."""
+        update_callback = self._timed("update", self._update_callback)
         for external_id in external_ids:
             _LOGGER.debug("Existing entity found %s", external_id)
-            await self._update_callback(external_id)
+            await update_callback(external_id)
 
     async def _remove_entities(self, external_ids: Set[str]) -> None:
         """Remove entities."""
+        remove_callback = self._timed("remove", self._remove_callback)
         for external_id in external_ids:
             _LOGGER.debug("Entity not current anymore %s", external_id)
             self._managed_external_ids.remove(external_id)
-            await self._remove_callback(external_id)
+            await remove_callback(external_id)
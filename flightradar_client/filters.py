@@ -0,0 +1,509 @@
+"""
+Filter pipeline.
+
+Declarative filters on aircraft data, combined into a single predicate that
+evaluates the cheapest checks first. The checks on the parsed data can be
+pushed down into the feed, so that aircrafts are dropped while parsing,
+before any feed entry is created.
+"""
+import abc
+import datetime
+import logging
+import math
+import re
+from typing import Any, Callable, Collection, Dict, List, Optional, Tuple
+
+from haversine import haversine
+
+from .approach import predict_approach
+from .consts import (
+    ATTR_ALTITUDE,
+    ATTR_CALLSIGN,
+    ATTR_LATITUDE,
+    ATTR_LONGITUDE,
+    ATTR_MODE_S,
+    ATTR_SPEED,
+    ATTR_SQUAWK,
+    ATTR_TRACK,
+    INVALID_COORDINATES,
+)
+from .feed_entry import FeedEntry
+
+_LOGGER = logging.getLogger(__name__)
+
+# Kilometres per degree of latitude, slightly less than the actual distance
+# so that the bounding box always contains the circle.
+KM_PER_DEGREE = 111.0
+
+# Attributes of aircrafts dropped while parsing that are still reported, so
+# that the aggregator keeps its caches and statistics up to date.
+DROPPED_ATTRIBUTES = (ATTR_MODE_S, ATTR_CALLSIGN, ATTR_LATITUDE, ATTR_LONGITUDE)
+
+
+def radius_bounding_box(
+    home_coordinates: Tuple[float, float], radius: float
+) -> Tuple[float, float, float, float]:
+    """Return (south, west, north, east) of a box containing the circle."""
+    latitude, longitude = home_coordinates
+    delta_latitude = radius / KM_PER_DEGREE
+    south = latitude - delta_latitude
+    north = latitude + delta_latitude
+    if south <= -90 or north >= 90:
+        # Circle contains a pole.
+        return max(south, -90.0), -180.0, min(north, 90.0), 180.0
+    cosine = min(math.cos(math.radians(south)), math.cos(math.radians(north)))
+    delta_longitude = radius / (KM_PER_DEGREE * cosine)
+    if delta_longitude >= 180:
+        return south, -180.0, north, 180.0
+    return (
+        south,
+        _normalise_longitude(longitude - delta_longitude),
+        north,
+        _normalise_longitude(longitude + delta_longitude),
+    )
+
+
+def _normalise_longitude(longitude: float) -> float:
+    """Wrap the longitude into -180 to 180 degrees."""
+    return (longitude + 180.0) % 360.0 - 180.0
+
+
+def in_bounding_box(
+    coordinates: Tuple[float, float],
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+) -> bool:
+    """Check whether the coordinates are inside the box.
+
+    Boxes crossing the antimeridian have a west longitude greater than their
+    east longitude.
+    """
+    latitude, longitude = coordinates
+    if not south <= latitude <= north:
+        return False
+    if west <= east:
+        return west <= longitude <= east
+    return longitude >= west or longitude <= east
+
+
+def within_radius(
+    home_coordinates: Tuple[float, float],
+    coordinates: Tuple[float, float],
+    radius: float,
+    bounding_box: Tuple[float, float, float, float] = None,
+) -> bool:
+    """Check the distance, rejecting far away coordinates by bounding box."""
+    if bounding_box is None:
+        bounding_box = radius_bounding_box(home_coordinates, radius)
+    if not in_bounding_box(coordinates, *bounding_box):
+        return False
+    return haversine(home_coordinates, coordinates) <= radius
+
+
+def _coordinates(data: Dict) -> Optional[Tuple[float, float]]:
+    """Return the coordinates, or None if they are not known."""
+    coordinates = (data.get(ATTR_LATITUDE), data.get(ATTR_LONGITUDE))
+    if (
+        coordinates[0] is None
+        or coordinates[1] is None
+        or coordinates == INVALID_COORDINATES
+    ):
+        return None
+    return coordinates
+
+
+class RawFields:
+    """View of the raw fields of an aircraft under the parsed data keys.
+
+    Lets the parsers check an aircraft before building its data. Parsers
+    wrap each raw aircraft in turn, so one view is kept per parse.
+    """
+
+    __slots__ = ("_keys", "_raw")
+
+    def __init__(self, keys: Dict[str, Any]) -> None:
+        """Initialise view with the raw key or index of each data key."""
+        self._keys = keys
+        self._raw = None
+
+    def wrap(self, raw) -> "RawFields":
+        """Show the fields of another raw aircraft."""
+        self._raw = raw
+        return self
+
+    def get(self, name: str, default=None):
+        """Return the raw value of a data key."""
+        key = self._keys.get(name)
+        if key is None:
+            return default
+        try:
+            return self._raw[key]
+        except (KeyError, IndexError):
+            return default
+
+    def extract(self, names: Collection[str] = DROPPED_ATTRIBUTES) -> Dict:
+        """Return the data of some keys only."""
+        return {name: self.get(name) for name in names}
+
+
+class FilterStage(abc.ABC):
+    """Single check on the parsed data of an aircraft.
+
+    The data may also be a RawFields view, so checks only use get.
+    """
+
+    # Relative cost of the check, cheaper checks run first.
+    cost = 1
+    # Whether the aggregator fills in the checked value if it is missing.
+    filled_in = False
+
+    @abc.abstractmethod
+    def __call__(self, data: Dict) -> bool:
+        """Check the data."""
+
+    def known(self, data: Dict) -> bool:
+        """Check whether the value the check depends on is known."""
+        return True
+
+    def pushdown(self, data: Dict) -> bool:
+        """Check the data while parsing.
+
+        Values the aggregator fills in are only checked if they are known,
+        otherwise the aircraft is kept for the final check.
+        """
+        if self.filled_in and not self.known(data):
+            return True
+        return self(data)
+
+
+class AltitudeBand(FilterStage):
+    """Altitude in feet within the band, on the ground counts as 0."""
+
+    def __init__(self, minimum: float = None, maximum: float = None) -> None:
+        """Initialise altitude band."""
+        self._minimum = minimum
+        self._maximum = maximum
+
+    def __repr__(self) -> str:
+        """Return string representation of this stage."""
+        return "<{}(minimum={}, maximum={})>".format(
+            self.__class__.__name__, self._minimum, self._maximum
+        )
+
+    def __call__(self, data: Dict) -> bool:
+        """Check the altitude."""
+        altitude = data.get(ATTR_ALTITUDE)
+        if altitude == "ground":
+            altitude = 0
+        return _in_range(altitude, self._minimum, self._maximum)
+
+
+class SpeedRange(FilterStage):
+    """Speed in knots within the range."""
+
+    def __init__(self, minimum: float = None, maximum: float = None) -> None:
+        """Initialise speed range."""
+        self._minimum = minimum
+        self._maximum = maximum
+
+    def __repr__(self) -> str:
+        """Return string representation of this stage."""
+        return "<{}(minimum={}, maximum={})>".format(
+            self.__class__.__name__, self._minimum, self._maximum
+        )
+
+    def __call__(self, data: Dict) -> bool:
+        """Check the speed."""
+        return _in_range(data.get(ATTR_SPEED), self._minimum, self._maximum)
+
+
+def _in_range(value, minimum, maximum) -> bool:
+    """Check whether a known value is within the optional limits."""
+    if value is None:
+        return False
+    if minimum is not None and value < minimum:
+        return False
+    if maximum is not None and value > maximum:
+        return False
+    return True
+
+
+class Squawks(FilterStage):
+    """Squawk code is one of the codes."""
+
+    def __init__(self, squawks: Collection[str]) -> None:
+        """Initialise squawk set."""
+        self._squawks = frozenset(squawks)
+
+    def __repr__(self) -> str:
+        """Return string representation of this stage."""
+        return "<{}(squawks={})>".format(self.__class__.__name__, sorted(self._squawks))
+
+    def __call__(self, data: Dict) -> bool:
+        """Check the squawk code."""
+        return data.get(ATTR_SQUAWK) in self._squawks
+
+
+class BoundingBox(FilterStage):
+    """Coordinates within the box."""
+
+    cost = 2
+    filled_in = True
+
+    def __init__(self, south: float, west: float, north: float, east: float) -> None:
+        """Initialise bounding box."""
+        self._box = (south, west, north, east)
+
+    def __repr__(self) -> str:
+        """Return string representation of this stage."""
+        return "<{}(box={})>".format(self.__class__.__name__, self._box)
+
+    def __call__(self, data: Dict) -> bool:
+        """Check the coordinates."""
+        coordinates = _coordinates(data)
+        return coordinates is not None and in_bounding_box(coordinates, *self._box)
+
+    def known(self, data: Dict) -> bool:
+        """Check whether the coordinates are known."""
+        return _coordinates(data) is not None
+
+
+class Radius(FilterStage):
+    """Coordinates within the radius in km around the home coordinates."""
+
+    cost = 3
+    filled_in = True
+
+    def __init__(self, home_coordinates: Tuple[float, float], radius: float) -> None:
+        """Initialise radius."""
+        self._home_coordinates = home_coordinates
+        self._radius = radius
+        self._box = radius_bounding_box(home_coordinates, radius)
+
+    def __repr__(self) -> str:
+        """Return string representation of this stage."""
+        return "<{}(home={}, radius={})>".format(
+            self.__class__.__name__, self._home_coordinates, self._radius
+        )
+
+    def __call__(self, data: Dict) -> bool:
+        """Check the distance."""
+        coordinates = _coordinates(data)
+        return coordinates is not None and within_radius(
+            self._home_coordinates, coordinates, self._radius, self._box
+        )
+
+    def known(self, data: Dict) -> bool:
+        """Check whether the coordinates are known."""
+        return _coordinates(data) is not None
+
+
+class Approaching(FilterStage):
+    """Predicted to pass within the distance in km of home within the period.
+
+    Aircrafts within the optional radius are kept as well. Use it instead
+    of the aggregator's filter radius to keep aircrafts from before they
+    enter the radius.
+    """
+
+    cost = 3
+    filled_in = True
+
+    def __init__(
+        self,
+        home_coordinates: Tuple[float, float],
+        distance: float,
+        period: datetime.timedelta,
+        radius: float = None,
+    ) -> None:
+        """Initialise approach check."""
+        self._home_coordinates = home_coordinates
+        self._distance = distance
+        self._period = period.total_seconds()
+        self._radius = radius
+        self._box = radius_bounding_box(home_coordinates, radius) if radius else None
+
+    def __repr__(self) -> str:
+        """Return string representation of this stage."""
+        return "<{}(home={}, distance={}, period={}, radius={})>".format(
+            self.__class__.__name__,
+            self._home_coordinates,
+            self._distance,
+            datetime.timedelta(seconds=self._period),
+            self._radius,
+        )
+
+    def __call__(self, data: Dict) -> bool:
+        """Check the predicted closest approach."""
+        coordinates = _coordinates(data)
+        if coordinates is None:
+            return False
+        if self._radius and within_radius(
+            self._home_coordinates, coordinates, self._radius, self._box
+        ):
+            return True
+        approach = predict_approach(
+            self._home_coordinates,
+            coordinates,
+            data.get(ATTR_SPEED),
+            data.get(ATTR_TRACK),
+        )
+        return (
+            approach is not None
+            and approach.distance <= self._distance
+            and approach.seconds <= self._period
+        )
+
+    def known(self, data: Dict) -> bool:
+        """Check whether the coordinates are known."""
+        return _coordinates(data) is not None
+
+
+class CallsignPattern(FilterStage):
+    """Callsign, without surrounding whitespace, matching the pattern."""
+
+    cost = 4
+    filled_in = True
+
+    def __init__(self, pattern: str) -> None:
+        """Initialise callsign pattern."""
+        self._pattern = re.compile(pattern)
+
+    def __repr__(self) -> str:
+        """Return string representation of this stage."""
+        return "<{}(pattern={})>".format(self.__class__.__name__, self._pattern.pattern)
+
+    def __call__(self, data: Dict) -> bool:
+        """Check the callsign."""
+        callsign = data.get(ATTR_CALLSIGN)
+        return bool(callsign) and self._pattern.match(callsign.strip()) is not None
+
+    def known(self, data: Dict) -> bool:
+        """Check whether the callsign is known, as the aggregator sees it."""
+        callsign = data.get(ATTR_CALLSIGN)
+        return bool(callsign and callsign.strip())
+
+
+class PushdownFilter:
+    """Combined checks of parsed data, run by the parsers.
+
+    This can be pickled as long as all stages can, so it can be passed on to
+    a process pool.
+    """
+
+    def __init__(self, stages: List[FilterStage]) -> None:
+        """Initialise pushdown filter."""
+        self._stages = tuple(sorted(stages, key=lambda stage: stage.cost))
+
+    def __repr__(self) -> str:
+        """Return string representation of this filter."""
+        return "<{}(stages={})>".format(self.__class__.__name__, len(self._stages))
+
+    def __call__(self, data: Dict) -> bool:
+        """Check whether the aircraft may pass the final filters."""
+        for stage in self._stages:
+            if not stage.pushdown(data):
+                return False
+        return True
+
+    def merge(self, other: Optional["PushdownFilter"]) -> "PushdownFilter":
+        """Return a filter with the checks of both filters."""
+        if other is None:
+            return self
+        return PushdownFilter(list(self._stages + other._stages))
+
+
+class FilterPipeline:
+    """Declarative filters combined into a single feed entry predicate.
+
+    Use it as filter of an aggregator, which also pushes the checks of the
+    parsed data down into its feed.
+    """
+
+    def __init__(self) -> None:
+        """Initialise filter pipeline."""
+        self._stages = []
+        self._predicates = []
+        self._compiled = None
+        self._version = 0
+
+    def __repr__(self) -> str:
+        """Return string representation of this pipeline."""
+        return "<{}(stages={}, predicates={})>".format(
+            self.__class__.__name__, len(self._stages), len(self._predicates)
+        )
+
+    @property
+    def version(self) -> int:
+        """Return the number of changes to the checks of the parsed data."""
+        return self._version
+
+    def add(self, stage: FilterStage) -> "FilterPipeline":
+        """Add a check of the parsed data."""
+        self._stages.append(stage)
+        self._compiled = None
+        self._version += 1
+        return self
+
+    def altitude(self, minimum: float = None, maximum: float = None):
+        """Keep aircrafts within the altitude band in feet."""
+        return self.add(AltitudeBand(minimum, maximum))
+
+    def bounding_box(self, south: float, west: float, north: float, east: float):
+        """Keep aircrafts within the box."""
+        return self.add(BoundingBox(south, west, north, east))
+
+    def radius(self, home_coordinates: Tuple[float, float], radius: float):
+        """Keep aircrafts within the radius in km around the home coordinates."""
+        return self.add(Radius(home_coordinates, radius))
+
+    def approaching(
+        self,
+        home_coordinates: Tuple[float, float],
+        distance: float,
+        period: datetime.timedelta,
+        radius: float = None,
+    ):
+        """Keep aircrafts predicted to pass within the distance of home."""
+        return self.add(Approaching(home_coordinates, distance, period, radius))
+
+    def squawks(self, squawks: Collection[str]):
+        """Keep aircrafts squawking one of the codes."""
+        return self.add(Squawks(squawks))
+
+    def callsign(self, pattern: str):
+        """Keep aircrafts with a callsign matching the regular expression."""
+        return self.add(CallsignPattern(pattern))
+
+    def speed(self, minimum: float = None, maximum: float = None):
+        """Keep aircrafts within the speed range in knots."""
+        return self.add(SpeedRange(minimum, maximum))
+
+    def where(self, predicate: Callable[[FeedEntry], bool]) -> "FilterPipeline":
+        """Keep feed entries satisfying the predicate, checked last."""
+        self._predicates.append(predicate)
+        self._compiled = None
+        return self
+
+    def pushdown(self) -> Optional[PushdownFilter]:
+        """Return the checks to run while parsing, if any."""
+        if not self._stages:
+            return None
+        return PushdownFilter(self._stages)
+
+    def __call__(self, entry: FeedEntry) -> bool:
+        """Check whether the feed entry passes all filters."""
+        if self._compiled is None:
+            self._compiled = tuple(sorted(self._stages, key=lambda stage: stage.cost))
+        data = entry.data
+        if not data:
+            return False
+        for stage in self._compiled:
+            if not stage(data):
+                return False
+        for predicate in self._predicates:
+            if not predicate(entry):
+                return False
+        return True
@@ -3,10 +3,11 @@ Local Flightradar Flights Feed.
 
 Fetches JSON feed from a local Flightradar flights feed.
 """
+import concurrent.futures
 import logging
-from typing import Awaitable, Callable, Dict, List, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
-from aiohttp import ClientSession
+from aiohttp import ClientSession, ClientTimeout
 
 from .consts import (
     ATTR_ALTITUDE,
@@ -20,10 +21,12 @@ from .consts import (
     ATTR_UPDATED,
     ATTR_VERT_RATE,
 )
-from .feed import Feed
+from .feed import DEFAULT_TIMEOUT, Feed
 from .feed_aggregator import FeedAggregator
 from .feed_entry import FeedEntry
 from .feed_manager import FeedManagerBase
+from .filters import PushdownFilter, RawFields
+from .utils import INTERN_TABLE, InternTable
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -32,6 +35,20 @@ DEFAULT_PORT = 8754
 
 URL_TEMPLATE = "http://{}:{}/flights.json"
 
+# Indexes of the parsed data keys, to check aircrafts before parsing them.
+FLIGHT_FIELDS = {
+    ATTR_MODE_S: 0,
+    ATTR_LATITUDE: 1,
+    ATTR_LONGITUDE: 2,
+    ATTR_TRACK: 3,
+    ATTR_ALTITUDE: 4,
+    ATTR_SPEED: 5,
+    ATTR_SQUAWK: 6,
+    ATTR_UPDATED: 10,
+    ATTR_VERT_RATE: 15,
+    ATTR_CALLSIGN: 16,
+}
+
 
 class FlightradarFlightsFeedManager(FeedManagerBase):
     """Feed Manager for Flightradar Flights feed."""
@@ -47,6 +64,13 @@ class FlightradarFlightsFeedManager(FeedManagerBase):
         url: str = None,
         hostname: str = DEFAULT_HOSTNAME,
         port: int = DEFAULT_PORT,
+        executor: concurrent.futures.Executor = None,
+        reuse_entries: bool = False,
+        coalesce_updates: bool = False,
+        persistent_timestamp: bool = False,
+        mirror_urls: List[str] = None,
+        timeout: ClientTimeout = DEFAULT_TIMEOUT,
+        intern_table: InternTable = INTERN_TABLE,
     ) -> None:
         """Initialize the NSW Rural Fire Services Feed Manager."""
         feed = FlightradarFlightsFeedAggregator(
@@ -56,8 +80,20 @@ class FlightradarFlightsFeedManager(FeedManagerBase):
             url=url,
             hostname=hostname,
             port=port,
+            executor=executor,
+            mirror_urls=mirror_urls,
+            timeout=timeout,
+            reuse_entries=reuse_entries,
+            intern_table=intern_table,
+        )
+        super().__init__(
+            feed,
+            generate_callback,
+            update_callback,
+            remove_callback,
+            persistent_timestamp=persistent_timestamp,
+            coalesce_updates=coalesce_updates,
         )
-        super().__init__(feed, generate_callback, update_callback, remove_callback)
 
 
 class FlightradarFlightsFeedAggregator(FeedAggregator):
@@ -71,9 +107,16 @@ class FlightradarFlightsFeedAggregator(FeedAggregator):
         url: str = None,
         hostname: str = DEFAULT_HOSTNAME,
         port: int = DEFAULT_PORT,
+        executor: concurrent.futures.Executor = None,
+        reuse_entries: bool = False,
+        mirror_urls: List[str] = None,
+        timeout: ClientTimeout = DEFAULT_TIMEOUT,
+        intern_table: InternTable = INTERN_TABLE,
     ) -> None:
         """Initialise feed aggregator."""
-        super().__init__(filter_radius)
+        super().__init__(
+            filter_radius, reuse_entries=reuse_entries, intern_table=intern_table
+        )
         self._feed = FlightradarFlightsFeed(
             home_coordinates,
             websession,
@@ -82,6 +125,10 @@ class FlightradarFlightsFeedAggregator(FeedAggregator):
             url,
             hostname,
             port,
+            executor,
+            mirror_urls,
+            timeout,
+            intern_table,
         )
 
     @property
@@ -102,6 +149,10 @@ class FlightradarFlightsFeed(Feed):
         url: str = None,
         hostname: str = DEFAULT_HOSTNAME,
         port: int = DEFAULT_PORT,
+        executor: concurrent.futures.Executor = None,
+        mirror_urls: List[str] = None,
+        timeout: ClientTimeout = DEFAULT_TIMEOUT,
+        intern_table: InternTable = INTERN_TABLE,
     ) -> None:
         super().__init__(
             home_coordinates,
@@ -111,6 +162,10 @@ class FlightradarFlightsFeed(Feed):
             url,
             hostname,
             port,
+            executor,
+            mirror_urls,
+            timeout,
+            intern_table,
         )
 
     def _create_url(self, hostname: str, port: int) -> str:
@@ -121,26 +176,52 @@ class FlightradarFlightsFeed(Feed):
         self, home_coordinates: Tuple[float, float], feed_data: Dict
     ) -> FeedEntry:
         """Generate a new entry."""
-        return FeedEntry(home_coordinates, feed_data)
+        return FeedEntry(home_coordinates, feed_data, self.intern_table)
 
-    def _parse(self, parsed_json: Dict) -> List[Dict]:
+    def _parse(self, parsed_json: Dict, dropped: List[Dict] = None) -> List[Dict]:
         """Parse the provided JSON data."""
-        result = []
-        for key in parsed_json:
-            data_entry = parsed_json[key]
-            result.append(
-                {
-                    ATTR_MODE_S: data_entry[0],
-                    ATTR_LATITUDE: data_entry[1],
-                    ATTR_LONGITUDE: data_entry[2],
-                    ATTR_TRACK: data_entry[3],
-                    ATTR_ALTITUDE: data_entry[4],
-                    ATTR_SPEED: data_entry[5],
-                    ATTR_SQUAWK: data_entry[6],
-                    ATTR_UPDATED: data_entry[10],
-                    ATTR_VERT_RATE: data_entry[15],
-                    ATTR_CALLSIGN: data_entry[16],
-                }
-            )
-        _LOGGER.debug("Parser result = %s", result)
-        return result
+        return parse_flights(parsed_json, self.pushdown_filter, dropped)
+
+    def _parser(
+        self,
+    ) -> Callable[[Dict, Optional[PushdownFilter], List[Dict]], List[Dict]]:
+        """Return the function parsing the JSON data in an executor."""
+        return parse_flights
+
+
+def parse_flights(
+    parsed_json: Dict,
+    predicate: Callable[[Dict], bool] = None,
+    dropped: List[Dict] = None,
+) -> List[Dict]:
+    """Parse the provided Flightradar flights JSON data.
+
+    Only aircrafts satisfying the optional predicate are returned. The
+    predicate checks the raw fields, before the data is built. Identifier,
+    callsign and coordinates of the others are added to dropped, if given.
+    """
+    result = []
+    fields = RawFields(FLIGHT_FIELDS)
+    for key in parsed_json:
+        data_entry = parsed_json[key]
+        # Drop aircrafts excluded by the filters before creating entries.
+        if predicate is not None and not predicate(fields.wrap(data_entry)):
+            if dropped is not None:
+                dropped.append(fields.extract())
+            continue
+        result.append(
+            {
+                ATTR_MODE_S: data_entry[0],
+                ATTR_LATITUDE: data_entry[1],
+                ATTR_LONGITUDE: data_entry[2],
+                ATTR_TRACK: data_entry[3],
+                ATTR_ALTITUDE: data_entry[4],
+                ATTR_SPEED: data_entry[5],
+                ATTR_SQUAWK: data_entry[6],
+                ATTR_UPDATED: data_entry[10],
+                ATTR_VERT_RATE: data_entry[15],
+                ATTR_CALLSIGN: data_entry[16],
+            }
+        )
+    _LOGGER.debug("Parser result = %s", result)
+    return result
@@ -0,0 +1,209 @@
+"""
+Geofences.
+
+Watches polygons like airports, restricted zones or approach corridors and
+reports aircrafts entering and leaving them.
+"""
+import logging
+import math
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from .consts import INVALID_COORDINATES, NONE_COORDINATES
+from .exceptions import FlightradarException
+from .feed_entry import FeedEntry
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_GRID_CELL_SIZE = 0.5
+
+
+class Geofence:
+    """Polygon defined by latitude/longitude vertices.
+
+    Polygons must not cross the antimeridian.
+    """
+
+    def __init__(self, geofence_id: str, vertices: Sequence[Tuple[float, float]]):
+        """Initialise geofence."""
+        if len(vertices) < 3:
+            raise FlightradarException("Geofence requires at least 3 vertices")
+        self._geofence_id = geofence_id
+        self._vertices = [(float(lat), float(lon)) for lat, lon in vertices]
+        latitudes = [vertex[0] for vertex in self._vertices]
+        longitudes = [vertex[1] for vertex in self._vertices]
+        self._bbox = (min(latitudes), min(longitudes), max(latitudes), max(longitudes))
+        # Pairs of consecutive vertices, closing the polygon.
+        self._edges = list(zip(self._vertices, self._vertices[1:] + self._vertices[:1]))
+
+    def __repr__(self) -> str:
+        """Return string representation of this geofence."""
+        return "<{}(id={})>".format(self.__class__.__name__, self._geofence_id)
+
+    @property
+    def geofence_id(self) -> str:
+        """Return the id of this geofence."""
+        return self._geofence_id
+
+    @property
+    def bbox(self) -> Tuple[float, float, float, float]:
+        """Return the bounding box as (min lat, min lon, max lat, max lon)."""
+        return self._bbox
+
+    def contains(self, latitude: float, longitude: float) -> bool:
+        """Check whether the provided position is inside this geofence."""
+        min_lat, min_lon, max_lat, max_lon = self._bbox
+        if not (min_lat <= latitude <= max_lat and min_lon <= longitude <= max_lon):
+            return False
+        # Ray casting along the latitude of the position.
+        inside = False
+        for (lat1, lon1), (lat2, lon2) in self._edges:
+            if (lat1 > latitude) != (lat2 > latitude):
+                crossing = lon1 + (latitude - lat1) * (lon2 - lon1) / (lat2 - lat1)
+                if longitude < crossing:
+                    inside = not inside
+        return inside
+
+
+class GeofenceIndex:
+    """Grid index of geofences by their bounding boxes."""
+
+    def __init__(
+        self,
+        geofences: Sequence[Geofence] = (),
+        cell_size: float = DEFAULT_GRID_CELL_SIZE,
+    ) -> None:
+        """Initialise geofence index."""
+        self._cell_size = cell_size
+        self._cells = {}
+        self._geofences = {}
+        for geofence in geofences:
+            self.add(geofence)
+
+    def __repr__(self) -> str:
+        """Return string representation of this index."""
+        return "<{}(geofences={}, cells={})>".format(
+            self.__class__.__name__, len(self._geofences), len(self._cells)
+        )
+
+    def __len__(self) -> int:
+        """Return the number of geofences."""
+        return len(self._geofences)
+
+    def add(self, geofence: Geofence) -> None:
+        """Add geofence to the index."""
+        if geofence.geofence_id in self._geofences:
+            self.remove(geofence.geofence_id)
+        self._geofences[geofence.geofence_id] = geofence
+        for cell in self._covered_cells(geofence):
+            self._cells.setdefault(cell, []).append(geofence)
+
+    def remove(self, geofence_id: str) -> None:
+        """Remove geofence from the index."""
+        geofence = self._geofences.pop(geofence_id)
+        for cell in self._covered_cells(geofence):
+            candidates = self._cells[cell]
+            candidates.remove(geofence)
+            if not candidates:
+                del self._cells[cell]
+
+    def candidates(self, latitude: float, longitude: float) -> List[Geofence]:
+        """Return geofences whose bounding box may contain the position."""
+        return self._cells.get(self._cell(latitude, longitude), [])
+
+    def matches(self, latitude: float, longitude: float) -> Set[str]:
+        """Return the ids of all geofences containing the position."""
+        return {
+            geofence.geofence_id
+            for geofence in self.candidates(latitude, longitude)
+            if geofence.contains(latitude, longitude)
+        }
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        """Return the grid cell of the provided position."""
+        return (
+            math.floor(latitude / self._cell_size),
+            math.floor(longitude / self._cell_size),
+        )
+
+    def _covered_cells(self, geofence: Geofence):
+        """Generate all grid cells overlapping the bounding box."""
+        min_lat, min_lon, max_lat, max_lon = geofence.bbox
+        min_row, min_column = self._cell(min_lat, min_lon)
+        max_row, max_column = self._cell(max_lat, max_lon)
+        for row in range(min_row, max_row + 1):
+            for column in range(min_column, max_column + 1):
+                yield row, column
+
+
+class GeofenceMonitor:
+    """Tracks geofence membership of aircrafts between updates.
+
+    Enter and exit events are passed on to the callbacks with the aircraft's
+    external id and the geofence id. Aircrafts no longer in the feed exit all
+    geofences they were in.
+    """
+
+    def __init__(
+        self,
+        geofences: Sequence[Geofence],
+        enter_callback: Callable[[str, str], Awaitable[None]],
+        exit_callback: Callable[[str, str], Awaitable[None]],
+        cell_size: float = DEFAULT_GRID_CELL_SIZE,
+    ) -> None:
+        """Initialise geofence monitor."""
+        self._index = GeofenceIndex(geofences, cell_size)
+        self._enter_callback = enter_callback
+        self._exit_callback = exit_callback
+        self._memberships = {}
+
+    def __repr__(self) -> str:
+        """Return string representation of this monitor."""
+        return "<{}(index={})>".format(self.__class__.__name__, self._index)
+
+    @property
+    def index(self) -> GeofenceIndex:
+        """Return the geofence index."""
+        return self._index
+
+    def memberships(self, external_id: str) -> Set[str]:
+        """Return the ids of all geofences the aircraft is currently in."""
+        return self._memberships.get(external_id, set())
+
+    async def update(self, feed_entries: Optional[Dict[str, FeedEntry]]) -> None:
+        """Determine geofence memberships and report all transitions."""
+        feed_entries = feed_entries or {}
+        for external_id in list(self._memberships):
+            if external_id not in feed_entries:
+                for geofence_id in self._memberships.pop(external_id):
+                    await self._exit(external_id, geofence_id)
+        for external_id, entry in feed_entries.items():
+            coordinates = entry.coordinates
+            if (
+                not coordinates
+                or coordinates == INVALID_COORDINATES
+                or coordinates == NONE_COORDINATES
+            ):
+                # Keep memberships while the position is unknown.
+                continue
+            current = self._index.matches(*coordinates)
+            previous = self._memberships.get(external_id, set())
+            if current == previous:
+                continue
+            for geofence_id in previous - current:
+                await self._exit(external_id, geofence_id)
+            for geofence_id in current - previous:
+                await self._enter(external_id, geofence_id)
+            if current:
+                self._memberships[external_id] = current
+            else:
+                self._memberships.pop(external_id, None)
+
+    async def _enter(self, external_id: str, geofence_id: str) -> None:
+        """Report aircraft entering a geofence."""
+        _LOGGER.debug("Entity %s entered geofence %s", external_id, geofence_id)
+        await self._enter_callback(external_id, geofence_id)
+
+    async def _exit(self, external_id: str, geofence_id: str) -> None:
+        """Report aircraft leaving a geofence."""
+        _LOGGER.debug("Entity %s left geofence %s", external_id, geofence_id)
+        await self._exit_callback(external_id, geofence_id)
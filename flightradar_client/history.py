@@ -0,0 +1,246 @@
+"""
+Position history.
+
+Persists the positions of all aircrafts to an SQLite database. Rows are
+buffered and written in batched transactions on a background thread, so that
+the event loop driving the feed updates is never blocked by the database.
+"""
+import asyncio
+import collections
+import datetime
+import logging
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .consts import INVALID_COORDINATES, NONE_COORDINATES
+from .exceptions import FlightradarException
+from .feed_entry import FeedEntry
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_MAX_BUFFER_SIZE = 10000
+DEFAULT_TIMEOUT = 10.0
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS positions ("
+    "mode_s TEXT NOT NULL, "
+    "timestamp REAL NOT NULL, "
+    "latitude REAL, "
+    "longitude REAL, "
+    "altitude INTEGER, "
+    "track INTEGER, "
+    "speed INTEGER, "
+    "vert_rate INTEGER, "
+    "squawk TEXT, "
+    "callsign TEXT)",
+    "CREATE INDEX IF NOT EXISTS positions_timestamp ON positions (timestamp)",
+    "CREATE INDEX IF NOT EXISTS positions_mode_s_timestamp "
+    "ON positions (mode_s, timestamp)",
+)
+INSERT = "INSERT INTO positions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+
+class HistorySink:
+    """Writes positions to an SQLite database on a background thread.
+
+    When the buffer is full, updates wait (without blocking the event loop)
+    until the writer has caught up, for up to the timeout in seconds.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_buffer_size: int = DEFAULT_MAX_BUFFER_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> None:
+        """Initialise history sink and start the writer thread."""
+        self._path = path
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._max_buffer_size = max_buffer_size
+        self._timeout = timeout
+        self._buffer = collections.deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._ready = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._run, name="flightradar-history", daemon=True
+        )
+        self._thread.start()
+        if not self._ready.wait(self._timeout):
+            # Let the writer thread stop once it gets going.
+            with self._condition:
+                self._closed = True
+            raise FlightradarException(
+                "Opening history database {} timed out".format(self._path)
+            )
+        if self._error:
+            raise self._error
+
+    def __repr__(self) -> str:
+        """Return string representation of this sink."""
+        return "<{}(path={})>".format(self.__class__.__name__, self._path)
+
+    @property
+    def buffered(self) -> int:
+        """Return the number of rows not written yet."""
+        return len(self._buffer)
+
+    async def update(self, feed_entries: Optional[Dict[str, FeedEntry]]) -> None:
+        """Buffer the positions of the provided entries."""
+        if not feed_entries:
+            return
+        now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+        rows = [
+            row for row in (_row(entry, now) for entry in feed_entries.values()) if row
+        ]
+        if rows and not self._offer(rows):
+            # Wait for the writer to make room without blocking the loop.
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._offer, rows, True
+            )
+
+    async def close(self) -> None:
+        """Write all buffered rows and stop the writer thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+
+    def positions(
+        self,
+        mode_s: str = None,
+        start: datetime.datetime = None,
+        end: datetime.datetime = None,
+    ) -> List[Tuple]:
+        """Query written positions, ordered by time.
+
+        This opens a separate connection and should be run in an executor
+        when called from the event loop.
+        """
+        conditions = []
+        parameters = []
+        if mode_s:
+            conditions.append("mode_s = ?")
+            parameters.append(mode_s)
+        if start:
+            conditions.append("timestamp >= ?")
+            parameters.append(start.timestamp())
+        if end:
+            conditions.append("timestamp < ?")
+            parameters.append(end.timestamp())
+        query = "SELECT * FROM positions"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY timestamp, mode_s"
+        connection = sqlite3.connect(self._path)
+        try:
+            return connection.execute(query, parameters).fetchall()
+        finally:
+            connection.close()
+
+    def _offer(self, rows: List[Tuple], block: bool = False) -> bool:
+        """Buffer rows if there is room, optionally waiting for room."""
+        with self._condition:
+            if block:
+                if not self._condition.wait_for(
+                    lambda: self._has_room(len(rows)), timeout=self._timeout
+                ):
+                    raise FlightradarException(
+                        "Waiting for room in history sink {} timed out".format(
+                            self._path
+                        )
+                    )
+            elif not self._has_room(len(rows)):
+                return False
+            if self._closed:
+                _LOGGER.warning("History sink %s closed, rows discarded", self._path)
+                return True
+            self._buffer.extend(rows)
+            if len(self._buffer) >= self._batch_size:
+                self._condition.notify_all()
+            return True
+
+    def _has_room(self, count: int) -> bool:
+        """Check whether the rows fit into the buffer."""
+        # Always accept rows into an empty buffer to make progress.
+        return (
+            self._closed
+            or not self._buffer
+            or len(self._buffer) + count <= self._max_buffer_size
+        )
+
+    def _run(self) -> None:
+        """Write buffered rows in batches until closed."""
+        try:
+            connection = sqlite3.connect(self._path)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+        except sqlite3.Error as error:
+            self._error = error
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            while True:
+                with self._condition:
+                    self._condition.wait_for(
+                        lambda: self._closed or len(self._buffer) >= self._batch_size,
+                        timeout=self._flush_interval,
+                    )
+                    batch = list(self._buffer)
+                    self._buffer.clear()
+                    closed = self._closed
+                    # Wake up updates waiting for room.
+                    self._condition.notify_all()
+                if batch:
+                    self._write(connection, batch)
+                if closed:
+                    break
+        finally:
+            connection.close()
+
+    def _write(self, connection: sqlite3.Connection, batch: List[Tuple]) -> None:
+        """Write a batch of rows in a single transaction."""
+        try:
+            with connection:
+                connection.executemany(INSERT, batch)
+            _LOGGER.debug("Wrote %s rows to %s", len(batch), self._path)
+        except sqlite3.Error as error:
+            _LOGGER.error(
+                "Writing %s rows to %s failed: %s", len(batch), self._path, error
+            )
+
+
+def _row(entry: FeedEntry, now: float) -> Optional[Tuple]:
+    """Convert an entry into a database row."""
+    coordinates = entry.coordinates
+    if (
+        not entry.external_id
+        or not coordinates
+        or coordinates == INVALID_COORDINATES
+        or coordinates == NONE_COORDINATES
+    ):
+        return None
+    updated = entry.updated
+    return (
+        entry.external_id,
+        updated.timestamp() if updated else now,
+        coordinates[0],
+        coordinates[1],
+        entry.altitude,
+        entry.track,
+        entry.speed,
+        entry.vert_rate,
+        entry.squawk,
+        entry.callsign,
+    )
@@ -0,0 +1,397 @@
+"""
+Sharded ingestion.
+
+Spreads the receivers to poll across worker processes. Each worker fetches
+and parses the feeds of its receivers and sends compact binary snapshots to
+the parent process, which merges the latest snapshot of all receivers into
+a single feed for one aggregator and feed manager.
+"""
+import asyncio
+import datetime
+import logging
+import multiprocessing
+import queue
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from .consts import DEFAULT_HOME_COORDINATES, UPDATE_ERROR, UPDATE_OK
+from .dump1090_aircrafts import Dump1090AircraftsFeed
+from .encoding import SnapshotEncoder, decode
+from .exceptions import FlightradarException
+from .feed_aggregator import FeedAggregator
+from .feed_entry import FeedEntry
+from .fr24feed_flights import FlightradarFlightsFeed
+from .metrics import FeedMetrics
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 5.0
+DEFAULT_STALE_AFTER = datetime.timedelta(seconds=60)
+DEFAULT_MAX_RESTARTS = 10
+
+KIND_DUMP1090 = "dump1090"
+KIND_FR24 = "fr24"
+FEED_CLASSES = {KIND_DUMP1090: Dump1090AircraftsFeed, KIND_FR24: FlightradarFlightsFeed}
+
+
+class Receiver:
+    """Configuration of a single receiver to poll."""
+
+    def __init__(
+        self, kind: str, url: str = None, hostname: str = None, port: int = None
+    ) -> None:
+        """Initialise receiver configuration."""
+        if kind not in FEED_CLASSES:
+            raise FlightradarException("Unknown receiver kind {}".format(kind))
+        self.kind = kind
+        self.url = url
+        self.hostname = hostname
+        self.port = port
+
+    def __repr__(self) -> str:
+        """Return string representation of this receiver."""
+        return "<{}(kind={}, url={}, hostname={}, port={})>".format(
+            self.__class__.__name__, self.kind, self.url, self.hostname, self.port
+        )
+
+    def create_feed(
+        self, home_coordinates: Tuple[float, float], websession: aiohttp.ClientSession
+    ):
+        """Create the feed polling this receiver, without filters."""
+        kwargs = {"url": self.url}
+        if self.hostname:
+            kwargs["hostname"] = self.hostname
+        if self.port:
+            kwargs["port"] = self.port
+        return FEED_CLASSES[self.kind](
+            home_coordinates, websession, apply_filters=False, **kwargs
+        )
+
+
+class WorkerHealth:
+    """Health of a single worker process."""
+
+    def __init__(self, worker_id: int, receivers: List[int]) -> None:
+        """Initialise worker health."""
+        self.worker_id = worker_id
+        self.receivers = receivers
+        self.pid = None
+        self.alive = False
+        self.restarts = 0
+        self.updates = 0
+        self.errors = 0
+        self.last_update = None
+        self.last_duration = None
+
+    def __repr__(self) -> str:
+        """Return string representation of this worker health."""
+        return "<{}(worker={}, alive={}, restarts={}, updates={}, errors={})>".format(
+            self.__class__.__name__,
+            self.worker_id,
+            self.alive,
+            self.restarts,
+            self.updates,
+            self.errors,
+        )
+
+
+def _run_worker(
+    worker_id: int,
+    receivers: List[Tuple[int, Receiver]],
+    home_coordinates: Tuple[float, float],
+    interval: float,
+    results: multiprocessing.Queue,
+    resync: multiprocessing.Queue,
+) -> None:
+    """Entry point of a worker process."""
+    asyncio.run(
+        _poll(worker_id, receivers, home_coordinates, interval, results, resync)
+    )
+
+
+async def _poll(
+    worker_id: int,
+    receivers: List[Tuple[int, Receiver]],
+    home_coordinates: Tuple[float, float],
+    interval: float,
+    results: multiprocessing.Queue,
+    resync: multiprocessing.Queue,
+) -> None:
+    """Poll the receivers of this worker and send their snapshots.
+
+    Receivers whose snapshot the parent could not decode are requested on
+    the resync queue, and start over with a keyframe.
+    """
+    async with aiohttp.ClientSession() as websession:
+        feeds = [
+            (index, receiver.create_feed(home_coordinates, websession))
+            for index, receiver in receivers
+        ]
+        encoders = {index: SnapshotEncoder() for index, _ in feeds}
+        while True:
+            start = time.monotonic()
+            while True:
+                try:
+                    encoders[resync.get_nowait()].reset()
+                except queue.Empty:
+                    break
+            for index, feed in feeds:
+                feed_start = time.monotonic()
+                try:
+                    status, entries = await feed.update()
+                except Exception as error:
+                    _LOGGER.warning("Updating %s failed with %s", feed, error)
+                    status, entries = UPDATE_ERROR, None
+                status, message = _encode(encoders[index], status, entries)
+                results.put(
+                    (worker_id, index, status, message, time.monotonic() - feed_start)
+                )
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - start)))
+
+
+def _encode(
+    encoder: SnapshotEncoder,
+    status: str,
+    feed_entries: Optional[Dict[str, FeedEntry]],
+) -> Tuple[str, Optional[bytes]]:
+    """Return the status and message of an update sent to the parent."""
+    if status == UPDATE_OK:
+        try:
+            return status, encoder.encode(feed_entries)
+        except FlightradarException as error:
+            # For example values out of range, only this receiver fails.
+            _LOGGER.warning("Encoding snapshot failed with %s", error)
+    # The parent discards the snapshot, start over with a keyframe.
+    encoder.reset()
+    return UPDATE_ERROR, None
+
+
+class IngestionSupervisor:
+    """Runs worker processes polling the receivers and merges their results.
+
+    Receivers are assigned to the workers round robin. Workers that exit are
+    restarted, up to the maximum number of restarts per worker.
+    """
+
+    def __init__(
+        self,
+        receivers: List[Receiver],
+        home_coordinates: Tuple[float, float] = DEFAULT_HOME_COORDINATES,
+        workers: int = None,
+        interval: float = DEFAULT_INTERVAL,
+        restart: bool = True,
+        max_restarts: int = DEFAULT_MAX_RESTARTS,
+        stale_after: datetime.timedelta = DEFAULT_STALE_AFTER,
+    ) -> None:
+        """Initialise supervisor."""
+        if not receivers:
+            raise FlightradarException("No receivers to ingest from")
+        workers = min(workers or multiprocessing.cpu_count(), len(receivers))
+        self._receivers = receivers
+        self._home_coordinates = home_coordinates
+        self._shards = [
+            [
+                (index, receivers[index])
+                for index in range(shard, len(receivers), workers)
+            ]
+            for shard in range(workers)
+        ]
+        self._interval = interval
+        self._restart = restart
+        self._max_restarts = max_restarts
+        self._stale_after = stale_after.total_seconds()
+        self._context = multiprocessing.get_context("spawn")
+        self._results = None
+        self._resync = {}
+        self._processes = {}
+        self._health = {
+            worker_id: WorkerHealth(worker_id, [index for index, _ in shard])
+            for worker_id, shard in enumerate(self._shards)
+        }
+        self._snapshots = {}
+        self._reader = None
+
+    def __repr__(self) -> str:
+        """Return string representation of this supervisor."""
+        return "<{}(receivers={}, workers={})>".format(
+            self.__class__.__name__, len(self._receivers), len(self._shards)
+        )
+
+    @property
+    def health(self) -> Dict[int, WorkerHealth]:
+        """Return the health of all workers by worker id."""
+        return self._health
+
+    async def start(self) -> None:
+        """Start the workers and process their results."""
+        self._results = self._context.Queue()
+        for worker_id in self._health:
+            self._start_worker(worker_id)
+        self._reader = asyncio.ensure_future(self._read_results())
+
+    async def stop(self) -> None:
+        """Stop all workers."""
+        if self._reader:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        for worker_id, process in self._processes.items():
+            process.terminate()
+            process.join()
+            self._health[worker_id].alive = False
+        self._processes.clear()
+
+    def snapshot(self) -> Dict[str, FeedEntry]:
+        """Return the merged entries of all receivers with recent data.
+
+        If an aircraft is seen by several receivers, the most recently
+        updated entry is used.
+        """
+        expiry = time.monotonic() - self._stale_after
+        merged = {}
+        for received, feed_entries in self._snapshots.values():
+            if received < expiry:
+                continue
+            for external_id, entry in feed_entries.items():
+                existing = merged.get(external_id)
+                if existing is None or _updated(entry) > _updated(existing):
+                    merged[external_id] = entry
+        return merged
+
+    def _start_worker(self, worker_id: int) -> None:
+        """Start the process of a worker."""
+        self._resync[worker_id] = self._context.Queue()
+        process = self._context.Process(
+            target=_run_worker,
+            args=(
+                worker_id,
+                self._shards[worker_id],
+                self._home_coordinates,
+                self._interval,
+                self._results,
+                self._resync[worker_id],
+            ),
+            name="flightradar-ingestion-{}".format(worker_id),
+            daemon=True,
+        )
+        process.start()
+        self._processes[worker_id] = process
+        health = self._health[worker_id]
+        health.pid = process.pid
+        health.alive = True
+        _LOGGER.debug("Started worker %s (pid %s)", worker_id, process.pid)
+
+    async def _read_results(self) -> None:
+        """Process results from the workers and watch their processes."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                result = await loop.run_in_executor(
+                    None, self._results.get, True, self._interval
+                )
+                self._process_result(*result)
+            except queue.Empty:
+                pass
+            self._check_workers()
+
+    def _process_result(
+        self,
+        worker_id: int,
+        index: int,
+        status: str,
+        message: Optional[bytes],
+        duration: float,
+    ) -> None:
+        """Merge a snapshot received from a worker."""
+        health = self._health[worker_id]
+        health.last_update = datetime.datetime.now(datetime.timezone.utc)
+        health.last_duration = duration
+        if status != UPDATE_OK:
+            health.errors += 1
+            self._snapshots.pop(index, None)
+            return
+        previous = self._snapshots.get(index)
+        try:
+            feed_entries = decode(
+                message, previous[1] if previous else None, self._home_coordinates
+            )
+        except FlightradarException as error:
+            _LOGGER.warning("Invalid snapshot from worker %s: %s", worker_id, error)
+            health.errors += 1
+            # Deltas cannot be applied anymore, request a keyframe.
+            self._snapshots.pop(index, None)
+            resync = self._resync.get(worker_id)
+            if resync is not None:
+                resync.put(index)
+            return
+        health.updates += 1
+        self._snapshots[index] = (time.monotonic(), feed_entries)
+
+    def _check_workers(self) -> None:
+        """Restart workers that have exited."""
+        for worker_id, process in list(self._processes.items()):
+            if process.is_alive():
+                continue
+            health = self._health[worker_id]
+            health.alive = False
+            _LOGGER.warning(
+                "Worker %s exited with code %s", worker_id, process.exitcode
+            )
+            del self._processes[worker_id]
+            # Snapshots of its receivers start over with keyframes.
+            for index in health.receivers:
+                self._snapshots.pop(index, None)
+            if self._restart and health.restarts < self._max_restarts:
+                health.restarts += 1
+                self._start_worker(worker_id)
+
+
+def _updated(entry: FeedEntry) -> float:
+    """Return the update timestamp of an entry for comparisons."""
+    updated = entry.updated
+    return updated.timestamp() if updated else 0.0
+
+
+class ShardedFeed:
+    """Feed providing the merged snapshot of an ingestion supervisor."""
+
+    def __init__(self, supervisor: IngestionSupervisor) -> None:
+        """Initialise feed."""
+        self._supervisor = supervisor
+        self._metrics = FeedMetrics("sharded")
+
+    def __repr__(self) -> str:
+        """Return string representation of this feed."""
+        return "<{}(supervisor={})>".format(self.__class__.__name__, self._supervisor)
+
+    @property
+    def metrics(self) -> FeedMetrics:
+        """Return the metrics of this feed."""
+        return self._metrics
+
+    async def update(self) -> Tuple[str, Optional[Dict[str, FeedEntry]]]:
+        """Return the merged entries of all receivers."""
+        feed_entries = self._supervisor.snapshot()
+        self._metrics.aircrafts_parsed.inc(len(feed_entries))
+        return UPDATE_OK, feed_entries
+
+
+class ShardedFeedAggregator(FeedAggregator):
+    """Aggregates the merged snapshots of an ingestion supervisor."""
+
+    def __init__(
+        self, supervisor: IngestionSupervisor, filter_radius: float = None
+    ) -> None:
+        """Initialise feed aggregator."""
+        super().__init__(filter_radius)
+        self._feed = ShardedFeed(supervisor)
+
+    @property
+    def feed(self) -> ShardedFeed:
+        """Return the merged feed."""
+        return self._feed
@@ -0,0 +1,341 @@
+"""
+Metrics.
+
+Counters and histograms describing feed health and pipeline throughput,
+rendered in the Prometheus text exposition format.
+
+Metrics are updated without locking and are meant to be updated from the
+event loop driving the feeds.
+"""
+import bisect
+import logging
+from typing import Optional, Sequence, Tuple
+
+from aiohttp import web
+
+from .exceptions import FlightradarException
+
+_LOGGER = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 9191
+DEFAULT_PATH = "/metrics"
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = (1000, 10000, 50000, 100000, 500000, 1000000, 5000000)
+
+TYPE_COUNTER = "counter"
+TYPE_HISTOGRAM = "histogram"
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value."""
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    """Format label names and values."""
+    if not labels:
+        return ""
+    return "{{{}}}".format(
+        ",".join(
+            '{}="{}"'.format(
+                name,
+                str(value)
+                .replace("\\", "\\\\")
+                .replace("\n", "\\n")
+                .replace('"', '\\"'),
+            )
+            for name, value in labels
+        )
+    )
+
+
+class Counter:
+    """Monotonically increasing counter."""
+
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        """Initialise counter."""
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        """Increase the counter."""
+        self.value += amount
+
+    def samples(self, name: str, labels: Tuple[Tuple[str, str], ...]):
+        """Generate the samples of this counter."""
+        yield name + "_total", labels, self.value
+
+
+class Histogram:
+    """Distribution of observed values in pre-defined buckets."""
+
+    __slots__ = ("_upper_bounds", "_counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        """Initialise histogram."""
+        self._upper_bounds = list(buckets)
+        # One additional bucket for values above the highest bound.
+        self._counts = [0] * (len(self._upper_bounds) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Record an observed value."""
+        self._counts[bisect.bisect_left(self._upper_bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name: str, labels: Tuple[Tuple[str, str], ...]):
+        """Generate the cumulative bucket samples of this histogram."""
+        cumulative = 0
+        for upper_bound, count in zip(
+            self._upper_bounds + [float("inf")], self._counts
+        ):
+            cumulative += count
+            yield name + "_bucket", labels + (
+                ("le", _format_value(upper_bound)),
+            ), cumulative
+        yield name + "_sum", labels, self.sum
+        yield name + "_count", labels, self.count
+
+
+class MetricFamily:
+    """Metric with a name, help text and children per label values."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        metric_type: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DURATION_BUCKETS,
+    ) -> None:
+        """Initialise metric family."""
+        self._name = name
+        self._documentation = documentation
+        self._type = metric_type
+        self._label_names = tuple(label_names)
+        self._buckets = tuple(buckets)
+        self._children = {}
+
+    def __repr__(self) -> str:
+        """Return string representation of this metric family."""
+        return "<{}(name={}, type={})>".format(
+            self.__class__.__name__, self._name, self._type
+        )
+
+    @property
+    def name(self) -> str:
+        """Return the name of this metric family."""
+        return self._name
+
+    def labels(self, *values: str):
+        """Return the child for the provided label values.
+
+        Children should be kept by the caller to avoid repeated lookups on
+        the hot path.
+        """
+        if len(values) != len(self._label_names):
+            raise FlightradarException(
+                "Metric {} requires labels {}".format(self._name, self._label_names)
+            )
+        child = self._children.get(values)
+        if child is None:
+            if self._type == TYPE_COUNTER:
+                child = Counter()
+            else:
+                child = Histogram(self._buckets)
+            self._children[values] = child
+        return child
+
+    def render(self) -> str:
+        """Render this metric family in the text exposition format."""
+        lines = [
+            "# HELP {} {}".format(self._name, self._documentation),
+            "# TYPE {} {}".format(self._name, self._type),
+        ]
+        for values, child in self._children.items():
+            for name, labels, value in child.samples(
+                self._name, tuple(zip(self._label_names, values))
+            ):
+                lines.append(
+                    "{}{} {}".format(name, _format_labels(labels), _format_value(value))
+                )
+        return "\n".join(lines)
+
+
+class MetricsRegistry:
+    """Collection of metric families."""
+
+    def __init__(self) -> None:
+        """Initialise metrics registry."""
+        self._families = {}
+
+    def __repr__(self) -> str:
+        """Return string representation of this registry."""
+        return "<{}(families={})>".format(self.__class__.__name__, len(self._families))
+
+    def counter(
+        self, name: str, documentation: str, label_names: Sequence[str] = ()
+    ) -> MetricFamily:
+        """Return the counter family with the provided name."""
+        return self._family(name, documentation, TYPE_COUNTER, label_names)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DURATION_BUCKETS,
+    ) -> MetricFamily:
+        """Return the histogram family with the provided name."""
+        return self._family(name, documentation, TYPE_HISTOGRAM, label_names, buckets)
+
+    def get(self, name: str) -> Optional[MetricFamily]:
+        """Return the metric family with the provided name."""
+        return self._families.get(name)
+
+    def render(self) -> str:
+        """Render all metrics in the text exposition format."""
+        return "".join(family.render() + "\n" for family in self._families.values())
+
+    def _family(self, name, documentation, metric_type, label_names, buckets=()):
+        """Return existing or register new metric family."""
+        family = self._families.get(name)
+        if family is None:
+            family = MetricFamily(
+                name, documentation, metric_type, label_names, buckets
+            )
+            self._families[name] = family
+        return family
+
+
+DEFAULT_REGISTRY = MetricsRegistry()
+
+
+class FeedMetrics:
+    """Metrics of a single feed, bound to the feed's label."""
+
+    def __init__(self, feed: str, registry: MetricsRegistry = DEFAULT_REGISTRY):
+        """Initialise feed metrics."""
+        self._feed = feed
+        self._registry = registry
+        self.fetch_duration = registry.histogram(
+            "flightradar_fetch_duration_seconds",
+            "Time taken to fetch and parse the feed.",
+            ("feed",),
+        ).labels(feed)
+        self.payload_bytes = registry.histogram(
+            "flightradar_payload_bytes",
+            "Size of the payload received from the feed.",
+            ("feed",),
+            BYTES_BUCKETS,
+        ).labels(feed)
+        self._responses = registry.counter(
+            "flightradar_fetch_responses",
+            "HTTP responses received from the feed by status code.",
+            ("feed", "status"),
+        )
+        self._errors = registry.counter(
+            "flightradar_errors",
+            "Errors while updating the feed by type.",
+            ("feed", "error"),
+        )
+        self.aircrafts_parsed = registry.counter(
+            "flightradar_aircrafts_parsed",
+            "Aircrafts parsed from the feed.",
+            ("feed",),
+        ).labels(feed)
+        self.aircrafts_filtered = registry.counter(
+            "flightradar_aircrafts_filtered",
+            "Aircrafts removed by filters.",
+            ("feed",),
+        ).labels(feed)
+        self.aircrafts_kept = registry.counter(
+            "flightradar_aircrafts_kept",
+            "Aircrafts remaining after filtering.",
+            ("feed",),
+        ).labels(feed)
+        self.updates_coalesced = registry.counter(
+            "flightradar_updates_coalesced",
+            "Feed manager updates merged into an update still running.",
+            ("feed",),
+        ).labels(feed)
+        self.hedged_requests = registry.counter(
+            "flightradar_hedged_requests",
+            "Requests sent to a mirror while an earlier one was still running.",
+            ("feed",),
+        ).labels(feed)
+        cache_lookups = registry.counter(
+            "flightradar_cache_lookups",
+            "Lookups of missing values in the aggregator caches.",
+            ("feed", "cache", "result"),
+        )
+        self._cache_lookups = {
+            (cache, hit): cache_lookups.labels(feed, cache, "hit" if hit else "miss")
+            for cache in ("callsign", "coordinates")
+            for hit in (True, False)
+        }
+        callback_duration = registry.histogram(
+            "flightradar_callback_duration_seconds",
+            "Time taken by the feed manager callbacks.",
+            ("feed", "callback"),
+        )
+        self._callback_durations = {
+            callback: callback_duration.labels(feed, callback)
+            for callback in ("generate", "update", "remove")
+        }
+
+    def __repr__(self) -> str:
+        """Return string representation of these metrics."""
+        return "<{}(feed={})>".format(self.__class__.__name__, self._feed)
+
+    def response(self, status: int) -> None:
+        """Record an HTTP response status."""
+        self._responses.labels(self._feed, str(status)).inc()
+
+    def error(self, error: str) -> None:
+        """Record an error."""
+        self._errors.labels(self._feed, error).inc()
+
+    def cache_lookup(self, cache: str, hit: bool, count: int = 1) -> None:
+        """Record lookups of missing values in a cache."""
+        self._cache_lookups[(cache, hit)].inc(count)
+
+    def callback_duration(self, callback: str, duration: float) -> None:
+        """Record the duration of a feed manager callback."""
+        self._callback_durations[callback].observe(duration)
+
+
+async def start_http_server(
+    registry: MetricsRegistry = DEFAULT_REGISTRY,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    path: str = DEFAULT_PATH,
+) -> web.AppRunner:
+    """Serve the metrics over HTTP; clean up the returned runner to stop."""
+
+    async def _handle(request: web.Request) -> web.Response:
+        """Return the rendered metrics."""
+        return web.Response(
+            body=registry.render().encode("utf-8"),
+            headers={"Content-Type": CONTENT_TYPE},
+        )
+
+    app = web.Application()
+    app.router.add_get(path, _handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    _LOGGER.debug("Serving metrics on %s:%s%s", host, port, path)
+    return runner
@@ -0,0 +1,393 @@
+"""
+State persistence.
+
+Keeps the state of a feed aggregator and feed manager on disk, so that a
+restarted process continues where it left off: with the callsign and
+coordinates caches and statistics of the aggregator, and the entities the
+manager has generated. The state is written as a snapshot at regular
+intervals, with the changes after each update appended to a journal in
+between. Both files are written so that a crash at any point leaves a
+consistent state behind.
+"""
+import asyncio
+import datetime
+import json
+import logging
+import os
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from .exceptions import FlightradarException
+from .feed_aggregator import FeedAggregator
+from .feed_entry import FeedEntry
+from .feed_manager import FeedManagerBase
+from .statistics import StatisticsData
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_INTERVAL = datetime.timedelta(minutes=5)
+VERSION = 1
+JOURNAL_SUFFIX = ".journal"
+
+
+class _State:
+    """Copy of the persisted state, to find the changes of an update."""
+
+    def __init__(self) -> None:
+        """Initialise empty state."""
+        self.callsigns = {}
+        self.coordinates = {}
+        self.statistics = {}
+        self.managed = set()
+        self.last_timestamp = None
+
+
+class StatePersistence:
+    """Persists aggregator and manager state as snapshot and journal.
+
+    Call restore before the first update, and use the update method as
+    listener of the feed manager. The entities restored are updated rather
+    than generated again after the restart; the consumer is expected to
+    have kept them as well. Without a restore, the state on disk is
+    replaced with a snapshot on the first write.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        aggregator: FeedAggregator,
+        manager: FeedManagerBase = None,
+        snapshot_interval: datetime.timedelta = DEFAULT_SNAPSHOT_INTERVAL,
+        fsync: bool = True,
+    ) -> None:
+        """Initialise state persistence."""
+        self._path = path
+        self._journal_path = path + JOURNAL_SUFFIX
+        self._aggregator = aggregator
+        self._manager = manager
+        self._snapshot_interval = snapshot_interval.total_seconds()
+        self._fsync = fsync
+        self._persisted = _State()
+        self._sequence = 0
+        self._restored = False
+        self._last_snapshot = time.monotonic()
+
+    def __repr__(self) -> str:
+        """Return string representation of this persistence."""
+        return "<{}(path={}, sequence={})>".format(
+            self.__class__.__name__, self._path, self._sequence
+        )
+
+    @property
+    def sequence(self) -> int:
+        """Return the sequence number of the latest change written."""
+        return self._sequence
+
+    def restore(self) -> bool:
+        """Restore the state from disk, return whether any was found."""
+        found = False
+        if os.path.exists(self._path):
+            with open(self._path, "r", encoding="utf-8") as file:
+                try:
+                    snapshot = json.load(file)
+                except ValueError as error:
+                    raise FlightradarException(
+                        "Invalid state snapshot {}".format(self._path)
+                    ) from error
+            if snapshot.get("version") != VERSION:
+                raise FlightradarException(
+                    "Unsupported state snapshot version {}".format(
+                        snapshot.get("version")
+                    )
+                )
+            self._apply_snapshot(snapshot)
+            self._sequence = snapshot["sequence"]
+            found = True
+        for sequence, change in self._read_journal():
+            # Changes may already be contained in the snapshot.
+            if sequence > self._sequence:
+                self._apply_change(change)
+                self._sequence = sequence
+                found = True
+        self._persisted = self._capture()
+        self._restored = True
+        return found
+
+    def _sequence_on_disk(self) -> int:
+        """Return the highest sequence number of the state on disk."""
+        sequence = 0
+        if os.path.exists(self._path):
+            with open(self._path, "r", encoding="utf-8") as file:
+                try:
+                    sequence = json.load(file).get("sequence", 0)
+                except ValueError:
+                    _LOGGER.warning("Replacing invalid state snapshot %s", self._path)
+        for record_sequence, _ in self._read_journal():
+            sequence = max(sequence, record_sequence)
+        return sequence
+
+    def _read_journal(self) -> List:
+        """Return all complete and intact journal records."""
+        records = []
+        if not os.path.exists(self._journal_path):
+            return records
+        with open(self._journal_path, "rb") as file:
+            for line in file:
+                record = _decode_record(line)
+                if record is None:
+                    # Written partially, changes after it cannot be applied.
+                    _LOGGER.warning("Ignoring truncated state journal record")
+                    break
+                records.append(record)
+        return records
+
+    async def update(self, feed_entries: Optional[Dict[str, FeedEntry]]) -> None:
+        """Write the changes of the latest update."""
+        loop = asyncio.get_running_loop()
+        if (
+            not self._restored
+            or time.monotonic() - self._last_snapshot >= self._snapshot_interval
+        ):
+            await self.snapshot()
+            return
+        current = self._capture()
+        change = _diff(self._persisted, current)
+        self._persisted = current
+        if not change:
+            return
+        self._sequence += 1
+        line = _encode_record(self._sequence, change)
+        await loop.run_in_executor(None, self._append, line)
+
+    async def snapshot(self) -> None:
+        """Write the complete state and start a new journal."""
+        if not self._restored:
+            # Continue after the sequence numbers on disk, so that none of
+            # the records left there can be mistaken for newer changes.
+            self._sequence = max(self._sequence, self._sequence_on_disk())
+            self._restored = True
+        self._persisted = self._capture()
+        self._sequence += 1
+        payload = json.dumps(
+            self._snapshot(self._persisted), separators=(",", ":")
+        ).encode("utf-8")
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._write_snapshot, payload
+        )
+        self._last_snapshot = time.monotonic()
+
+    async def close(self) -> None:
+        """Write a final snapshot, for example on shutdown."""
+        await self.snapshot()
+
+    def _capture(self) -> _State:
+        """Copy the current state of aggregator and manager."""
+        state = _State()
+        state.callsigns = dict(self._aggregator.callsigns)
+        state.coordinates = dict(self._aggregator.coordinates)
+        state.statistics = {
+            key: (data.retrievals, data.total)
+            for key, data in self._aggregator.statistics.entries.items()
+        }
+        if self._manager is not None:
+            state.managed = set(self._manager.managed_external_ids)
+            last_timestamp = self._manager.last_timestamp
+            state.last_timestamp = (
+                last_timestamp.timestamp() if last_timestamp else None
+            )
+        return state
+
+    def _snapshot(self, state: _State) -> Dict:
+        """Return the snapshot of the state."""
+        return {
+            "version": VERSION,
+            "sequence": self._sequence,
+            "callsigns": list(state.callsigns.items()),
+            "coordinates": [
+                [key, latitude, longitude]
+                for key, (latitude, longitude) in state.coordinates.items()
+            ],
+            "statistics": [
+                [key, retrievals, total]
+                for key, (retrievals, total) in state.statistics.items()
+            ],
+            "managed": sorted(state.managed),
+            "last_timestamp": state.last_timestamp,
+        }
+
+    def _apply_snapshot(self, snapshot: Dict) -> None:
+        """Replace aggregator and manager state with the snapshot."""
+        callsigns = self._aggregator.callsigns
+        callsigns.clear()
+        for key, callsign in snapshot["callsigns"]:
+            callsigns[key] = callsign
+        coordinates = self._aggregator.coordinates
+        coordinates.clear()
+        for key, latitude, longitude in snapshot["coordinates"]:
+            coordinates[key] = (latitude, longitude)
+        statistics = self._aggregator.statistics.entries
+        statistics.clear()
+        for key, retrievals, total in snapshot["statistics"]:
+            statistics[key] = StatisticsData.restore(retrievals, total)
+        if self._manager is not None:
+            managed = self._manager.managed_external_ids
+            managed.clear()
+            managed.update(snapshot["managed"])
+            self._restore_last_timestamp(snapshot["last_timestamp"])
+
+    def _apply_change(self, change: Dict) -> None:
+        """Apply the changes of a journal record."""
+        aggregator = self._aggregator
+        for name, cache, convert in (
+            ("callsigns", aggregator.callsigns, lambda value: value),
+            ("coordinates", aggregator.coordinates, tuple),
+        ):
+            values = change.get(name, {})
+            for key in values.get("removed", ()):
+                cache.pop(key, None)
+            for key, value in values.get("set", ()):
+                cache[key] = convert(value)
+        statistics = change.get("statistics")
+        if statistics:
+            entries = aggregator.statistics.entries
+            for key in statistics.get("removed", ()):
+                entries.pop(key, None)
+            retrievals = statistics.get("retrievals", 0)
+            missed = statistics.get("missed", {})
+            values = {
+                key: (retrieval_count, total)
+                for key, retrieval_count, total in statistics.get("set", ())
+            }
+            for key, data in list(entries.items()):
+                if key not in values:
+                    entries[key] = StatisticsData.restore(
+                        data.retrievals + retrievals - missed.get(key, 0),
+                        data.total + retrievals,
+                    )
+            for key, (retrieval_count, total) in values.items():
+                entries[key] = StatisticsData.restore(retrieval_count, total)
+        if self._manager is not None:
+            managed = self._manager.managed_external_ids
+            managed.difference_update(change.get("removed", ()))
+            managed.update(change.get("added", ()))
+            if "last_timestamp" in change:
+                self._restore_last_timestamp(change["last_timestamp"])
+
+    def _restore_last_timestamp(self, value: Optional[float]) -> None:
+        """Restore the timestamp of the latest entry, if it is kept."""
+        if self._manager.persistent_timestamp:
+            self._manager.last_timestamp = (
+                datetime.datetime.fromtimestamp(value, tz=datetime.timezone.utc)
+                if value is not None
+                else None
+            )
+
+    def _append(self, line: bytes) -> None:
+        """Append a record to the journal."""
+        with open(self._journal_path, "ab") as file:
+            file.write(line)
+            file.flush()
+            if self._fsync:
+                os.fsync(file.fileno())
+
+    def _write_snapshot(self, payload: bytes) -> None:
+        """Replace the snapshot, then discard the journal it contains."""
+        temporary = self._path + ".tmp"
+        with open(temporary, "wb") as file:
+            file.write(payload)
+            file.flush()
+            if self._fsync:
+                os.fsync(file.fileno())
+        os.replace(temporary, self._path)
+        # Records up to the snapshot's sequence are skipped when restoring,
+        # so a crash before this point is harmless.
+        with open(self._journal_path, "wb"):
+            pass
+
+
+def _diff(previous: _State, current: _State) -> Dict:
+    """Return the changes between two states, empty if there are none."""
+    change = {}
+    for name in ("callsigns", "coordinates"):
+        before = getattr(previous, name)
+        after = getattr(current, name)
+        values = {}
+        removed = [key for key in before if key not in after]
+        if removed:
+            values["removed"] = removed
+        # In insertion order, so that replaying evicts the same entries.
+        changed = [
+            [key, value] for key, value in after.items() if before.get(key) != value
+        ]
+        if changed:
+            values["set"] = changed
+        if values:
+            change[name] = values
+    statistics = _diff_statistics(previous.statistics, current.statistics)
+    if statistics:
+        change["statistics"] = statistics
+    added = current.managed - previous.managed
+    if added:
+        change["added"] = sorted(added)
+    removed = previous.managed - current.managed
+    if removed:
+        change["removed"] = sorted(removed)
+    if current.last_timestamp != previous.last_timestamp:
+        change["last_timestamp"] = current.last_timestamp
+    return change
+
+
+def _diff_statistics(previous: Dict, current: Dict) -> Dict:
+    """Return the changes of the statistics.
+
+    Every retrieval increases the total of all aircrafts, so the changes
+    of most aircrafts are described by the number of retrievals and the
+    retrievals each aircraft was missing from.
+    """
+    change = {}
+    removed = [key for key in previous if key not in current]
+    if removed:
+        change["removed"] = removed
+    retrievals = None
+    missed = {}
+    values = []
+    for key, (retrieval_count, total) in current.items():
+        before = previous.get(key)
+        if before is None:
+            values.append([key, retrieval_count, total])
+            continue
+        delta_total = total - before[1]
+        if retrievals is None:
+            retrievals = delta_total
+        if delta_total != retrievals:
+            values.append([key, retrieval_count, total])
+        elif retrieval_count - before[0] != retrievals:
+            missed[key] = retrievals - (retrieval_count - before[0])
+    if retrievals:
+        change["retrievals"] = retrievals
+    if missed:
+        change["missed"] = missed
+    if values:
+        change["set"] = values
+    return change
+
+
+def _encode_record(sequence: int, change: Dict) -> bytes:
+    """Encode a journal record as line with checksum."""
+    payload = json.dumps([sequence, change], separators=(",", ":")).encode("utf-8")
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+
+def _decode_record(line: bytes):
+    """Decode a journal record, None if it is incomplete or corrupted."""
+    if not line.endswith(b"\n") or len(line) < 10:
+        return None
+    checksum, payload = line[:8], line[9:-1]
+    try:
+        if int(checksum, 16) != zlib.crc32(payload):
+            return None
+        sequence, change = json.loads(payload.decode("utf-8"))
+    except ValueError:
+        return None
+    return sequence, change
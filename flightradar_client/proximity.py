@@ -0,0 +1,306 @@
+"""
+Proximity detection.
+
+Finds pairs of aircrafts closer to each other than a horizontal and vertical
+separation. Aircrafts are bucketed into a latitude/longitude/altitude grid
+so that only aircrafts in neighbouring cells are compared.
+"""
+import datetime
+import logging
+import math
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from haversine import haversine
+
+from .consts import INVALID_COORDINATES, NONE_COORDINATES
+from .feed_entry import FeedEntry
+
+_LOGGER = logging.getLogger(__name__)
+
+# Approximate length of one degree of latitude in km.
+KM_PER_DEGREE = 111.2
+# Knots to km per second.
+KNOTS_TO_KM_PER_SECOND = 1.852 / 3600
+MAX_REFERENCE_LATITUDE = 89.0
+
+NEIGHBOUR_OFFSETS = [
+    (lat, lon, alt) for lat in (-1, 0, 1) for lon in (-1, 0, 1) for alt in (-1, 0, 1)
+]
+
+
+class ProximityAlert:
+    """Pair of aircrafts within the separation thresholds."""
+
+    def __init__(
+        self,
+        external_ids: Tuple[str, str],
+        distance: float,
+        vertical_separation: float,
+        closing_rate: Optional[float],
+        projected: bool = False,
+    ) -> None:
+        """Initialise proximity alert."""
+        self._external_ids = external_ids
+        self._distance = distance
+        self._vertical_separation = vertical_separation
+        self._closing_rate = closing_rate
+        self._projected = projected
+
+    def __repr__(self) -> str:
+        """Return string representation of this alert."""
+        return "<{}(ids={}, distance={:.2f}, vertical={})>".format(
+            self.__class__.__name__,
+            self._external_ids,
+            self._distance,
+            self._vertical_separation,
+        )
+
+    @property
+    def external_ids(self) -> Tuple[str, str]:
+        """Return the external ids of both aircrafts."""
+        return self._external_ids
+
+    @property
+    def distance(self) -> float:
+        """Return the horizontal distance in km."""
+        return self._distance
+
+    @property
+    def vertical_separation(self) -> float:
+        """Return the vertical separation in ft."""
+        return self._vertical_separation
+
+    @property
+    def closing_rate(self) -> Optional[float]:
+        """Return the rate in knots the aircrafts approach each other with.
+
+        Negative values mean that the aircrafts are moving apart. Not
+        available if speed or track of either aircraft is unknown.
+        """
+        return self._closing_rate
+
+    @property
+    def projected(self) -> bool:
+        """Return whether the separation is only violated after look-ahead."""
+        return self._projected
+
+
+class _Position:
+    """Position and velocity of a single aircraft."""
+
+    __slots__ = ("external_id", "latitude", "longitude", "altitude", "velocity")
+
+    def __init__(self, external_id, latitude, longitude, altitude, velocity):
+        self.external_id = external_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.altitude = altitude
+        # East and north components in knots.
+        self.velocity = velocity
+
+    def projected(self, seconds: float) -> "_Position":
+        """Return the position after moving for the provided time."""
+        east, north = self.velocity
+        distance_east = east * KNOTS_TO_KM_PER_SECOND * seconds
+        distance_north = north * KNOTS_TO_KM_PER_SECOND * seconds
+        latitude = self.latitude + distance_north / KM_PER_DEGREE
+        longitude = self.longitude + distance_east / (
+            KM_PER_DEGREE * max(math.cos(math.radians(self.latitude)), 0.01)
+        )
+        return _Position(
+            self.external_id, latitude, longitude, self.altitude, self.velocity
+        )
+
+
+class ProximityDetector:
+    """Detects aircrafts within horizontal (km) and vertical (ft) separation.
+
+    With look-ahead, positions are also projected forward along track and
+    speed, and pairs only violating the separation at their closest approach
+    within the look-ahead time are reported as projected alerts.
+    """
+
+    def __init__(
+        self,
+        horizontal_distance: float,
+        vertical_distance: float,
+        look_ahead: datetime.timedelta = None,
+        alert_callback: Callable[[ProximityAlert], Awaitable[None]] = None,
+    ) -> None:
+        """Initialise proximity detector."""
+        self._horizontal_distance = horizontal_distance
+        self._vertical_distance = vertical_distance
+        self._look_ahead = look_ahead
+        self._alert_callback = alert_callback
+        self._alerts = []
+
+    def __repr__(self) -> str:
+        """Return string representation of this detector."""
+        return "<{}(horizontal={}, vertical={}, look_ahead={})>".format(
+            self.__class__.__name__,
+            self._horizontal_distance,
+            self._vertical_distance,
+            self._look_ahead,
+        )
+
+    @property
+    def alerts(self) -> List[ProximityAlert]:
+        """Return the alerts found in the latest update."""
+        return self._alerts
+
+    async def update(self, feed_entries: Optional[Dict[str, FeedEntry]]) -> None:
+        """Detect aircrafts in proximity and report them."""
+        self._alerts = self.detect(feed_entries)
+        if self._alert_callback:
+            for alert in self._alerts:
+                await self._alert_callback(alert)
+
+    def detect(
+        self, feed_entries: Optional[Dict[str, FeedEntry]]
+    ) -> List[ProximityAlert]:
+        """Return all pairs of aircrafts in proximity."""
+        positions = [
+            position
+            for position in (
+                self._position(entry) for entry in (feed_entries or {}).values()
+            )
+            if position
+        ]
+        pairs = {}
+        for first, second in self._candidates(positions):
+            alert = self._check(first, second, False)
+            if alert:
+                pairs[alert.external_ids] = alert
+        if self._look_ahead:
+            seconds = self._look_ahead.total_seconds()
+            moving = [position for position in positions if position.velocity]
+            max_speed = max(
+                (math.hypot(*position.velocity) for position in moving), default=0
+            )
+            # Pairs coming within the separation during look-ahead can be
+            # at most this much further apart now.
+            margin = 2 * max_speed * KNOTS_TO_KM_PER_SECOND * seconds
+            for first, second in self._candidates(
+                moving, self._horizontal_distance + margin
+            ):
+                closest = self._closest_approach(first, second, seconds)
+                if not closest:
+                    continue
+                alert = self._check(
+                    first.projected(closest), second.projected(closest), True
+                )
+                if alert and alert.external_ids not in pairs:
+                    pairs[alert.external_ids] = alert
+        return list(pairs.values())
+
+    @staticmethod
+    def _position(entry: FeedEntry) -> Optional[_Position]:
+        """Extract position and velocity from the provided entry."""
+        coordinates = entry.coordinates
+        altitude = entry.altitude
+        if (
+            not coordinates
+            or coordinates == INVALID_COORDINATES
+            or coordinates == NONE_COORDINATES
+            or altitude is None
+        ):
+            return None
+        velocity = None
+        if entry.speed is not None and entry.track is not None:
+            track = math.radians(entry.track)
+            velocity = (entry.speed * math.sin(track), entry.speed * math.cos(track))
+        return _Position(
+            entry.external_id, coordinates[0], coordinates[1], altitude, velocity
+        )
+
+    def _candidates(self, positions: List[_Position], horizontal_size: float = None):
+        """Generate pairs of positions in neighbouring grid cells."""
+        if not positions:
+            return
+        reference_latitude = min(
+            max(abs(position.latitude) for position in positions),
+            MAX_REFERENCE_LATITUDE,
+        )
+        latitude_size = (horizontal_size or self._horizontal_distance) / KM_PER_DEGREE
+        longitude_size = latitude_size / math.cos(math.radians(reference_latitude))
+        altitude_size = self._vertical_distance or 1
+        grid = {}
+        for index, position in enumerate(positions):
+            cell = (
+                math.floor(position.latitude / latitude_size),
+                math.floor(position.longitude / longitude_size),
+                math.floor(position.altitude / altitude_size),
+            )
+            grid.setdefault(cell, []).append(index)
+        for (lat, lon, alt), indices in grid.items():
+            for lat_offset, lon_offset, alt_offset in NEIGHBOUR_OFFSETS:
+                neighbours = grid.get(
+                    (lat + lat_offset, lon + lon_offset, alt + alt_offset)
+                )
+                if not neighbours:
+                    continue
+                for first in indices:
+                    for second in neighbours:
+                        # Compare each pair only once.
+                        if first < second:
+                            yield positions[first], positions[second]
+
+    def _check(
+        self, first: _Position, second: _Position, projected: bool
+    ) -> Optional[ProximityAlert]:
+        """Check the separation of both positions."""
+        vertical_separation = abs(first.altitude - second.altitude)
+        if vertical_separation > self._vertical_distance:
+            return None
+        distance = haversine(
+            (first.latitude, first.longitude), (second.latitude, second.longitude)
+        )
+        if distance > self._horizontal_distance:
+            return None
+        if first.external_id > second.external_id:
+            first, second = second, first
+        return ProximityAlert(
+            (first.external_id, second.external_id),
+            distance,
+            vertical_separation,
+            self._closing_rate(first, second),
+            projected,
+        )
+
+    @staticmethod
+    def _closest_approach(first: _Position, second: _Position, seconds: float) -> float:
+        """Calculate the seconds until both positions are closest, up to the
+        provided time."""
+        mean_latitude = math.radians((first.latitude + second.latitude) / 2)
+        east = (
+            (second.longitude - first.longitude)
+            * KM_PER_DEGREE
+            * math.cos(mean_latitude)
+        )
+        north = (second.latitude - first.latitude) * KM_PER_DEGREE
+        relative_east = (
+            second.velocity[0] - first.velocity[0]
+        ) * KNOTS_TO_KM_PER_SECOND
+        relative_north = (
+            second.velocity[1] - first.velocity[1]
+        ) * KNOTS_TO_KM_PER_SECOND
+        relative_speed = relative_east * relative_east + relative_north * relative_north
+        if relative_speed == 0:
+            return 0.0
+        closest = -(east * relative_east + north * relative_north) / relative_speed
+        return min(max(closest, 0.0), seconds)
+
+    @staticmethod
+    def _closing_rate(first: _Position, second: _Position) -> Optional[float]:
+        """Calculate the rate the distance between both positions decreases."""
+        if not first.velocity or not second.velocity:
+            return None
+        mean_latitude = math.radians((first.latitude + second.latitude) / 2)
+        east = (second.longitude - first.longitude) * math.cos(mean_latitude)
+        north = second.latitude - first.latitude
+        length = math.hypot(east, north)
+        if length == 0:
+            return None
+        relative_east = second.velocity[0] - first.velocity[0]
+        relative_north = second.velocity[1] - first.velocity[1]
+        return -(relative_east * east + relative_north * north) / length
@@ -0,0 +1,155 @@
+"""
+Top-K ranking.
+
+Keeps the K aircrafts ranking first by a configurable key, for example the
+K aircrafts closest to home, without sorting all feed entries on every
+update. Keys are only recomputed for entries that have changed, and only
+changed keys are pushed onto a heap.
+"""
+import heapq
+import itertools
+import logging
+from typing import Callable, Dict, List, Optional
+
+from .approach import closest_approach
+from .consts import INVALID_COORDINATES
+from .feed_entry import FeedEntry
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SIZE = 10
+
+
+def _has_position(entry: FeedEntry) -> bool:
+    """Check whether the entry has valid coordinates."""
+    coordinates = entry.coordinates
+    return (
+        coordinates is not None
+        and None not in coordinates
+        and coordinates != INVALID_COORDINATES
+    )
+
+
+def by_distance(entry: FeedEntry) -> Optional[float]:
+    """Rank by distance to home in km, closest first."""
+    if not _has_position(entry) or entry.home_coordinates is None:
+        return None
+    return entry.distance_to_home
+
+
+def by_altitude(entry: FeedEntry) -> Optional[float]:
+    """Rank by altitude, lowest first. Aircrafts on the ground rank as 0."""
+    return entry.altitude
+
+
+def by_time_to_closest_approach(entry: FeedEntry) -> Optional[float]:
+    """Rank by seconds until the closest approach to home, soonest first.
+
+    Aircrafts moving away from home, and aircrafts without position or
+    velocity, are not ranked.
+    """
+    approach = closest_approach(entry)
+    if approach is None or not approach.seconds:
+        return None
+    return approach.seconds
+
+
+class TopKView:
+    """Incrementally maintained view of the first K aircrafts by a key.
+
+    Use the update method as listener of a feed manager. The heap holds
+    one item per key change; outdated items are discarded when they reach
+    the top, and the heap is rebuilt once they make up most of it.
+    Aggregators with reuse_entries skip key computations for entries
+    whose version has not changed.
+    """
+
+    def __init__(
+        self,
+        size: int = DEFAULT_SIZE,
+        key: Callable[[FeedEntry], Optional[float]] = by_distance,
+    ) -> None:
+        """Initialise view."""
+        self._size = size
+        self._key = key
+        # Current key, entry and entry version by external id.
+        self._ranked = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._top = None
+
+    def __repr__(self) -> str:
+        """Return string representation of this view."""
+        return "<{}(size={}, key={}, ranked={})>".format(
+            self.__class__.__name__,
+            self._size,
+            getattr(self._key, "__name__", self._key),
+            len(self._ranked),
+        )
+
+    async def update(self, feed_entries: Optional[Dict[str, FeedEntry]]) -> None:
+        """Apply the changes of the current feed entries."""
+        feed_entries = feed_entries or {}
+        ranked = self._ranked
+        changed = False
+        for external_id in [key for key in ranked if key not in feed_entries]:
+            del ranked[external_id]
+            changed = True
+        for external_id, entry in feed_entries.items():
+            current = ranked.get(external_id)
+            if (
+                current is not None
+                and current[1] is entry
+                and current[2] == entry.version
+            ):
+                continue
+            key = self._key(entry)
+            if key is None:
+                if current is not None:
+                    del ranked[external_id]
+                    changed = True
+                continue
+            ranked[external_id] = (key, entry, entry.version)
+            if current is None or current[0] != key:
+                heapq.heappush(self._heap, (key, next(self._counter), external_id))
+            changed = True
+        if changed:
+            self._top = None
+        if len(self._heap) > 2 * len(ranked) + self._size:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        """Rebuild the heap from the current keys only."""
+        self._heap = [
+            (key, next(self._counter), external_id)
+            for external_id, (key, _, _) in self._ranked.items()
+        ]
+        heapq.heapify(self._heap)
+
+    def _valid(self, item) -> bool:
+        """Check whether a heap item holds the current key of its aircraft."""
+        current = self._ranked.get(item[2])
+        return current is not None and current[0] == item[0]
+
+    @property
+    def entries(self) -> List[FeedEntry]:
+        """Return the first entries, in order."""
+        if self._top is None:
+            heap = self._heap
+            top = []
+            seen = set()
+            while heap and len(top) < self._size:
+                item = heapq.heappop(heap)
+                # Several items may hold the same, current key of an aircraft.
+                if self._valid(item) and item[2] not in seen:
+                    seen.add(item[2])
+                    top.append(item)
+            for item in top:
+                heapq.heappush(heap, item)
+            self._top = [self._ranked[item[2]][1] for item in top]
+        return self._top
+
+    @property
+    def external_ids(self) -> List[str]:
+        """Return the external ids of the first entries, in order."""
+        return [entry.external_id for entry in self.entries]
@@ -0,0 +1,172 @@
+"""
+SBS-1 (BaseStation) message parser.
+
+Turns the comma separated message stream that dump1090 provides on port 30003
+into snapshots in the same format as the JSON feed parsers produce.
+"""
+import datetime
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .consts import (
+    ATTR_ALTITUDE,
+    ATTR_CALLSIGN,
+    ATTR_LATITUDE,
+    ATTR_LONGITUDE,
+    ATTR_MODE_S,
+    ATTR_SPEED,
+    ATTR_SQUAWK,
+    ATTR_TRACK,
+    ATTR_UPDATED,
+    ATTR_VERT_RATE,
+)
+from .utils import INTERN_TABLE, FixedSizeDict, InternTable
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_INTERVAL = 1.0
+DEFAULT_AIRCRAFTS_CACHE_SIZE = 1000
+
+MESSAGE_TYPE = "MSG"
+
+# Field positions within a message, see
+# https://github.com/wiseman/node-sbs1#parsed-messages
+FIELD_MESSAGE_TYPE = 0
+FIELD_HEX_IDENT = 4
+FIELD_DATE_GENERATED = 6
+FIELD_TIME_GENERATED = 7
+FIELD_CALLSIGN = 10
+FIELD_ALTITUDE = 11
+FIELD_GROUND_SPEED = 12
+FIELD_TRACK = 13
+FIELD_LATITUDE = 14
+FIELD_LONGITUDE = 15
+FIELD_VERTICAL_RATE = 16
+FIELD_SQUAWK = 17
+FIELD_IS_ON_GROUND = 21
+NUMBER_OF_FIELDS = 22
+
+TIMESTAMP_FORMAT = "%Y/%m/%d %H:%M:%S.%f"
+
+
+class SBS1Parser:
+    """Accumulates SBS-1 messages into snapshots of aircraft data.
+
+    SBS-1 messages only ever carry a subset of an aircraft's data, so the
+    latest known values are kept per aircraft and a snapshot of all aircraft
+    heard from is emitted each time the message timestamps cross the end of
+    the current snapshot interval. Message timestamps are interpreted as UTC.
+    """
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_SNAPSHOT_INTERVAL,
+        cache_size: int = DEFAULT_AIRCRAFTS_CACHE_SIZE,
+        intern_table: InternTable = INTERN_TABLE,
+    ) -> None:
+        """Initialise parser."""
+        self._interval = interval
+        self._intern_table = intern_table
+        self._aircrafts = FixedSizeDict(max=cache_size)
+        self._heard = set()
+        self._interval_end = None
+
+    def __repr__(self) -> str:
+        """Return string representation of this parser."""
+        return "<{}(interval={})>".format(self.__class__.__name__, self._interval)
+
+    def parse_line(self, line: str) -> Optional[List[Dict]]:
+        """Parse a single message and return a snapshot if one is complete."""
+        fields = line.strip().split(",")
+        if len(fields) < NUMBER_OF_FIELDS or fields[FIELD_MESSAGE_TYPE] != MESSAGE_TYPE:
+            return None
+        mode_s = fields[FIELD_HEX_IDENT]
+        if not mode_s:
+            return None
+        mode_s = self._intern_table.intern(mode_s)
+        try:
+            timestamp = (
+                datetime.datetime.strptime(
+                    "{} {}".format(
+                        fields[FIELD_DATE_GENERATED], fields[FIELD_TIME_GENERATED]
+                    ),
+                    TIMESTAMP_FORMAT,
+                )
+                .replace(tzinfo=datetime.timezone.utc)
+                .timestamp()
+            )
+        except ValueError:
+            _LOGGER.debug("Unable to parse timestamp in %s", line)
+            return None
+        snapshot = None
+        if self._interval_end is None:
+            self._interval_end = timestamp + self._interval
+        elif timestamp >= self._interval_end:
+            snapshot = self.flush()
+            while self._interval_end <= timestamp:
+                self._interval_end += self._interval
+        self._update_aircraft(mode_s, timestamp, fields)
+        return snapshot
+
+    def parse(self, lines: Iterable[str]) -> Iterator[List[Dict]]:
+        """Parse a stream of messages and generate snapshots."""
+        for line in lines:
+            snapshot = self.parse_line(line)
+            if snapshot:
+                yield snapshot
+        snapshot = self.flush()
+        if snapshot:
+            yield snapshot
+
+    def flush(self) -> List[Dict]:
+        """Return a snapshot of all aircrafts heard since the last snapshot."""
+        result = [
+            dict(self._aircrafts[mode_s])
+            for mode_s in self._heard
+            if mode_s in self._aircrafts
+        ]
+        self._heard.clear()
+        _LOGGER.debug("Parser result = %s", result)
+        return result
+
+    def _update_aircraft(self, mode_s: str, timestamp: float, fields: List[str]):
+        """Merge the values contained in a message into the aircraft data."""
+        if mode_s in self._aircrafts:
+            aircraft = self._aircrafts[mode_s]
+        else:
+            aircraft = {
+                ATTR_MODE_S: mode_s,
+                ATTR_LATITUDE: None,
+                ATTR_LONGITUDE: None,
+                ATTR_TRACK: None,
+                ATTR_ALTITUDE: None,
+                ATTR_SPEED: None,
+                ATTR_SQUAWK: None,
+                ATTR_UPDATED: None,
+                ATTR_VERT_RATE: None,
+                ATTR_CALLSIGN: None,
+            }
+            self._aircrafts[mode_s] = aircraft
+        aircraft[ATTR_UPDATED] = timestamp
+        if fields[FIELD_CALLSIGN]:
+            aircraft[ATTR_CALLSIGN] = self._intern_table.intern(
+                fields[FIELD_CALLSIGN].strip()
+            )
+        if fields[FIELD_SQUAWK]:
+            aircraft[ATTR_SQUAWK] = self._intern_table.intern(fields[FIELD_SQUAWK])
+        for attribute, field, convert in (
+            (ATTR_ALTITUDE, FIELD_ALTITUDE, int),
+            (ATTR_SPEED, FIELD_GROUND_SPEED, int),
+            (ATTR_TRACK, FIELD_TRACK, int),
+            (ATTR_LATITUDE, FIELD_LATITUDE, float),
+            (ATTR_LONGITUDE, FIELD_LONGITUDE, float),
+            (ATTR_VERT_RATE, FIELD_VERTICAL_RATE, int),
+        ):
+            if fields[field]:
+                try:
+                    aircraft[attribute] = convert(float(fields[field]))
+                except ValueError:
+                    _LOGGER.debug("Invalid value for %s: %s", attribute, fields[field])
+        if fields[FIELD_IS_ON_GROUND] == "-1":
+            aircraft[ATTR_ALTITUDE] = "ground"
+        self._heard.add(mode_s)
@@ -0,0 +1,207 @@
+"""
+Flight sessions.
+
+Summarises each visit of an aircraft from its first sighting until it has not
+been seen for a while.
+"""
+import collections
+import datetime
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from .consts import INVALID_COORDINATES, NONE_COORDINATES
+from .feed_entry import FeedEntry
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_ABSENCE_TIMEOUT = datetime.timedelta(minutes=5)
+DEFAULT_CLOSED_SESSIONS_SIZE = 1000
+
+
+class FlightSession:
+    """Summary of a single visit of an aircraft."""
+
+    def __init__(self, external_id: str, timestamp: datetime.datetime) -> None:
+        """Initialise flight session."""
+        self._external_id = external_id
+        self._entry_time = timestamp
+        self._exit_time = timestamp
+        self._closest_distance = None
+        self._closest_coordinates = None
+        self._min_altitude = None
+        self._max_altitude = None
+        self._callsigns = set()
+        self._samples = 0
+
+    def __repr__(self) -> str:
+        """Return string representation of this flight session."""
+        return "<{}(id={}, entry={}, exit={})>".format(
+            self.__class__.__name__,
+            self._external_id,
+            self._entry_time,
+            self._exit_time,
+        )
+
+    def update(self, entry: FeedEntry, timestamp: datetime.datetime) -> None:
+        """Record a sighting of the aircraft."""
+        self._exit_time = timestamp
+        self._samples += 1
+        coordinates = entry.coordinates
+        if (
+            coordinates
+            and coordinates != INVALID_COORDINATES
+            and coordinates != NONE_COORDINATES
+            and entry.home_coordinates
+        ):
+            distance = entry.distance_to_home
+            if self._closest_distance is None or distance < self._closest_distance:
+                self._closest_distance = distance
+                self._closest_coordinates = coordinates
+        altitude = entry.altitude
+        if altitude is not None:
+            if self._min_altitude is None or altitude < self._min_altitude:
+                self._min_altitude = altitude
+            if self._max_altitude is None or altitude > self._max_altitude:
+                self._max_altitude = altitude
+        callsign = entry.callsign
+        if callsign:
+            self._callsigns.add(callsign)
+
+    @property
+    def external_id(self) -> str:
+        """Return the external id of the aircraft."""
+        return self._external_id
+
+    @property
+    def entry_time(self) -> datetime.datetime:
+        """Return the time the aircraft was first seen."""
+        return self._entry_time
+
+    @property
+    def exit_time(self) -> datetime.datetime:
+        """Return the time the aircraft was last seen."""
+        return self._exit_time
+
+    @property
+    def duration(self) -> datetime.timedelta:
+        """Return the time between first and last sighting."""
+        return self._exit_time - self._entry_time
+
+    @property
+    def closest_distance(self) -> Optional[float]:
+        """Return the closest distance in km to the home coordinates."""
+        return self._closest_distance
+
+    @property
+    def closest_coordinates(self) -> Optional[tuple]:
+        """Return the coordinates of the closest approach to home."""
+        return self._closest_coordinates
+
+    @property
+    def min_altitude(self) -> Optional[int]:
+        """Return the lowest altitude seen."""
+        return self._min_altitude
+
+    @property
+    def max_altitude(self) -> Optional[int]:
+        """Return the highest altitude seen."""
+        return self._max_altitude
+
+    @property
+    def callsigns(self) -> Set[str]:
+        """Return all callsigns seen."""
+        return self._callsigns
+
+    @property
+    def samples(self) -> int:
+        """Return the number of sightings."""
+        return self._samples
+
+
+class SessionTracker:
+    """Keeps track of open flight sessions and closes them after an absence.
+
+    Open sessions are kept ordered by the time they were last seen, so that
+    expired sessions can be found without looking at all open sessions.
+    Closed sessions are kept in a bounded queue and passed on to the optional
+    sink callback.
+    """
+
+    def __init__(
+        self,
+        absence_timeout: datetime.timedelta = DEFAULT_ABSENCE_TIMEOUT,
+        closed_sessions_size: int = DEFAULT_CLOSED_SESSIONS_SIZE,
+        sink: Callable[[FlightSession], Awaitable[None]] = None,
+    ) -> None:
+        """Initialise session tracker."""
+        self._absence_timeout = absence_timeout
+        self._open_sessions = collections.OrderedDict()
+        self._closed_sessions = collections.deque(maxlen=closed_sessions_size)
+        self._sink = sink
+
+    def __repr__(self) -> str:
+        """Return string representation of this session tracker."""
+        return "<{}(open={}, closed={})>".format(
+            self.__class__.__name__,
+            len(self._open_sessions),
+            len(self._closed_sessions),
+        )
+
+    @property
+    def open_sessions(self) -> Dict[str, FlightSession]:
+        """Return the currently open sessions by external id."""
+        return self._open_sessions
+
+    def get(self, external_id: str) -> Optional[FlightSession]:
+        """Return the open session of the provided aircraft."""
+        return self._open_sessions.get(external_id)
+
+    def closed_sessions(self, clear: bool = False) -> List[FlightSession]:
+        """Return the most recently closed sessions, oldest first."""
+        result = list(self._closed_sessions)
+        if clear:
+            self._closed_sessions.clear()
+        return result
+
+    async def update(
+        self,
+        feed_entries: Optional[Dict[str, FeedEntry]],
+        timestamp: datetime.datetime = None,
+    ) -> None:
+        """Record the current feed entries and close expired sessions."""
+        if timestamp is None:
+            timestamp = datetime.datetime.now(datetime.timezone.utc)
+        if feed_entries:
+            for external_id, entry in feed_entries.items():
+                session = self._open_sessions.get(external_id)
+                if session:
+                    self._open_sessions.move_to_end(external_id)
+                else:
+                    session = FlightSession(external_id, timestamp)
+                    self._open_sessions[external_id] = session
+                    _LOGGER.debug("Session opened %s", external_id)
+                session.update(entry, timestamp)
+        await self._close_expired_sessions(timestamp)
+
+    async def close_all(self) -> None:
+        """Close all open sessions, for example on shutdown."""
+        while self._open_sessions:
+            _, session = self._open_sessions.popitem(False)
+            await self._close(session)
+
+    async def _close_expired_sessions(self, timestamp: datetime.datetime) -> None:
+        """Close all sessions of aircrafts not seen within the absence timeout."""
+        expiry = timestamp - self._absence_timeout
+        while self._open_sessions:
+            session = next(iter(self._open_sessions.values()))
+            if session.exit_time > expiry:
+                break
+            self._open_sessions.popitem(False)
+            await self._close(session)
+
+    async def _close(self, session: FlightSession) -> None:
+        """Hand over a closed session."""
+        _LOGGER.debug("Session closed %s", session)
+        self._closed_sessions.append(session)
+        if self._sink:
+            await self._sink(session)
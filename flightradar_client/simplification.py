@@ -0,0 +1,320 @@
+"""
+Track simplification.
+
+Reduces the number of stored positions per aircraft while it is being
+tracked. Positions are collected in a bounded window after the last kept
+position (the anchor) for as long as the straight, constant speed movement
+from the anchor to the latest position reproduces all positions in the window
+within the tolerance. Once it does not, the last position that did is kept and
+becomes the new anchor.
+"""
+import datetime
+import logging
+import math
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from .consts import (
+    ATTR_ALTITUDE,
+    ATTR_CALLSIGN,
+    ATTR_LATITUDE,
+    ATTR_LONGITUDE,
+    ATTR_MODE_S,
+    ATTR_SPEED,
+    ATTR_SQUAWK,
+    ATTR_TRACK,
+    ATTR_UPDATED,
+    ATTR_VERT_RATE,
+    INVALID_COORDINATES,
+    NONE_COORDINATES,
+)
+from .feed_entry import FeedEntry
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_TOLERANCE = 50.0
+DEFAULT_ALTITUDE_TOLERANCE = 100
+DEFAULT_MAX_INTERVAL = datetime.timedelta(minutes=5)
+DEFAULT_MAX_WINDOW = 100
+
+EARTH_RADIUS = 6371008.8
+
+
+class TrackPoint:
+    """Single position of an aircraft."""
+
+    __slots__ = (
+        "time",
+        "latitude",
+        "longitude",
+        "altitude",
+        "track",
+        "speed",
+        "vert_rate",
+        "squawk",
+        "callsign",
+    )
+
+    def __init__(
+        self,
+        time: float,
+        latitude: float,
+        longitude: float,
+        altitude: Optional[int],
+        track: Optional[int] = None,
+        speed: Optional[int] = None,
+        vert_rate: Optional[int] = None,
+        squawk: Optional[str] = None,
+        callsign: Optional[str] = None,
+    ) -> None:
+        """Initialise track point."""
+        self.time = time
+        self.latitude = latitude
+        self.longitude = longitude
+        self.altitude = altitude
+        self.track = track
+        self.speed = speed
+        self.vert_rate = vert_rate
+        self.squawk = squawk
+        self.callsign = callsign
+
+    def __repr__(self) -> str:
+        """Return string representation of this track point."""
+        return "<{}(time={}, latitude={}, longitude={})>".format(
+            self.__class__.__name__, self.time, self.latitude, self.longitude
+        )
+
+    def to_entry(
+        self, external_id: str, home_coordinates: Tuple[float, float]
+    ) -> FeedEntry:
+        """Create a feed entry of this position."""
+        return FeedEntry(
+            home_coordinates,
+            {
+                ATTR_MODE_S: external_id,
+                ATTR_LATITUDE: self.latitude,
+                ATTR_LONGITUDE: self.longitude,
+                ATTR_ALTITUDE: self.altitude,
+                ATTR_TRACK: self.track,
+                ATTR_SPEED: self.speed,
+                ATTR_VERT_RATE: self.vert_rate,
+                ATTR_SQUAWK: self.squawk,
+                ATTR_CALLSIGN: self.callsign,
+                ATTR_UPDATED: self.time,
+            },
+        )
+
+
+def synchronized_distance(point: TrackPoint, start: TrackPoint, end: TrackPoint):
+    """Return the distance in metres from the point to where it should be.
+
+    The expected position is interpolated between start and end at the time
+    of the point, using an equirectangular projection which is accurate
+    enough for the short distances between polls.
+    """
+    duration = end.time - start.time
+    fraction = (point.time - start.time) / duration if duration > 0 else 0.0
+    latitude = start.latitude + (end.latitude - start.latitude) * fraction
+    longitude = start.longitude + (end.longitude - start.longitude) * fraction
+    delta_x = (
+        math.radians(point.longitude - longitude)
+        * math.cos(math.radians(point.latitude))
+        * EARTH_RADIUS
+    )
+    delta_y = math.radians(point.latitude - latitude) * EARTH_RADIUS
+    return math.hypot(delta_x, delta_y)
+
+
+def altitude_deviation(point: TrackPoint, start: TrackPoint, end: TrackPoint):
+    """Return the deviation in feet from the interpolated altitude."""
+    if point.altitude is None or start.altitude is None or end.altitude is None:
+        return 0
+    duration = end.time - start.time
+    fraction = (point.time - start.time) / duration if duration > 0 else 0.0
+    altitude = start.altitude + (end.altitude - start.altitude) * fraction
+    return abs(point.altitude - altitude)
+
+
+class _Track:
+    """Simplification state of a single aircraft."""
+
+    __slots__ = ("home_coordinates", "anchor", "window")
+
+    def __init__(
+        self, home_coordinates: Tuple[float, float], anchor: TrackPoint
+    ) -> None:
+        """Initialise track state."""
+        self.home_coordinates = home_coordinates
+        self.anchor = anchor
+        self.window = []
+
+    @property
+    def last(self) -> TrackPoint:
+        """Return the latest position."""
+        return self.window[-1] if self.window else self.anchor
+
+
+class TrackSimplifier:
+    """Keeps only the positions needed to reproduce each track.
+
+    Kept positions are returned from each update and passed on to the
+    optional sink, for example the update method of a history sink. The
+    latest position of an aircraft that is no longer in the feed is kept
+    as the end of its track.
+    """
+
+    def __init__(
+        self,
+        tolerance: float = DEFAULT_TOLERANCE,
+        altitude_tolerance: int = DEFAULT_ALTITUDE_TOLERANCE,
+        max_interval: datetime.timedelta = DEFAULT_MAX_INTERVAL,
+        max_window: int = DEFAULT_MAX_WINDOW,
+        sink: Callable[[Dict[str, FeedEntry]], Awaitable[None]] = None,
+    ) -> None:
+        """Initialise track simplifier."""
+        self._tolerance = tolerance
+        self._altitude_tolerance = altitude_tolerance
+        self._max_interval = max_interval.total_seconds()
+        self._max_window = max_window
+        self._sink = sink
+        self._tracks = {}
+        self._received = 0
+        self._kept = 0
+
+    def __repr__(self) -> str:
+        """Return string representation of this simplifier."""
+        return "<{}(tolerance={}, tracks={})>".format(
+            self.__class__.__name__, self._tolerance, len(self._tracks)
+        )
+
+    @property
+    def received(self) -> int:
+        """Return the number of positions received."""
+        return self._received
+
+    @property
+    def kept(self) -> int:
+        """Return the number of positions kept."""
+        return self._kept
+
+    @property
+    def ratio(self) -> Optional[float]:
+        """Return the ratio of received to kept positions."""
+        return self._received / self._kept if self._kept else None
+
+    async def update(
+        self, feed_entries: Optional[Dict[str, FeedEntry]]
+    ) -> Dict[str, FeedEntry]:
+        """Process the current feed entries and return the kept positions."""
+        feed_entries = feed_entries or {}
+        now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+        kept = {}
+        for external_id, entry in feed_entries.items():
+            point = _point(entry, now)
+            if point:
+                kept_point = self._add(external_id, entry.home_coordinates, point)
+                if kept_point:
+                    kept[external_id] = kept_point.to_entry(
+                        external_id, entry.home_coordinates
+                    )
+        for external_id in [
+            external_id
+            for external_id in self._tracks
+            if external_id not in feed_entries
+        ]:
+            track = self._tracks.pop(external_id)
+            if track.window:
+                kept[external_id] = self._keep(track.window[-1]).to_entry(
+                    external_id, track.home_coordinates
+                )
+        await self._hand_over(kept)
+        return kept
+
+    async def flush(self) -> Dict[str, FeedEntry]:
+        """Keep the latest position of all tracks, for example on shutdown."""
+        kept = {
+            external_id: self._keep(track.window[-1]).to_entry(
+                external_id, track.home_coordinates
+            )
+            for external_id, track in self._tracks.items()
+            if track.window
+        }
+        self._tracks.clear()
+        await self._hand_over(kept)
+        return kept
+
+    def _add(
+        self,
+        external_id: str,
+        home_coordinates: Tuple[float, float],
+        point: TrackPoint,
+    ) -> Optional[TrackPoint]:
+        """Add position to the track and return the position kept, if any."""
+        track = self._tracks.get(external_id)
+        if track is not None and point.time <= track.last.time:
+            # Position has not been updated since the last poll.
+            return None
+        self._received += 1
+        if track is None:
+            self._tracks[external_id] = _Track(home_coordinates, point)
+            return self._keep(point)
+        if self._fits(track, point):
+            track.window.append(point)
+            return None
+        if track.window:
+            # The previous position is the last one the segment reproduces.
+            track.anchor = track.window[-1]
+            track.window = [point]
+        else:
+            track.anchor = point
+        return self._keep(track.anchor)
+
+    def _fits(self, track: _Track, point: TrackPoint) -> bool:
+        """Check whether the segment to the point reproduces the window."""
+        anchor = track.anchor
+        if (
+            len(track.window) >= self._max_window
+            or point.time - anchor.time > self._max_interval
+        ):
+            return False
+        for candidate in track.window:
+            if (
+                synchronized_distance(candidate, anchor, point) > self._tolerance
+                or altitude_deviation(candidate, anchor, point)
+                > self._altitude_tolerance
+            ):
+                return False
+        return True
+
+    def _keep(self, point: TrackPoint) -> TrackPoint:
+        """Count a kept position."""
+        self._kept += 1
+        return point
+
+    async def _hand_over(self, kept: Dict[str, FeedEntry]) -> None:
+        """Pass kept positions on to the sink."""
+        if kept and self._sink:
+            await self._sink(kept)
+
+
+def _point(entry: FeedEntry, now: float) -> Optional[TrackPoint]:
+    """Convert an entry into a track point."""
+    coordinates = entry.coordinates
+    if (
+        not coordinates
+        or coordinates == INVALID_COORDINATES
+        or coordinates == NONE_COORDINATES
+    ):
+        return None
+    updated = entry.updated
+    # Only the values are kept, the aggregator may update entries in place.
+    return TrackPoint(
+        updated.timestamp() if updated else now,
+        coordinates[0],
+        coordinates[1],
+        entry.altitude,
+        entry.track,
+        entry.speed,
+        entry.vert_rate,
+        entry.squawk,
+        entry.callsign,
+    )
@@ -0,0 +1,634 @@
+"""
+Receiver simulator.
+
+Generates synthetic traffic and serves it in the formats of the supported
+receivers: Dump1090 aircraft JSON, Flightradar flights JSON and an SBS-1
+message stream. All formats are produced from the same traffic model, so the
+simulator can stand in for real receivers in load and soak tests.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import math
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+from .consts import (
+    ATTR_ALTITUDE,
+    ATTR_CALLSIGN,
+    ATTR_LATITUDE,
+    ATTR_LONGITUDE,
+    ATTR_MODE_S,
+    ATTR_SPEED,
+    ATTR_SQUAWK,
+    ATTR_TRACK,
+    ATTR_UPDATED,
+    ATTR_VERT_RATE,
+)
+from .sbs1 import NUMBER_OF_FIELDS
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_AIRCRAFT_COUNT = 100
+DEFAULT_HOME_COORDINATES = (-33.86, 151.21)
+DEFAULT_RADIUS = 250.0
+DEFAULT_MISSING_FIELDS = 0.1
+DEFAULT_INVALID_COORDINATES = 0.02
+DEFAULT_ON_GROUND = 0.05
+DEFAULT_DROPOUTS = 0.05
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_HTTP_PORT = 8888
+DEFAULT_SBS1_PORT = 30003
+DEFAULT_INTERVAL = 1.0
+# Bytes not yet sent to an SBS-1 client before it is disconnected.
+DEFAULT_HIGH_WATER_MARK = 1024 * 1024
+
+DUMP1090_PATH = "/data/aircraft.json"
+FR24_PATH = "/flights.json"
+
+KM_PER_DEGREE = 111.195
+KM_PER_NAUTICAL_MILE = 1.852
+MIN_ALTITUDE = 1000
+MAX_ALTITUDE = 41000
+# Maximum change of the track in degrees per second while turning.
+MAX_TURN_RATE = 3.0
+
+AIRLINES = ("QFA", "JST", "VOZ", "QLK", "RXA", "UAE", "SIA", "ANZ")
+SBS1_DATE_FORMAT = "%Y/%m/%d"
+SBS1_TIME_FORMAT = "%H:%M:%S.%f"
+
+
+class SimulatedAircraft:
+    """State of a single synthetic aircraft."""
+
+    __slots__ = (
+        "mode_s",
+        "callsign",
+        "squawk",
+        "latitude",
+        "longitude",
+        "altitude",
+        "track",
+        "speed",
+        "vert_rate",
+        "on_ground",
+    )
+
+    def __repr__(self) -> str:
+        """Return string representation of this aircraft."""
+        return "<{}(mode_s={}, callsign={})>".format(
+            self.__class__.__name__, self.mode_s, self.callsign
+        )
+
+
+class TrafficModel:
+    """Synthetic traffic moving around the home coordinates.
+
+    Aircrafts fly straight with occasional turns and climb or descend, and
+    turn back towards the home coordinates when leaving the radius. Each
+    snapshot reproduces the imperfections of real receivers: fields that are
+    missing, (0, 0) coordinates and aircrafts that are not received at all,
+    each with the configured probability per aircraft.
+    """
+
+    def __init__(
+        self,
+        aircraft_count: int = DEFAULT_AIRCRAFT_COUNT,
+        home_coordinates: Tuple[float, float] = DEFAULT_HOME_COORDINATES,
+        radius: float = DEFAULT_RADIUS,
+        missing_fields: float = DEFAULT_MISSING_FIELDS,
+        invalid_coordinates: float = DEFAULT_INVALID_COORDINATES,
+        on_ground: float = DEFAULT_ON_GROUND,
+        dropouts: float = DEFAULT_DROPOUTS,
+        seed: int = None,
+        start: float = None,
+    ) -> None:
+        """Initialise traffic model."""
+        self._home_coordinates = home_coordinates
+        self._radius = radius
+        self._missing_fields = missing_fields
+        self._invalid_coordinates = invalid_coordinates
+        self._dropouts = dropouts
+        self._random = random.Random(seed)
+        self._now = time.time() if start is None else start
+        addresses = self._random.sample(range(0x010000, 0xFFFFFF), aircraft_count)
+        self._aircrafts = [
+            self._create_aircraft(address, self._random.random() < on_ground)
+            for address in addresses
+        ]
+
+    def __repr__(self) -> str:
+        """Return string representation of this model."""
+        return "<{}(aircrafts={}, home={}, radius={})>".format(
+            self.__class__.__name__,
+            len(self._aircrafts),
+            self._home_coordinates,
+            self._radius,
+        )
+
+    @property
+    def now(self) -> float:
+        """Return the current time of the model as unix timestamp."""
+        return self._now
+
+    @property
+    def aircrafts(self) -> List[SimulatedAircraft]:
+        """Return all simulated aircrafts, including those not received."""
+        return self._aircrafts
+
+    def _create_aircraft(self, address: int, on_ground: bool) -> SimulatedAircraft:
+        """Create an aircraft at a random position within the radius."""
+        rng = self._random
+        aircraft = SimulatedAircraft()
+        aircraft.mode_s = format(address, "06X")
+        aircraft.callsign = "{}{}".format(rng.choice(AIRLINES), rng.randint(1, 9999))
+        aircraft.squawk = "".join(str(rng.randint(0, 7)) for _ in range(4))
+        distance = self._radius * math.sqrt(rng.random())
+        bearing = rng.uniform(0, 360)
+        aircraft.latitude, aircraft.longitude = _move(
+            self._home_coordinates, bearing, distance
+        )
+        aircraft.on_ground = on_ground
+        aircraft.track = rng.randint(0, 359)
+        if on_ground:
+            aircraft.altitude = 0
+            aircraft.speed = rng.randint(0, 20)
+            aircraft.vert_rate = 0
+        else:
+            aircraft.altitude = rng.randrange(MIN_ALTITUDE, MAX_ALTITUDE, 25)
+            aircraft.speed = rng.randint(150, 500)
+            aircraft.vert_rate = rng.choice((0, 0, 0, -1600, -640, 640, 1600))
+        return aircraft
+
+    def step(self, elapsed: float) -> None:
+        """Advance all aircrafts by the elapsed seconds."""
+        rng = self._random
+        self._now += elapsed
+        for aircraft in self._aircrafts:
+            distance = aircraft.speed * KM_PER_NAUTICAL_MILE * elapsed / 3600
+            aircraft.latitude, aircraft.longitude = _move(
+                (aircraft.latitude, aircraft.longitude), aircraft.track, distance
+            )
+            if aircraft.on_ground:
+                continue
+            if _distance(self._home_coordinates, aircraft) > self._radius:
+                bearing = _bearing(
+                    (aircraft.latitude, aircraft.longitude), self._home_coordinates
+                )
+                aircraft.track = (bearing + rng.uniform(-30, 30)) % 360
+            elif rng.random() < 0.1:
+                aircraft.track = (
+                    aircraft.track
+                    + rng.uniform(-MAX_TURN_RATE, MAX_TURN_RATE) * elapsed
+                ) % 360
+            aircraft.altitude += aircraft.vert_rate * elapsed / 60
+            if not MIN_ALTITUDE <= aircraft.altitude <= MAX_ALTITUDE:
+                aircraft.altitude = min(
+                    max(aircraft.altitude, MIN_ALTITUDE), MAX_ALTITUDE
+                )
+                aircraft.vert_rate = -aircraft.vert_rate
+
+    def snapshot(self) -> List[Dict]:
+        """Return the data of all aircrafts received at the current time."""
+        rng = self._random
+        updated = round(self._now, 1)
+        result = []
+        for aircraft in self._aircrafts:
+            if rng.random() < self._dropouts:
+                continue
+            data = {
+                ATTR_MODE_S: aircraft.mode_s,
+                ATTR_LATITUDE: round(aircraft.latitude, 6),
+                ATTR_LONGITUDE: round(aircraft.longitude, 6),
+                ATTR_TRACK: int(aircraft.track),
+                ATTR_ALTITUDE: "ground"
+                if aircraft.on_ground
+                else int(aircraft.altitude) // 25 * 25,
+                ATTR_SPEED: aircraft.speed,
+                ATTR_SQUAWK: aircraft.squawk,
+                ATTR_UPDATED: updated,
+                ATTR_VERT_RATE: aircraft.vert_rate,
+                ATTR_CALLSIGN: aircraft.callsign,
+            }
+            if rng.random() < self._invalid_coordinates:
+                data[ATTR_LATITUDE] = data[ATTR_LONGITUDE] = 0.0
+            elif rng.random() < self._missing_fields:
+                data[ATTR_LATITUDE] = data[ATTR_LONGITUDE] = None
+            for field in (ATTR_CALLSIGN, ATTR_SQUAWK, ATTR_VERT_RATE):
+                if rng.random() < self._missing_fields:
+                    data[field] = None
+            result.append(data)
+        return result
+
+
+def _move(
+    coordinates: Tuple[float, float], bearing: float, distance: float
+) -> Tuple[float, float]:
+    """Return the coordinates after moving the distance in km on the bearing."""
+    latitude, longitude = coordinates
+    radians = math.radians(bearing)
+    latitude += distance * math.cos(radians) / KM_PER_DEGREE
+    latitude = min(max(latitude, -89.9), 89.9)
+    longitude += (
+        distance
+        * math.sin(radians)
+        / (KM_PER_DEGREE * math.cos(math.radians(latitude)))
+    )
+    return latitude, (longitude + 180.0) % 360.0 - 180.0
+
+
+def _distance(home_coordinates: Tuple[float, float], aircraft) -> float:
+    """Return the approximate distance in km of the aircraft to home."""
+    delta_latitude = aircraft.latitude - home_coordinates[0]
+    delta_longitude = (aircraft.longitude - home_coordinates[1]) * math.cos(
+        math.radians(home_coordinates[0])
+    )
+    return math.hypot(delta_latitude, delta_longitude) * KM_PER_DEGREE
+
+
+def _bearing(origin: Tuple[float, float], target: Tuple[float, float]) -> float:
+    """Return the approximate bearing in degrees from origin to target."""
+    delta_latitude = target[0] - origin[0]
+    delta_longitude = (target[1] - origin[1]) * math.cos(math.radians(origin[0]))
+    return math.degrees(math.atan2(delta_longitude, delta_latitude)) % 360
+
+
+def dump1090_json(snapshot: List[Dict], now: float) -> Dict:
+    """Return the snapshot in the Dump1090 aircraft JSON format."""
+    aircrafts = []
+    for data in snapshot:
+        aircraft = {"hex": data[ATTR_MODE_S].lower()}
+        for key, field in (
+            ("squawk", ATTR_SQUAWK),
+            ("lat", ATTR_LATITUDE),
+            ("lon", ATTR_LONGITUDE),
+            ("altitude", ATTR_ALTITUDE),
+            ("vert_rate", ATTR_VERT_RATE),
+            ("track", ATTR_TRACK),
+            ("speed", ATTR_SPEED),
+        ):
+            if data[field] is not None:
+                aircraft[key] = data[field]
+        if data[ATTR_CALLSIGN] is not None:
+            aircraft["flight"] = data[ATTR_CALLSIGN].ljust(8)
+        aircraft["seen"] = 0.0
+        aircrafts.append(aircraft)
+    return {"now": now, "messages": len(aircrafts), "aircraft": aircrafts}
+
+
+def fr24_json(snapshot: List[Dict]) -> Dict:
+    """Return the snapshot in the Flightradar flights JSON format.
+
+    This format has no way to leave out values, missing values are reported
+    as zero or empty string like the real feed does.
+    """
+    result = {}
+    for data in snapshot:
+        altitude = data[ATTR_ALTITUDE]
+        result["x" + data[ATTR_MODE_S].lower()] = [
+            data[ATTR_MODE_S],
+            data[ATTR_LATITUDE] or 0.0,
+            data[ATTR_LONGITUDE] or 0.0,
+            data[ATTR_TRACK] or 0,
+            0 if altitude == "ground" else altitude or 0,
+            data[ATTR_SPEED] or 0,
+            data[ATTR_SQUAWK] or "",
+            0,
+            "",
+            "",
+            int(data[ATTR_UPDATED]),
+            "",
+            "",
+            "",
+            1 if altitude == "ground" else 0,
+            data[ATTR_VERT_RATE] or 0,
+            data[ATTR_CALLSIGN] or "",
+        ]
+    return result
+
+
+def sbs1_messages(snapshot: List[Dict]) -> List[str]:
+    """Return the snapshot as SBS-1 messages, several per aircraft."""
+    lines = []
+    for data in snapshot:
+        timestamp = datetime.datetime.fromtimestamp(
+            data[ATTR_UPDATED], tz=datetime.timezone.utc
+        )
+        date = timestamp.strftime(SBS1_DATE_FORMAT)
+        clock = timestamp.strftime(SBS1_TIME_FORMAT)[:-3]
+        on_ground = data[ATTR_ALTITUDE] == "ground"
+        if data[ATTR_CALLSIGN] is not None:
+            lines.append(_sbs1_message(data, date, clock, 1, {10: data[ATTR_CALLSIGN]}))
+        if data[ATTR_LATITUDE] is not None:
+            lines.append(
+                _sbs1_message(
+                    data,
+                    date,
+                    clock,
+                    2 if on_ground else 3,
+                    {
+                        11: "" if on_ground else data[ATTR_ALTITUDE],
+                        14: data[ATTR_LATITUDE],
+                        15: data[ATTR_LONGITUDE],
+                        21: -1 if on_ground else 0,
+                    },
+                )
+            )
+        lines.append(
+            _sbs1_message(
+                data,
+                date,
+                clock,
+                4,
+                {
+                    12: data[ATTR_SPEED],
+                    13: data[ATTR_TRACK],
+                    16: data[ATTR_VERT_RATE],
+                },
+            )
+        )
+        if data[ATTR_SQUAWK] is not None:
+            lines.append(_sbs1_message(data, date, clock, 6, {17: data[ATTR_SQUAWK]}))
+    return lines
+
+
+def _sbs1_message(
+    data: Dict, date: str, clock: str, transmission_type: int, values: Dict
+) -> str:
+    """Return a single SBS-1 message with the values at their field positions."""
+    fields = ["MSG", str(transmission_type), "1", "1", data[ATTR_MODE_S], "1"]
+    fields += [date, clock, date, clock]
+    fields += [""] * (NUMBER_OF_FIELDS - len(fields))
+    for position, value in values.items():
+        fields[position] = "" if value is None else str(value)
+    return ",".join(fields)
+
+
+class ReceiverSimulator:
+    """Serves the traffic of a model like a local receiver.
+
+    The model is advanced once per interval, and each snapshot is serialised
+    once and served to all clients: the JSON feeds over HTTP and the SBS-1
+    messages as stream to all connected TCP clients. SBS-1 clients are not
+    waited for; those with more than the high-water mark of messages not yet
+    sent are disconnected.
+    """
+
+    def __init__(
+        self,
+        model: TrafficModel = None,
+        host: str = DEFAULT_HOST,
+        http_port: int = DEFAULT_HTTP_PORT,
+        sbs1_port: int = DEFAULT_SBS1_PORT,
+        interval: float = DEFAULT_INTERVAL,
+        high_water_mark: int = DEFAULT_HIGH_WATER_MARK,
+    ) -> None:
+        """Initialise simulator."""
+        self._model = model or TrafficModel()
+        self._host = host
+        self._http_port = http_port
+        self._sbs1_port = sbs1_port
+        self._interval = interval
+        self._high_water_mark = high_water_mark
+        self._dump1090 = None
+        self._fr24 = None
+        self._runner = None
+        self._server = None
+        self._clients = set()
+        self._ticker = None
+        self._render()
+
+    def __repr__(self) -> str:
+        """Return string representation of this simulator."""
+        return "<{}(host={}, http_port={}, sbs1_port={}, model={})>".format(
+            self.__class__.__name__,
+            self._host,
+            self.http_port,
+            self.sbs1_port,
+            self._model,
+        )
+
+    @property
+    def model(self) -> TrafficModel:
+        """Return the traffic model."""
+        return self._model
+
+    @property
+    def http_port(self) -> Optional[int]:
+        """Return the port the JSON feeds are served on."""
+        if self._runner and self._runner.addresses:
+            return self._runner.addresses[0][1]
+        return None
+
+    @property
+    def sbs1_port(self) -> Optional[int]:
+        """Return the port the SBS-1 messages are streamed on."""
+        if self._server and self._server.sockets:
+            return self._server.sockets[0].getsockname()[1]
+        return None
+
+    @property
+    def dump1090_url(self) -> str:
+        """Return the url of the Dump1090 aircraft JSON feed."""
+        return "http://{}:{}{}".format(self._host, self.http_port, DUMP1090_PATH)
+
+    @property
+    def fr24_url(self) -> str:
+        """Return the url of the Flightradar flights JSON feed."""
+        return "http://{}:{}{}".format(self._host, self.http_port, FR24_PATH)
+
+    def application(self) -> web.Application:
+        """Return the web application serving the JSON feeds."""
+        app = web.Application()
+        app.router.add_get(DUMP1090_PATH, self._handle_dump1090)
+        app.router.add_get(FR24_PATH, self._handle_fr24)
+        return app
+
+    async def start(self) -> None:
+        """Start serving and advancing the model."""
+        self._runner = web.AppRunner(self.application())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self._host, self._http_port)
+        await site.start()
+        self._server = await asyncio.start_server(
+            self._handle_sbs1, self._host, self._sbs1_port
+        )
+        self._ticker = asyncio.ensure_future(self._run())
+        _LOGGER.debug(
+            "Simulating %s aircrafts on ports %s and %s",
+            len(self._model.aircrafts),
+            self.http_port,
+            self.sbs1_port,
+        )
+
+    async def stop(self) -> None:
+        """Stop advancing the model and disconnect all clients."""
+        if self._ticker:
+            self._ticker.cancel()
+            try:
+                await self._ticker
+            except asyncio.CancelledError:
+                pass
+            self._ticker = None
+        for writer in list(self._clients):
+            writer.close()
+        self._clients.clear()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def tick(self) -> None:
+        """Advance the model by one interval and publish the new snapshot."""
+        self._model.step(self._interval)
+        messages = self._render()
+        if not self._clients:
+            return
+        payload = "".join(line + "\r\n" for line in messages).encode("ascii")
+        for writer in list(self._clients):
+            if writer.is_closing():
+                _LOGGER.debug("SBS-1 client disconnected")
+                self._clients.discard(writer)
+                continue
+            writer.write(payload)
+            if writer.transport.get_write_buffer_size() > self._high_water_mark:
+                # Slow readers must not hold up the model or other clients.
+                _LOGGER.debug("Disconnecting SBS-1 client falling behind")
+                self._clients.discard(writer)
+                writer.transport.abort()
+
+    def _render(self) -> List[str]:
+        """Serialise the current snapshot, return the SBS-1 messages."""
+        snapshot = self._model.snapshot()
+        self._dump1090 = json.dumps(dump1090_json(snapshot, self._model.now)).encode()
+        self._fr24 = json.dumps(fr24_json(snapshot)).encode()
+        return sbs1_messages(snapshot)
+
+    async def _run(self) -> None:
+        """Advance the model at the configured interval."""
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            next_tick += self._interval
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            await self.tick()
+
+    async def _handle_dump1090(self, request: web.Request) -> web.Response:
+        """Serve the Dump1090 aircraft JSON feed."""
+        return web.Response(body=self._dump1090, content_type="application/json")
+
+    async def _handle_fr24(self, request: web.Request) -> web.Response:
+        """Serve the Flightradar flights JSON feed."""
+        return web.Response(body=self._fr24, content_type="application/json")
+
+    async def _handle_sbs1(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Register an SBS-1 client, messages are sent on each tick."""
+        self._clients.add(writer)
+
+
+async def _serve(simulator: ReceiverSimulator) -> None:
+    """Run the simulator until cancelled."""
+    await simulator.start()
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await simulator.stop()
+
+
+def main(argv: List[str] = None) -> int:
+    """Run the simulator from the command line."""
+    parser = argparse.ArgumentParser(
+        prog="flightradar-simulator",
+        description="Serve synthetic traffic like a local receiver.",
+    )
+    parser.add_argument(
+        "-n",
+        "--aircrafts",
+        type=int,
+        default=DEFAULT_AIRCRAFT_COUNT,
+        help="number of simulated aircrafts",
+    )
+    parser.add_argument(
+        "--home",
+        nargs=2,
+        type=float,
+        metavar=("LATITUDE", "LONGITUDE"),
+        default=DEFAULT_HOME_COORDINATES,
+        help="centre of the simulated traffic",
+    )
+    parser.add_argument(
+        "--radius", type=float, default=DEFAULT_RADIUS, help="traffic radius (km)"
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on")
+    parser.add_argument(
+        "--http-port", type=int, default=DEFAULT_HTTP_PORT, help="JSON feeds port"
+    )
+    parser.add_argument(
+        "--sbs1-port", type=int, default=DEFAULT_SBS1_PORT, help="SBS-1 stream port"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help="seconds between updates of the traffic",
+    )
+    parser.add_argument(
+        "--missing-fields",
+        type=float,
+        default=DEFAULT_MISSING_FIELDS,
+        help="probability of a field to be missing",
+    )
+    parser.add_argument(
+        "--invalid-coordinates",
+        type=float,
+        default=DEFAULT_INVALID_COORDINATES,
+        help="probability of (0, 0) coordinates",
+    )
+    parser.add_argument(
+        "--on-ground",
+        type=float,
+        default=DEFAULT_ON_GROUND,
+        help="share of aircrafts on the ground",
+    )
+    parser.add_argument(
+        "--dropouts",
+        type=float,
+        default=DEFAULT_DROPOUTS,
+        help="probability of an aircraft not being received",
+    )
+    parser.add_argument("--seed", type=int, help="seed for reproducible traffic")
+    args = parser.parse_args(argv)
+    model = TrafficModel(
+        args.aircrafts,
+        tuple(args.home),
+        args.radius,
+        args.missing_fields,
+        args.invalid_coordinates,
+        args.on_ground,
+        args.dropouts,
+        args.seed,
+    )
+    simulator = ReceiverSimulator(
+        model, args.host, args.http_port, args.sbs1_port, args.interval
+    )
+    try:
+        asyncio.run(_serve(simulator))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,221 @@
+"""
+Position smoothing.
+
+Smooths the jittering positions received with an alpha-beta filter per
+aircraft, and estimates ground speed and heading from them. The state of
+all filters is kept in parallel arrays, one slot per aircraft, which are
+updated in a single pass per update.
+"""
+import array
+import logging
+import math
+import time
+from typing import Collection, Dict, Optional
+
+from .consts import (
+    ATTR_LATITUDE,
+    ATTR_LONGITUDE,
+    ATTR_SPEED,
+    ATTR_TRACK,
+    INVALID_COORDINATES,
+    NONE_COORDINATES,
+)
+from .feed_entry import FeedEntry
+from .proximity import KM_PER_DEGREE, KNOTS_TO_KM_PER_SECOND
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_ALPHA = 0.5
+DEFAULT_BETA = 0.2
+DEFAULT_RESET_DISTANCE = 20.0
+
+
+class SmoothedPosition:
+    """Smoothed position, ground speed in knots and heading of an aircraft."""
+
+    __slots__ = ("latitude", "longitude", "speed", "track")
+
+    def __init__(
+        self, latitude: float, longitude: float, speed: float, track: float
+    ) -> None:
+        """Initialise smoothed position."""
+        self.latitude = latitude
+        self.longitude = longitude
+        self.speed = speed
+        self.track = track
+
+    def __repr__(self) -> str:
+        """Return string representation of this position."""
+        return "<{}(latitude={}, longitude={}, speed={}, track={})>".format(
+            self.__class__.__name__,
+            self.latitude,
+            self.longitude,
+            self.speed,
+            self.track,
+        )
+
+
+class PositionSmoother:
+    """Alpha-beta filters for the positions of all aircrafts.
+
+    Positions filled in from the cache are not used as measurements; the
+    filter predicts the position instead, so that there is no jump when
+    the aircraft reports its position again. Measurements further than the
+    reset distance in km from the prediction restart the filter.
+    """
+
+    def __init__(
+        self,
+        alpha: float = DEFAULT_ALPHA,
+        beta: float = DEFAULT_BETA,
+        reset_distance: float = DEFAULT_RESET_DISTANCE,
+    ) -> None:
+        """Initialise position smoother."""
+        self._alpha = alpha
+        self._beta = beta
+        self._reset_distance = reset_distance
+        self._slots = {}
+        self._free = []
+        # Filter state by slot: position in degrees, velocity in km/s.
+        self._latitudes = array.array("d")
+        self._longitudes = array.array("d")
+        self._velocities_north = array.array("d")
+        self._velocities_east = array.array("d")
+        self._times = array.array("d")
+
+    def __repr__(self) -> str:
+        """Return string representation of this smoother."""
+        return "<{}(alpha={}, beta={}, aircrafts={})>".format(
+            self.__class__.__name__, self._alpha, self._beta, len(self._slots)
+        )
+
+    def __len__(self) -> int:
+        """Return the number of aircrafts smoothed."""
+        return len(self._slots)
+
+    def update(
+        self,
+        feed_entries: Optional[Dict[str, FeedEntry]],
+        filled: Collection[str] = (),
+        now: float = None,
+    ) -> None:
+        """Update the filters of all aircrafts with the entries received.
+
+        The external ids in filled are those with cached coordinates.
+        Filters of aircrafts no longer received are released.
+        """
+        now = time.monotonic() if now is None else now
+        feed_entries = feed_entries or {}
+        slots = self._slots
+        for external_id in [key for key in slots if key not in feed_entries]:
+            self._free.append(slots.pop(external_id))
+        latitudes = self._latitudes
+        longitudes = self._longitudes
+        velocities_north = self._velocities_north
+        velocities_east = self._velocities_east
+        times = self._times
+        alpha = self._alpha
+        beta = self._beta
+        for external_id, entry in feed_entries.items():
+            coordinates = entry.coordinates
+            measured = (
+                external_id not in filled
+                and coordinates is not None
+                and None not in coordinates
+                and coordinates != INVALID_COORDINATES
+                and coordinates != NONE_COORDINATES
+            )
+            slot = slots.get(external_id)
+            if slot is None:
+                if measured:
+                    self._start(external_id, entry, now)
+                continue
+            elapsed = max(now - times[slot], 0.0)
+            times[slot] = now
+            # Predict.
+            latitude = latitudes[slot]
+            scale = KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01)
+            latitude += velocities_north[slot] * elapsed / KM_PER_DEGREE
+            longitude = longitudes[slot] + velocities_east[slot] * elapsed / scale
+            if measured:
+                residual_north = (coordinates[0] - latitude) * KM_PER_DEGREE
+                residual_east = (coordinates[1] - longitude) * scale
+                if math.hypot(residual_north, residual_east) > self._reset_distance:
+                    self._free.append(slots.pop(external_id))
+                    self._start(external_id, entry, now)
+                    continue
+                # Correct.
+                latitude += alpha * residual_north / KM_PER_DEGREE
+                longitude += alpha * residual_east / scale
+                if elapsed > 0:
+                    velocities_north[slot] += beta * residual_north / elapsed
+                    velocities_east[slot] += beta * residual_east / elapsed
+            latitudes[slot] = latitude
+            longitudes[slot] = longitude
+
+    def _start(self, external_id: str, entry: FeedEntry, now: float) -> None:
+        """Start the filter of an aircraft at its reported position."""
+        velocity_north = velocity_east = 0.0
+        if entry.speed and entry.track is not None:
+            speed = entry.speed * KNOTS_TO_KM_PER_SECOND
+            velocity_north = speed * math.cos(math.radians(entry.track))
+            velocity_east = speed * math.sin(math.radians(entry.track))
+        latitude, longitude = entry.coordinates
+        if self._free:
+            slot = self._free.pop()
+            self._latitudes[slot] = latitude
+            self._longitudes[slot] = longitude
+            self._velocities_north[slot] = velocity_north
+            self._velocities_east[slot] = velocity_east
+            self._times[slot] = now
+        else:
+            slot = len(self._latitudes)
+            self._latitudes.append(latitude)
+            self._longitudes.append(longitude)
+            self._velocities_north.append(velocity_north)
+            self._velocities_east.append(velocity_east)
+            self._times.append(now)
+        self._slots[external_id] = slot
+
+    def estimate(self, external_id: str) -> Optional[SmoothedPosition]:
+        """Return the smoothed position of an aircraft."""
+        slot = self._slots.get(external_id)
+        if slot is None:
+            return None
+        velocity_north = self._velocities_north[slot]
+        velocity_east = self._velocities_east[slot]
+        return SmoothedPosition(
+            self._latitudes[slot],
+            self._longitudes[slot],
+            math.hypot(velocity_north, velocity_east) / KNOTS_TO_KM_PER_SECOND,
+            math.degrees(math.atan2(velocity_east, velocity_north)) % 360,
+        )
+
+    def apply(
+        self,
+        feed_entries: Optional[Dict[str, FeedEntry]],
+        filled: Collection[str] = (),
+        now: float = None,
+    ) -> None:
+        """Update the filters and set the estimates of the entries.
+
+        Speed and track estimates are only used where none were received,
+        as the ones reported by the aircraft are more accurate. The data
+        received is left unchanged, so that entries updated in place only
+        change with the data.
+        """
+        self.update(feed_entries, filled, now)
+        for external_id, entry in (feed_entries or {}).items():
+            estimate = self.estimate(external_id)
+            if estimate is None or not entry.data:
+                entry.estimates = None
+                continue
+            estimates = {
+                ATTR_LATITUDE: estimate.latitude,
+                ATTR_LONGITUDE: estimate.longitude,
+            }
+            if entry.data.get(ATTR_SPEED) is None:
+                estimates[ATTR_SPEED] = int(round(estimate.speed))
+            if entry.data.get(ATTR_TRACK) is None:
+                estimates[ATTR_TRACK] = int(round(estimate.track)) % 360
+            entry.estimates = estimates
@@ -17,6 +17,11 @@ class Statistics:
         """Return string representation of the statistics."""
         return "<Statistics[{}]>".format(self._entries)
 
+    @property
+    def entries(self) -> FixedSizeDict:
+        """Return the statistics data by key."""
+        return self._entries
+
     def get(self, key):
         """Get entry for provided key."""
         if key and key in self._entries:
@@ -55,6 +60,24 @@ class StatisticsData:
         """Return string representation of the statistics."""
         return "<StatisticsData({:.1%})>".format(self.success_ratio())
 
+    @classmethod
+    def restore(cls, retrievals: int, total: int) -> "StatisticsData":
+        """Create statistics entry with previously recorded counts."""
+        data = cls(False)
+        data._retrievals = retrievals
+        data._total = total
+        return data
+
+    @property
+    def retrievals(self) -> int:
+        """Return the number of successful updates."""
+        return self._retrievals
+
+    @property
+    def total(self) -> int:
+        """Return the total number of updates."""
+        return self._total
+
     def retrieval_successful(self) -> None:
         """Record a successful update."""
         self._retrievals = self._retrievals + 1
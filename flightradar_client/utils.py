@@ -2,6 +2,17 @@
 Library Utils.
 """
 from collections.__init__ import OrderedDict
+from typing import Dict, Optional
+
+from .consts import ATTR_MODE_S, ATTR_SQUAWK
+
+# Callsigns are interned once stripped, by the feed entries.
+INTERNED_ATTRIBUTES = (ATTR_MODE_S, ATTR_SQUAWK)
+
+DEFAULT_EXPECTED_AIRCRAFTS = 1000
+# Identifier, callsign and squawk code per aircraft.
+STRINGS_PER_AIRCRAFT = len(INTERNED_ATTRIBUTES) + 1
+DEFAULT_INTERN_TABLE_SIZE = DEFAULT_EXPECTED_AIRCRAFTS * STRINGS_PER_AIRCRAFT
 
 
 class FixedSizeDict(OrderedDict):
@@ -14,3 +25,53 @@ class FixedSizeDict(OrderedDict):
         if self._max > 0:
             if len(self) > self._max:
                 self.popitem(False)
+
+
+class InternTable:
+    """Bounded table of canonical string objects.
+
+    Equal strings passed through the table are replaced with the same
+    object, so that identifiers repeated in every update are only kept in
+    memory once. The least recently used strings are dropped once the
+    table is full.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_INTERN_TABLE_SIZE) -> None:
+        """Initialise intern table."""
+        self._values = FixedSizeDict(max=max_size)
+
+    def __repr__(self) -> str:
+        """Return string representation of this table."""
+        return "<{}(size={})>".format(self.__class__.__name__, len(self._values))
+
+    def __len__(self) -> int:
+        """Return the number of strings in the table."""
+        return len(self._values)
+
+    @classmethod
+    def for_aircrafts(cls, expected_aircrafts: int) -> "InternTable":
+        """Create a table sized for the number of aircrafts expected."""
+        return cls(max_size=expected_aircrafts * STRINGS_PER_AIRCRAFT)
+
+    def intern(self, value: Optional[str]) -> Optional[str]:
+        """Return the canonical object equal to the string."""
+        if value is None:
+            return None
+        canonical = self._values.get(value)
+        if canonical is None:
+            self._values[value] = value
+            return value
+        self._values.move_to_end(value)
+        return canonical
+
+
+INTERN_TABLE = InternTable()
+
+
+def intern_data(data: Dict, table: InternTable = INTERN_TABLE) -> Dict:
+    """Replace the identifiers in parsed aircraft data with canonical objects."""
+    for attribute in INTERNED_ATTRIBUTES:
+        value = data.get(attribute)
+        if isinstance(value, str):
+            data[attribute] = table.intern(value)
+    return data
@@ -0,0 +1,121 @@
+"""
+Recent snapshot window.
+
+Keeps track of the aircrafts seen in the snapshots of a recent time window.
+Instead of copies of the snapshots, only the latest entry and the times of
+the first and last sighting of each aircraft are kept.
+"""
+import collections
+import datetime
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .feed_entry import FeedEntry
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_DURATION = datetime.timedelta(minutes=10)
+
+
+class SnapshotWindow:
+    """Time-indexed window over the recent snapshots of a feed.
+
+    Aircrafts are kept ordered by the time they were last seen, so that
+    expired aircrafts are dropped from the front and the aircrafts seen
+    since a point in time are found from the back, without looking at any
+    others. An aircraft seen again after it expired starts a new sighting.
+    """
+
+    def __init__(self, duration: datetime.timedelta = DEFAULT_WINDOW_DURATION) -> None:
+        """Initialise snapshot window."""
+        self._duration = duration.total_seconds()
+        self._latest = None
+        # First and last sighting times by external id, oldest last first.
+        self._sightings = collections.OrderedDict()
+        self._states = {}
+
+    def __repr__(self) -> str:
+        """Return string representation of this window."""
+        return "<{}(duration={}, aircrafts={})>".format(
+            self.__class__.__name__, self.duration, len(self._sightings)
+        )
+
+    def __len__(self) -> int:
+        """Return the number of aircrafts in the window."""
+        return len(self._sightings)
+
+    def __contains__(self, external_id: str) -> bool:
+        """Check whether the aircraft was seen within the window."""
+        return external_id in self._sightings
+
+    @property
+    def duration(self) -> datetime.timedelta:
+        """Return the duration of the window."""
+        return datetime.timedelta(seconds=self._duration)
+
+    @duration.setter
+    def duration(self, value: datetime.timedelta) -> None:
+        """Change the duration of the window."""
+        self._duration = value.total_seconds()
+        if self._latest is not None:
+            self._expire(self._latest)
+
+    def add(
+        self, feed_entries: Optional[Dict[str, FeedEntry]], now: float = None
+    ) -> None:
+        """Record a snapshot of the aircrafts received."""
+        now = time.time() if now is None else now
+        if self._latest is not None and now < self._latest:
+            # Keep the sightings ordered if the clock goes backwards.
+            now = self._latest
+        self._latest = now
+        sightings = self._sightings
+        for external_id, entry in (feed_entries or {}).items():
+            current = sightings.get(external_id)
+            if current is None:
+                sightings[external_id] = (now, now)
+            else:
+                sightings[external_id] = (current[0], now)
+                sightings.move_to_end(external_id)
+            self._states[external_id] = entry
+        self._expire(now)
+
+    def _expire(self, now: float) -> None:
+        """Drop the aircrafts last seen before the window."""
+        start = now - self._duration
+        sightings = self._sightings
+        while sightings:
+            external_id, (_, last_seen) = next(iter(sightings.items()))
+            if last_seen >= start:
+                break
+            del sightings[external_id]
+            del self._states[external_id]
+
+    def seen_since(self, period: datetime.timedelta, now: float = None) -> List[str]:
+        """Return the aircrafts seen within the period, latest first."""
+        start = (time.time() if now is None else now) - period.total_seconds()
+        result = []
+        for external_id in reversed(self._sightings):
+            if self._sightings[external_id][1] < start:
+                break
+            result.append(external_id)
+        return result
+
+    def last_state(self, external_id: str) -> Optional[FeedEntry]:
+        """Return the latest entry of an aircraft seen within the window."""
+        return self._states.get(external_id)
+
+    def sightings(
+        self, external_id: str
+    ) -> Optional[Tuple[datetime.datetime, datetime.datetime]]:
+        """Return the times an aircraft was first and last seen."""
+        current = self._sightings.get(external_id)
+        if current is None:
+            return None
+        return _datetime(current[0]), _datetime(current[1])
+
+
+def _datetime(timestamp: float) -> datetime.datetime:
+    """Convert a timestamp into a datetime."""
+    return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc)
@@ -40,4 +40,10 @@ setup(
         "Operating System :: OS Independent",
     ],
     install_requires=REQUIRES,
+    entry_points={
+        "console_scripts": [
+            "flightradar-batch=flightradar_client.batch:main",
+            "flightradar-simulator=flightradar_client.simulator:main",
+        ]
+    },
 )
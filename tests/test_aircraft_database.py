@@ -0,0 +1,102 @@
+"""Test for the aircraft database."""
+import os
+
+import pytest
+
+from flightradar_client.aircraft_database import (
+    AircraftDatabase,
+    compile_database,
+)
+from flightradar_client.batch import RecordedFeedAggregator
+from flightradar_client.exceptions import FlightradarException
+from flightradar_client.feed_entry import FeedEntry
+
+
+@pytest.fixture
+def database_path(tmp_path):
+    """Compile the fixture database."""
+    path = str(tmp_path / "aircraft.db")
+    count = compile_database(
+        os.path.join(os.path.dirname(__file__), "fixtures", "aircraft-database.csv"),
+        path,
+    )
+    assert count == 5
+    return path
+
+
+def test_lookup(database_path):
+    """Test looking up aircrafts."""
+    with AircraftDatabase(database_path) as database:
+        assert len(database) == 5
+        assert repr(database) == "<AircraftDatabase(path={}, records=5)>".format(
+            database_path
+        )
+        info = database.lookup("7C1469")
+        assert info.registration == "VH-VXB"
+        assert info.aircraft_type == "B738"
+        assert info.operator == "Qantas"
+        assert repr(info) == "<AircraftInfo(registration=VH-VXB, type=B738)>"
+        assert database.lookup("7c6d9a").operator == "QantasLink"
+        assert database.lookup("7c52f9").operator == (
+            "A very long operator name that does not "
+        )
+        info = database.lookup("7c1c5d")
+        assert info.registration is None
+        assert info.operator is None
+        assert database.lookup("000001") is None
+        assert database.lookup("ffffff") is None
+        assert database.lookup("invalid") is None
+        assert database.lookup("1000000") is None
+        assert database.lookup(None) is None
+
+
+def test_invalid_database(tmp_path):
+    """Test opening invalid database files."""
+    path = tmp_path / "invalid.db"
+    path.write_bytes(b"")
+    with pytest.raises(FlightradarException):
+        AircraftDatabase(str(path))
+    path.write_bytes(b"FRA")
+    with pytest.raises(FlightradarException):
+        AircraftDatabase(str(path))
+    path.write_bytes(b"XXXX\x00\x01\x00\x00\x00\x00")
+    with pytest.raises(FlightradarException):
+        AircraftDatabase(str(path))
+
+
+@pytest.mark.asyncio
+async def test_feed_entry_details(database_path):
+    """Test looking up aircraft details of feed entries."""
+    with AircraftDatabase(database_path) as database:
+        aggregator = RecordedFeedAggregator((-31.0, 151.0))
+        aggregator.aircraft_database = database
+        assert aggregator.aircraft_database is database
+        _, entries = await aggregator.replay(
+            [
+                {
+                    "mode_s": "7c6b28",
+                    "latitude": -32.0,
+                    "longitude": 151.0,
+                    "altitude": 1000,
+                    "callsign": "JST423",
+                },
+                {
+                    "mode_s": "7c0000",
+                    "latitude": -32.0,
+                    "longitude": 151.0,
+                    "altitude": 1000,
+                    "callsign": None,
+                },
+            ]
+        )
+        entry = entries["7c6b28"]
+        assert entry.aircraft_database is database
+        assert entry.registration == "VH-VFN"
+        assert entry.aircraft_type == "A320"
+        assert entry.operator == "Jetstar Airways"
+        assert entries["7c0000"].registration is None
+
+    entry = FeedEntry(None, None)
+    assert entry.registration is None
+    assert entry.aircraft_type is None
+    assert entry.operator is None
@@ -0,0 +1,62 @@
+"""Test for the closest approach prediction."""
+import pytest
+
+from flightradar_client.approach import (
+    Approach,
+    closest_approach,
+    closest_approaches,
+    predict_approach,
+)
+from flightradar_client.feed_entry import FeedEntry
+from flightradar_client.proximity import KM_PER_DEGREE, KNOTS_TO_KM_PER_SECOND
+
+HOME_COORDINATES = (-33.86, 151.21)
+
+
+def _entry(mode_s, latitude, longitude, speed=300, track=0):
+    """Create a feed entry."""
+    return FeedEntry(
+        HOME_COORDINATES,
+        {
+            "mode_s": mode_s,
+            "latitude": latitude,
+            "longitude": longitude,
+            "speed": speed,
+            "track": track,
+        },
+    )
+
+
+def test_predict_approach():
+    """Test predicting the closest approach."""
+    # One degree south, flying north 0.1 degrees east of home.
+    approach = predict_approach(HOME_COORDINATES, (-34.86, 151.31), 300, 0)
+    assert approach.distance == pytest.approx(9.23, abs=0.01)
+    assert approach.seconds == pytest.approx(
+        KM_PER_DEGREE / (300 * KNOTS_TO_KM_PER_SECOND)
+    )
+    assert repr(approach) == "<Approach(distance=9.23, seconds=721)>"
+    # Moving away or standing still, closest now.
+    assert predict_approach(HOME_COORDINATES, (-34.86, 151.21), 300, 180) == Approach(
+        pytest.approx(KM_PER_DEGREE), 0.0
+    )
+    assert predict_approach(HOME_COORDINATES, (-34.86, 151.21), 0, 0).seconds == 0
+    # Not available without position or velocity.
+    assert predict_approach(HOME_COORDINATES, (0, 0), 300, 0) is None
+    assert predict_approach(HOME_COORDINATES, (None, None), 300, 0) is None
+    assert predict_approach(HOME_COORDINATES, (-34.86, 151.21), None, 0) is None
+    assert predict_approach(None, (-34.86, 151.21), 300, 0) is None
+
+
+def test_closest_approaches():
+    """Test predicting the closest approaches of all entries at once."""
+    feed_entries = {
+        "a": _entry("a", -34.86, 151.31),
+        "b": _entry("b", -33.0, 152.0, track=270),
+        "c": _entry("c", -33.0, 152.0, speed=None),
+    }
+    approaches = closest_approaches(feed_entries)
+    assert sorted(approaches) == ["a", "b"]
+    for external_id, approach in approaches.items():
+        assert approach == closest_approach(feed_entries[external_id])
+    assert closest_approaches(None) == {}
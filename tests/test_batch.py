@@ -0,0 +1,194 @@
+"""Test for the offline batch processor."""
+import csv
+import os
+
+import pytest
+
+from flightradar_client.batch import (
+    TRACK_COLUMNS,
+    RecordedFeedAggregator,
+    TrackWriter,
+    main,
+    process_file,
+    process_files,
+    read_snapshots,
+)
+from flightradar_client.consts import UPDATE_OK
+from flightradar_client.exceptions import FlightradarException
+from flightradar_client.feed_entry import FeedEntry
+from tests.utils import load_fixture
+
+
+def _fixture_path(filename):
+    """Return the path of a fixture."""
+    return os.path.join(os.path.dirname(__file__), "fixtures", filename)
+
+
+def _read_track(path):
+    """Read all rows of a track file."""
+    with open(path, newline="", encoding="utf-8") as fptr:
+        return list(csv.reader(fptr))
+
+
+@pytest.fixture
+def json_lines_file(tmp_path):
+    """Write the dump1090 fixtures as JSON lines file."""
+    path = tmp_path / "recording.jsonl"
+    path.write_text(
+        "\n".join(
+            load_fixture(filename).replace("\n", "")
+            for filename in ("dump1090-aircrafts-1.json", "dump1090-aircrafts-2.json")
+        )
+        + "\n",
+        encoding="utf-8",
+    )
+    return str(path)
+
+
+@pytest.mark.asyncio
+async def test_recorded_feed_aggregator():
+    """Test replaying snapshots through the feed aggregator."""
+    aggregator = RecordedFeedAggregator((-31.0, 151.0))
+    assert (
+        repr(aggregator) == "<RecordedFeedAggregator("
+        "feed=<RecordedFeed(home=(-31.0, 151.0))>)>"
+    )
+    snapshots = list(
+        read_snapshots(_fixture_path("fr24feed-flights-1.json"), "fr24feed")
+    )
+    assert len(snapshots) == 1
+    status, entries = await aggregator.replay(snapshots[0])
+    assert status == UPDATE_OK
+    assert len(entries) == 5
+    assert entries["7C6B28"].statistics.success_ratio() == 1.0
+
+    status, entries = await aggregator.replay([])
+    assert status == UPDATE_OK
+    assert entries is None
+
+
+def test_read_snapshots_json_lines(json_lines_file):
+    """Test reading one snapshot per line."""
+    snapshots = list(read_snapshots(json_lines_file, "dump1090"))
+    assert len(snapshots) == 2
+    assert len(snapshots[0]) == 11
+
+
+def test_process_file(tmp_path, json_lines_file):
+    """Test writing tracks from a recording."""
+    output = str(tmp_path / "output")
+    summary = process_file(json_lines_file, "dump1090", output, (-31.0, 151.0))
+    assert summary == {
+        "path": json_lines_file,
+        "snapshots": 2,
+        "points": 9,
+        "aircrafts": 5,
+    }
+    rows = _read_track(os.path.join(output, "recording", "7c6b28.csv"))
+    assert rows[0] == TRACK_COLUMNS
+    assert len(rows) == 3
+    # Coordinates missing in the second snapshot are filled in.
+    assert rows[1][1:4] == ["-32.81984", "151.124735", "26000"]
+    assert rows[2][1:4] == ["-32.81984", "151.124735", "26000"]
+    assert rows[1][8] == "JST423"
+
+
+def test_process_file_again(tmp_path, json_lines_file):
+    """Test replacing the tracks of a previous run."""
+    output = str(tmp_path / "output")
+    process_file(json_lines_file, "dump1090", output, (-31.0, 151.0))
+    path = os.path.join(output, "recording", "7c6b28.csv")
+    rows = _read_track(path)
+    process_file(json_lines_file, "dump1090", output, (-31.0, 151.0))
+    assert _read_track(path) == rows
+
+
+def test_process_file_filter_radius(tmp_path):
+    """Test filtering tracks by distance."""
+    summary = process_file(
+        _fixture_path("dump1090-aircrafts-1.json"),
+        "dump1090",
+        str(tmp_path),
+        (-31.0, 151.0),
+        filter_radius=300,
+    )
+    assert summary["points"] == 1
+    assert os.listdir(str(tmp_path / "dump1090-aircrafts-1")) == ["7c6b28.csv"]
+
+
+def test_process_file_sbs1(tmp_path):
+    """Test writing tracks from SBS-1 messages."""
+    summary = process_file(
+        _fixture_path("sbs1-messages.txt"), "sbs1", str(tmp_path), interval=1.0
+    )
+    assert summary["snapshots"] == 3
+    assert summary["aircrafts"] == 2
+    rows = _read_track(str(tmp_path / "sbs1-messages" / "7C6DBB.csv"))
+    assert len(rows) == 4
+    assert rows[3][0] == "2018-10-26T19:17:41.308000+00:00"
+
+
+def test_track_writer_max_open_files(tmp_path):
+    """Test that files closed in between are appended to."""
+    writer = TrackWriter(str(tmp_path), max_open_files=1)
+    assert repr(writer) == "<TrackWriter(directory={})>".format(tmp_path)
+    snapshots = list(
+        read_snapshots(_fixture_path("fr24feed-flights-1.json"), "fr24feed")
+    ) + list(read_snapshots(_fixture_path("fr24feed-flights-2.json"), "fr24feed"))
+    for snapshot in snapshots:
+        for data in snapshot:
+            writer.write(FeedEntry((-31.0, 151.0), data))
+    writer.close()
+    rows = _read_track(str(tmp_path / "7C1469.csv"))
+    assert rows[0] == TRACK_COLUMNS
+    assert len(rows) == 3
+
+
+def test_process_files_in_parallel(tmp_path):
+    """Test processing several files with a process pool."""
+    paths = [
+        _fixture_path("fr24feed-flights-1.json"),
+        _fixture_path("fr24feed-flights-2.json"),
+    ]
+    summaries = process_files(paths, "fr24feed", str(tmp_path), workers=2)
+    assert [summary["path"] for summary in summaries] == paths
+    assert [summary["points"] for summary in summaries] == [5, 4]
+
+
+def test_main(tmp_path, capsys):
+    """Test the command line interface."""
+    inputs = tmp_path / "inputs"
+    inputs.mkdir()
+    (inputs / "flights.json").write_text(
+        load_fixture("fr24feed-flights-1.json"), encoding="utf-8"
+    )
+    output = tmp_path / "output"
+    assert main(["-f", "fr24feed", "-o", str(output), "-j", "1", str(inputs)]) == 0
+    assert "1 snapshots, 5 points, 5 aircrafts" in capsys.readouterr().out
+    assert len(os.listdir(str(output / "flights"))) == 5
+
+    with pytest.raises(SystemExit):
+        main(["-f", "fr24feed", "-o", str(output), "--radius", "10", str(inputs)])
+
+
+def test_process_files_same_name(tmp_path):
+    """Test keeping the tracks of files with the same name apart."""
+    paths = []
+    for directory, fixture in (
+        ("first", "fr24feed-flights-1.json"),
+        ("second", "fr24feed-flights-2.json"),
+    ):
+        (tmp_path / "inputs" / directory).mkdir(parents=True)
+        path = tmp_path / "inputs" / directory / "flights.json"
+        path.write_text(load_fixture(fixture), encoding="utf-8")
+        paths.append(str(path))
+    output = tmp_path / "output"
+    process_files(paths, "fr24feed", str(output), workers=1)
+    assert len(os.listdir(str(output / "first" / "flights"))) == 5
+    assert len(os.listdir(str(output / "second" / "flights"))) == 4
+
+    # Files that only differ by extension would be mixed up.
+    other_path = tmp_path / "inputs" / "first" / "flights.jsonl"
+    other_path.write_text("", encoding="utf-8")
+    with pytest.raises(FlightradarException):
+        process_files(paths + [str(other_path)], "fr24feed", str(output))
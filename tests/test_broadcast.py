@@ -0,0 +1,123 @@
+"""Test for the broadcast server."""
+import json
+
+import aiohttp
+import pytest
+
+from flightradar_client.broadcast import (
+    BroadcastServer,
+    compute_delta,
+    entry_fields,
+)
+from flightradar_client.feed_entry import FeedEntry
+
+
+def _entries(*aircrafts):
+    """Create feed entries from (mode_s, latitude, altitude) tuples."""
+    return {
+        mode_s: FeedEntry(
+            (-31.0, 151.0),
+            {
+                "mode_s": mode_s,
+                "latitude": latitude,
+                "longitude": 151.0,
+                "altitude": altitude,
+                "callsign": "QFA1 ",
+                "speed": 300,
+                "track": 90,
+                "squawk": "1234",
+                "vert_rate": 0,
+                "updated": 1540539351,
+            },
+        )
+        for mode_s, latitude, altitude in aircrafts
+    }
+
+
+def test_entry_fields():
+    """Test the fields sent to clients."""
+    fields = entry_fields(_entries(("a", -33.0, "ground"))["a"])
+    assert fields == {
+        "latitude": -33.0,
+        "longitude": 151.0,
+        "altitude": 0,
+        "callsign": "QFA1",
+        "speed": 300,
+        "track": 90,
+        "squawk": "1234",
+        "vert_rate": 0,
+        "updated": 1540539351.0,
+    }
+    assert entry_fields(FeedEntry(None, None))["latitude"] is None
+
+
+def test_compute_delta():
+    """Test computing the differences between updates."""
+    previous = {"a": {"x": 1, "y": 2}, "b": {"x": 1}, "c": {"x": 1}}
+    current = {"a": {"x": 1, "y": 3}, "b": {"x": 1}, "d": {"x": 2}}
+    assert compute_delta(previous, current) == {
+        "added": {"d": {"x": 2}},
+        "changed": {"a": {"y": 3}},
+        "removed": ["c"],
+    }
+    assert compute_delta(current, current) == {}
+
+
+@pytest.mark.asyncio
+async def test_websocket(event_loop):
+    """Test pushing keyframe and deltas over WebSocket."""
+    server = BroadcastServer(port=0)
+    await server.update(_entries(("a", -33.0, 1000), ("b", -34.0, 2000)))
+    await server.start()
+    try:
+        url = "http://127.0.0.1:{}/ws".format(server.port)
+        async with aiohttp.ClientSession(loop=event_loop) as websession:
+            async with websession.ws_connect(url) as websocket:
+                keyframe = json.loads(await websocket.receive_str())
+                assert keyframe["sequence"] == 1
+                assert sorted(keyframe["aircraft"]) == ["a", "b"]
+                assert server.subscribers == 1
+                assert repr(server).endswith("subscribers=1)>")
+
+                await server.update(_entries(("a", -33.0, 1500), ("c", -35.0, 0)))
+                # Unchanged updates are not sent.
+                await server.update(_entries(("a", -33.0, 1500), ("c", -35.0, 0)))
+                await server.update(_entries(("c", -35.0, 0)))
+                delta = json.loads(await websocket.receive_str())
+                assert delta["sequence"] == 2
+                assert delta["changed"] == {"a": {"altitude": 1500}}
+                assert delta["removed"] == ["b"]
+                assert sorted(delta["added"]) == ["c"]
+                delta = json.loads(await websocket.receive_str())
+                assert delta == {"sequence": 3, "removed": ["a"]}
+    finally:
+        await server.stop()
+    assert server.sequence == 3
+    assert server.port is None
+
+
+@pytest.mark.asyncio
+async def test_event_stream(event_loop):
+    """Test pushing server-sent events and resynchronising slow clients."""
+    server = BroadcastServer(port=0, queue_size=1)
+    await server.start()
+    try:
+        url = "http://127.0.0.1:{}/events".format(server.port)
+        async with aiohttp.ClientSession(loop=event_loop) as websession:
+            async with websession.get(url) as response:
+                assert response.headers["Content-Type"] == "text/event-stream"
+                assert await response.content.readline() == b"event: keyframe\n"
+                assert await response.content.readline() == (
+                    b'data: {"sequence":0,"aircraft":{}}\n'
+                )
+                assert await response.content.readline() == b"\n"
+
+                await server.update(_entries(("a", -33.0, 1000)))
+                # Falls behind and receives a new keyframe instead.
+                await server.update(_entries(("a", -33.1, 1000)))
+                assert await response.content.readline() == b"event: keyframe\n"
+                keyframe = json.loads((await response.content.readline())[6:])
+                assert keyframe["sequence"] == 2
+                assert keyframe["aircraft"]["a"]["latitude"] == -33.1
+    finally:
+        await server.stop()
@@ -0,0 +1,94 @@
+"""Test for the aircraft classification."""
+import json
+
+import pytest
+
+from flightradar_client.batch import RecordedFeedAggregator
+from flightradar_client.classification import (
+    AddressBlockTable,
+    PrefixTrie,
+    airline_filter,
+    airline_for_callsign,
+    country_filter,
+    country_for_address,
+)
+from flightradar_client.exceptions import FlightradarException
+from flightradar_client.feed_entry import FeedEntry
+from flightradar_client.fr24feed_flights import parse_flights
+from tests.utils import load_fixture
+
+
+def test_address_block_table():
+    """Test looking up address blocks."""
+    table = AddressBlockTable([(0x200, 0x2FF, "B"), (0x100, 0x1FF, "A")])
+    assert repr(table) == "<AddressBlockTable(blocks=2)>"
+    assert table.lookup("100") == "A"
+    assert table.lookup("1ff") == "A"
+    assert table.lookup("250") == "B"
+    assert table.lookup("0ff") is None
+    assert table.lookup("300") is None
+    assert table.lookup("xyz") is None
+    assert table.lookup(None) is None
+    with pytest.raises(FlightradarException):
+        AddressBlockTable([(0x100, 0x1FF, "A"), (0x1FF, 0x2FF, "B")])
+
+
+def test_country_for_address():
+    """Test looking up countries of ICAO addresses."""
+    assert country_for_address("7C1469") == "AU"
+    assert country_for_address("a1b2c3") == "US"
+    assert country_for_address("406A3B") == "GB"
+    assert country_for_address("000001") is None
+
+
+def test_prefix_trie():
+    """Test the longest prefix match."""
+    trie = PrefixTrie({"AB": "first", "ABC": "second"})
+    trie.insert("AB", "replaced")
+    assert len(trie) == 2
+    assert repr(trie) == "<PrefixTrie(size=2)>"
+    assert trie.longest_prefix("ABCD") == ("ABC", "second")
+    assert trie.longest_prefix("ABD") == ("AB", "replaced")
+    assert trie.longest_prefix("A") is None
+    assert trie.longest_prefix("") is None
+
+
+def test_airline_for_callsign():
+    """Test looking up airlines of callsigns."""
+    assert airline_for_callsign("QFA456") == ("QFA", "Qantas")
+    assert airline_for_callsign("qlk231d ") == ("QLK", "QantasLink")
+    # Registration used as callsign.
+    assert airline_for_callsign("QFAXYZ") is None
+    assert airline_for_callsign("QFA") is None
+    assert airline_for_callsign("XYZ123") is None
+    assert airline_for_callsign("") is None
+    assert airline_for_callsign(None) is None
+
+
+def test_feed_entry_classification():
+    """Test classification properties of feed entries."""
+    entry = FeedEntry(
+        None, {"mode_s": "7C6B28", "callsign": "JST423 ", "latitude": None}
+    )
+    assert entry.country == "AU"
+    assert entry.airline_designator == "JST"
+    assert entry.airline == "Jetstar Airways"
+    entry.override("callsign", "VOZ1192")
+    assert entry.airline_designator == "VOZ"
+    entry.override("mode_s", "A00001")
+    assert entry.country == "US"
+
+    entry = FeedEntry(None, None)
+    assert entry.country is None
+    assert entry.airline is None
+
+
+@pytest.mark.asyncio
+async def test_filter_predicates():
+    """Test filtering aggregated entries by country and airline."""
+    snapshot = parse_flights(json.loads(load_fixture("fr24feed-flights-1.json")))
+    aggregator = RecordedFeedAggregator((-31.0, 151.0))
+    aggregator.add_filter(country_filter(["AU"]))
+    aggregator.add_filter(airline_filter(["QFA", "JST"]))
+    _, entries = await aggregator.replay(snapshot)
+    assert sorted(entries) == ["7C1469", "7C6B28"]
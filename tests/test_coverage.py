@@ -0,0 +1,119 @@
+"""Test for the coverage statistics."""
+import datetime
+
+import pytest
+from haversine import haversine
+
+from flightradar_client.coverage import CoverageAccumulator
+from flightradar_client.exceptions import FlightradarException
+from flightradar_client.feed_entry import FeedEntry
+
+HOME_COORDINATES = (-33.86, 151.21)
+
+
+def _entry(mode_s, latitude, longitude, altitude=20000):
+    """Create a feed entry."""
+    return FeedEntry(
+        HOME_COORDINATES,
+        {
+            "mode_s": mode_s,
+            "latitude": latitude,
+            "longitude": longitude,
+            "altitude": altitude,
+        },
+    )
+
+
+@pytest.mark.asyncio
+async def test_coverage():
+    """Test accumulating range per sector and altitude band."""
+    coverage = CoverageAccumulator(
+        HOME_COORDINATES, sectors=4, altitude_bands=(10000,), max_range=200.0
+    )
+    assert repr(coverage) == (
+        "<CoverageAccumulator(home=(-33.86, 151.21), sectors=4, bands=2)>"
+    )
+    north = _entry("a", -33.36, 151.21)
+    east = _entry("b", -33.86, 151.81, "ground")
+    await coverage.update(
+        {
+            "a": north,
+            "b": east,
+            "c": _entry("c", 0.0, 0.0),
+            "d": _entry("d", None, None),
+        },
+        now=120.0,
+    )
+    await coverage.update({"e": _entry("e", -33.56, 151.21)}, now=130.0)
+    await coverage.update(None, now=190.0)
+
+    snapshot = coverage.snapshot()
+    assert repr(snapshot) == "<CoverageSnapshot(sectors=4, bands=2, positions=3)>"
+    assert snapshot.sector_size == 90.0
+    assert snapshot.altitude_bands == (10000,)
+    max_ranges = snapshot.max_ranges
+    assert max_ranges[1][0] == pytest.approx(north.distance_to_home, abs=1e-6)
+    assert max_ranges[0][1] == pytest.approx(
+        haversine(HOME_COORDINATES, east.coordinates), abs=1e-6
+    )
+    assert max_ranges[0][0] == 0.0
+    assert snapshot.counts == [[0, 1, 0, 0], [2, 0, 0, 0]]
+    # Half of the positions north within the first 40 km.
+    assert snapshot.percentile(50)[1][0] == 34.0
+    assert snapshot.percentile(100)[1][0] == pytest.approx(max_ranges[1][0])
+    assert snapshot.percentile(50)[0][0] is None
+    assert snapshot.rates == [
+        (datetime.datetime(1970, 1, 1, 0, 2, tzinfo=datetime.timezone.utc), 3 / 60),
+        (datetime.datetime(1970, 1, 1, 0, 3, tzinfo=datetime.timezone.utc), 0.0),
+    ]
+
+    # Snapshots are copies.
+    coverage.add([_entry("f", -33.0, 151.21)], now=200.0)
+    assert snapshot.counts[1][0] == 2
+    coverage.reset()
+    assert coverage.snapshot().counts == [[0] * 4, [0] * 4]
+    assert coverage.snapshot().rates == []
+
+
+def test_coverage_rate_slots():
+    """Test that old periods are overwritten."""
+    coverage = CoverageAccumulator(
+        HOME_COORDINATES,
+        rate_resolution=datetime.timedelta(seconds=10),
+        rate_slots=3,
+    )
+    for timestamp in range(0, 100, 5):
+        coverage.add([_entry("a", -33.5, 151.0)], now=timestamp)
+    rates = coverage.snapshot().rates
+    assert [rate[0].timestamp() for rate in rates] == [70, 80, 90]
+    assert [rate[1] for rate in rates] == [0.2, 0.2, 0.2]
+
+
+def test_coverage_persistence(tmp_path):
+    """Test saving and loading the statistics."""
+    coverage = CoverageAccumulator(HOME_COORDINATES, sectors=8, range_bins=10)
+    coverage.add(
+        [_entry("a", -33.5, 151.0), _entry("b", -34.5, 152.0, 35000)], now=1000.0
+    )
+    path = str(tmp_path / "coverage.bin")
+    coverage.save(path)
+    # Size is independent of the number of positions.
+    assert len(coverage.to_bytes()) == len(
+        CoverageAccumulator(HOME_COORDINATES, sectors=8, range_bins=10).to_bytes()
+    )
+    restored = CoverageAccumulator.load(path, HOME_COORDINATES)
+    assert restored.snapshot().counts == coverage.snapshot().counts
+    assert restored.snapshot().rates == coverage.snapshot().rates
+    for band, expected in zip(
+        restored.snapshot().max_ranges, coverage.snapshot().max_ranges
+    ):
+        assert band == pytest.approx(expected, rel=1e-6)
+    restored.add([_entry("c", -33.5, 151.0)], now=1010.0)
+    assert restored.snapshot().rates[0][1] == 3 / 60
+
+    with pytest.raises(FlightradarException):
+        CoverageAccumulator.from_bytes(b"FRCV", HOME_COORDINATES)
+    with pytest.raises(FlightradarException):
+        CoverageAccumulator.from_bytes(coverage.to_bytes()[:-1], HOME_COORDINATES)
+    with pytest.raises(FlightradarException):
+        CoverageAccumulator(HOME_COORDINATES, sectors=0)
@@ -1,5 +1,6 @@
 """Test for the Dump1090 Aircrafts feed."""
 import asyncio
+import concurrent.futures
 import datetime
 
 import aiohttp
@@ -62,6 +63,60 @@ async def test_update_ok(aresponses, event_loop):
         assert repr(feed_entry) == "<FeedEntry(id=7c6d9a)>"
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "executor_class",
+    [concurrent.futures.ThreadPoolExecutor, concurrent.futures.ProcessPoolExecutor],
+)
+async def test_update_ok_executor(aresponses, event_loop, executor_class):
+    """Test parsing in an executor gives the same result as inline."""
+    home_coordinates = (-31.0, 151.0)
+    for _ in range(2):
+        aresponses.add(
+            "localhost:8888",
+            "/data/aircraft.json",
+            "get",
+            aresponses.Response(
+                text=load_fixture("dump1090-aircrafts-1.json"),
+                content_type="application/json",
+                status=200,
+            ),
+            match_querystring=True,
+        )
+
+    with executor_class(max_workers=1) as executor:
+        async with aiohttp.ClientSession(loop=event_loop) as websession:
+            feed = Dump1090AircraftsFeed(home_coordinates, websession)
+            _, expected_entries = await feed.update()
+            feed = Dump1090AircraftsFeed(
+                home_coordinates, websession, executor=executor
+            )
+            status, entries = await feed.update()
+            assert status == UPDATE_OK
+            assert sorted(entries) == sorted(expected_entries)
+            for external_id, entry in entries.items():
+                assert entry.data == expected_entries[external_id].data
+
+
+@pytest.mark.asyncio
+async def test_update_executor_content_type(aresponses, event_loop):
+    """Test rejecting non-JSON responses when parsing in an executor."""
+    aresponses.add(
+        "localhost:8888",
+        "/data/aircraft.json",
+        "get",
+        aresponses.Response(text="<html></html>", content_type="text/html"),
+        match_querystring=True,
+    )
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        async with aiohttp.ClientSession(loop=event_loop) as websession:
+            feed = Dump1090AircraftsFeed((-31.0, 151.0), websession, executor=executor)
+            status, entries = await feed.update()
+            assert status == UPDATE_ERROR
+            assert entries is None
+
+
 @pytest.mark.asyncio
 async def test_update_ok_filter_radius(aresponses, event_loop):
     """Test updating feed is ok with filter radius."""
@@ -0,0 +1,135 @@
+"""Test for the binary snapshot encoding."""
+import json
+
+import pytest
+
+from flightradar_client.dump1090_aircrafts import parse_aircrafts
+from flightradar_client.encoding import (
+    KIND_DELTA,
+    KIND_KEYFRAME,
+    SnapshotEncoder,
+    decode,
+    decode_message,
+    encode_delta,
+    encode_snapshot,
+)
+from flightradar_client.exceptions import FlightradarException
+from flightradar_client.feed_entry import FeedEntry
+from flightradar_client.fr24feed_flights import parse_flights
+from tests.utils import load_fixture
+
+HOME_COORDINATES = (-31.0, 151.0)
+
+
+def _feed_entries(snapshot):
+    """Create feed entries from parsed data."""
+    return {data["mode_s"]: FeedEntry(HOME_COORDINATES, data) for data in snapshot}
+
+
+@pytest.mark.parametrize(
+    "fixture, parser",
+    [
+        ("dump1090-aircrafts-1.json", parse_aircrafts),
+        ("dump1090-aircrafts-2.json", parse_aircrafts),
+        ("fr24feed-flights-1.json", parse_flights),
+        ("fr24feed-flights-2.json", parse_flights),
+    ],
+)
+def test_round_trip(fixture, parser):
+    """Test encoding and decoding snapshots without losing data."""
+    snapshot = parser(json.loads(load_fixture(fixture)))
+    feed_entries = _feed_entries(snapshot)
+    message = encode_snapshot(feed_entries)
+    assert len(message) < len(json.dumps(snapshot)) / 2
+    decoded = decode(message, home_coordinates=HOME_COORDINATES)
+    assert sorted(decoded) == sorted(feed_entries)
+    for external_id, entry in feed_entries.items():
+        assert decoded[external_id].data == entry.data
+        assert decoded[external_id].altitude == entry.altitude
+        assert decoded[external_id].updated == entry.updated
+        assert decoded[external_id].home_coordinates == HOME_COORDINATES
+
+
+def test_special_values():
+    """Test encoding values which are not stored as numbers."""
+    data = {
+        "mode_s": "~1a2b3c",
+        "latitude": -33.123456,
+        "longitude": 151.5,
+        "track": 61.3,
+        "altitude": "ground",
+        "speed": 0,
+        "squawk": "",
+        "updated": 1540539351.4,
+        "vert_rate": -64,
+        "callsign": "QLK231D ",
+    }
+    decoded = decode(encode_snapshot({"x": FeedEntry(None, data)}))
+    assert decoded["~1a2b3c"].data == data
+    assert decoded["~1a2b3c"].altitude == 0
+    kind, aircrafts, removed = decode_message(encode_snapshot({}))
+    assert (kind, aircrafts, removed) == (KIND_KEYFRAME, [], [])
+    with pytest.raises(FlightradarException):
+        encode_snapshot({"x": FeedEntry(None, dict(data, speed=-1))})
+
+
+def test_delta():
+    """Test encoding only the changes to the previous snapshot."""
+    previous = _feed_entries(
+        parse_flights(json.loads(load_fixture("fr24feed-flights-1.json")))
+    )
+    current = _feed_entries(
+        parse_flights(json.loads(load_fixture("fr24feed-flights-2.json")))
+    )
+    message = encode_delta(previous, current)
+    kind, aircrafts, removed = decode_message(message)
+    assert kind == KIND_DELTA
+    assert len(aircrafts) + len(removed) < len(previous) + len(current)
+    decoded = decode(message, previous, HOME_COORDINATES)
+    assert {key: entry.data for key, entry in decoded.items()} == {
+        key: entry.data for key, entry in current.items()
+    }
+    # Unchanged entries are carried over.
+    for external_id, entry in decoded.items():
+        if external_id in previous and previous[external_id].data == entry.data:
+            assert entry is previous[external_id]
+    with pytest.raises(FlightradarException):
+        decode(message)
+
+
+def test_invalid_messages():
+    """Test decoding invalid messages."""
+    message = encode_snapshot(
+        _feed_entries(
+            parse_flights(json.loads(load_fixture("fr24feed-flights-1.json")))
+        )
+    )
+    for invalid in (b"", b"FRSN", b"XXXX" + message[4:], message[:-1]):
+        with pytest.raises(FlightradarException):
+            decode(invalid)
+
+
+def test_snapshot_encoder():
+    """Test encoding consecutive snapshots."""
+    encoder = SnapshotEncoder(keyframe_interval=2)
+    assert repr(encoder) == "<SnapshotEncoder(keyframe_interval=2)>"
+    snapshots = [
+        _feed_entries(
+            parse_flights(
+                json.loads(load_fixture("fr24feed-flights-{}.json".format(i)))
+            )
+        )
+        for i in (1, 2, 3, 1)
+    ]
+    kinds = []
+    decoded = None
+    for snapshot in snapshots:
+        message = encoder.encode(snapshot)
+        kinds.append(decode_message(message)[0])
+        decoded = decode(message, decoded)
+        assert {key: entry.data for key, entry in decoded.items()} == {
+            key: entry.data for key, entry in snapshot.items()
+        }
+    assert kinds == [KIND_KEYFRAME, KIND_DELTA, KIND_DELTA, KIND_KEYFRAME]
+    encoder.reset()
+    assert decode_message(encoder.encode(None))[0] == KIND_KEYFRAME
@@ -0,0 +1,276 @@
+"""Test for the filter pipeline."""
+import datetime
+import json
+import pickle
+
+import aiohttp
+import pytest
+from haversine import haversine
+
+from flightradar_client import feed_aggregator
+from flightradar_client.dump1090_aircrafts import (
+    Dump1090AircraftsFeedAggregator,
+    parse_aircrafts,
+)
+from flightradar_client.feed_entry import FeedEntry
+from flightradar_client.filters import (
+    AltitudeBand,
+    Approaching,
+    CallsignPattern,
+    FilterPipeline,
+    FilterStage,
+    Radius,
+    RawFields,
+    in_bounding_box,
+    radius_bounding_box,
+    within_radius,
+)
+from flightradar_client.fr24feed_flights import FLIGHT_FIELDS, parse_flights
+from tests.utils import load_fixture
+
+HOME_COORDINATES = (-33.5, 151.0)
+
+
+def test_bounding_box():
+    """Test bounding boxes around a radius."""
+    south, west, north, east = radius_bounding_box(HOME_COORDINATES, 111.0)
+    assert south == pytest.approx(-34.5)
+    assert north == pytest.approx(-32.5)
+    assert west < 149.8 and east > 152.2
+    assert in_bounding_box((-34.0, 150.0), south, west, north, east)
+    assert not in_bounding_box((-35.0, 151.0), south, west, north, east)
+    # Crossing the antimeridian.
+    box = radius_bounding_box((-40.0, 179.5), 100.0)
+    assert box[1] > box[3]
+    assert in_bounding_box((-40.0, -179.5), *box)
+    assert in_bounding_box((-40.0, 179.0), *box)
+    assert not in_bounding_box((-40.0, 170.0), *box)
+    # Containing a pole.
+    assert radius_bounding_box((89.5, 10.0), 100.0) == (
+        pytest.approx(88.599, abs=0.001),
+        -180.0,
+        90.0,
+        180.0,
+    )
+
+
+def test_within_radius():
+    """Test the bounding box pre-check gives the same result as haversine."""
+    for data in parse_flights(json.loads(load_fixture("fr24feed-flights-1.json"))):
+        coordinates = (data["latitude"], data["longitude"])
+        for radius in (10, 50, 100, 200):
+            assert within_radius(HOME_COORDINATES, coordinates, radius) == (
+                haversine(HOME_COORDINATES, coordinates) <= radius
+            )
+
+
+def test_stages():
+    """Test checks of parsed data and their pushdown."""
+    band = AltitudeBand(1000, 20000)
+    assert repr(band) == "<AltitudeBand(minimum=1000, maximum=20000)>"
+    assert band({"altitude": 1000})
+    assert not band({"altitude": "ground"})
+    assert not band({"altitude": None})
+    assert AltitudeBand(maximum=0)({"altitude": "ground"})
+    # Altitudes are never filled in, missing ones are dropped while parsing.
+    assert not band.pushdown({"altitude": None})
+
+    radius = Radius(HOME_COORDINATES, 50)
+    assert repr(radius) == "<Radius(home=(-33.5, 151.0), radius=50)>"
+    assert radius({"latitude": -33.6, "longitude": 151.1})
+    assert not radius({"latitude": -35.0, "longitude": 151.1})
+    assert not radius({"latitude": None, "longitude": None})
+    # Coordinates may be filled in later, only known ones are checked.
+    assert radius.pushdown({"latitude": None, "longitude": None})
+    assert radius.pushdown({"latitude": 0, "longitude": 0})
+    assert not radius.pushdown({"latitude": -35.0, "longitude": 151.1})
+
+    callsign = CallsignPattern("QFA[0-9]+$")
+    assert repr(callsign) == "<CallsignPattern(pattern=QFA[0-9]+$)>"
+    assert callsign({"callsign": "QFA456  "})
+    assert not callsign({"callsign": "QFAXYZ"})
+    assert not callsign({"callsign": ""})
+    assert callsign.pushdown({"callsign": ""})
+    # Filled in by the aggregator like a missing callsign.
+    assert not callsign.known({"callsign": "   "})
+    assert callsign.pushdown({"callsign": "   "})
+
+    # Checks are implemented by the stages.
+    with pytest.raises(TypeError):
+        FilterStage()
+
+    approaching = Approaching(
+        HOME_COORDINATES, 2, datetime.timedelta(minutes=5), radius=20
+    )
+    assert repr(approaching) == (
+        "<Approaching(home=(-33.5, 151.0), distance=2, period=0:05:00, radius=20)>"
+    )
+    # 60 km south, flying north at 480 knots, overhead in about 4 minutes.
+    assert approaching(
+        {"latitude": -34.04, "longitude": 151.0, "speed": 480, "track": 0}
+    )
+    # Passing too far away, or too late.
+    assert not approaching(
+        {"latitude": -34.04, "longitude": 151.1, "speed": 480, "track": 0}
+    )
+    assert not approaching(
+        {"latitude": -34.04, "longitude": 151.0, "speed": 240, "track": 0}
+    )
+    assert not approaching(
+        {"latitude": -34.04, "longitude": 151.0, "speed": None, "track": None}
+    )
+    # Within the radius regardless of the approach.
+    assert approaching(
+        {"latitude": -33.6, "longitude": 151.0, "speed": 480, "track": 180}
+    )
+    assert approaching.pushdown({"latitude": None, "longitude": None})
+
+
+def test_raw_fields():
+    """Test checking raw fields gives the same result as parsed data."""
+    flights = json.loads(load_fixture("fr24feed-flights-1.json"))
+    fields = RawFields(FLIGHT_FIELDS)
+    stages = [
+        AltitudeBand(1000, 20000),
+        Radius(HOME_COORDINATES, 150),
+        CallsignPattern("QFA"),
+    ]
+    for raw, data in zip(flights.values(), parse_flights(flights)):
+        fields.wrap(raw)
+        assert fields.get("mode_s") == data["mode_s"]
+        for stage in stages:
+            assert stage(fields) == stage(data)
+    assert fields.get("unknown", "default") == "default"
+    assert fields.wrap([]).get("mode_s") is None
+
+
+def test_pipeline():
+    """Test combining filters into a single predicate."""
+    pipeline = (
+        FilterPipeline()
+        .callsign("(QFA|JST)")
+        .radius(HOME_COORDINATES, 150)
+        .altitude(minimum=1)
+        .speed(100, 400)
+        .squawks(["4040", "1140", "1377"])
+        .bounding_box(-35.0, 150.0, -32.0, 152.0)
+        .approaching(HOME_COORDINATES, 150, datetime.timedelta(hours=1), 150)
+        .where(lambda entry: entry.external_id != "7c77f9")
+    )
+    assert repr(pipeline) == "<FilterPipeline(stages=7, predicates=1)>"
+    snapshot = parse_aircrafts(json.loads(load_fixture("dump1090-aircrafts-1.json")))
+    kept = [
+        data["mode_s"]
+        for data in snapshot
+        if pipeline(FeedEntry(HOME_COORDINATES, data))
+    ]
+    assert kept == ["7c6b28"]
+    assert not pipeline(FeedEntry(HOME_COORDINATES, None))
+
+    pushdown_filter = pipeline.pushdown()
+    assert repr(pushdown_filter) == "<PushdownFilter(stages=7)>"
+    # Can be passed on to a process pool.
+    pushdown_filter = pickle.loads(pickle.dumps(pushdown_filter))
+    parsed = parse_aircrafts(
+        json.loads(load_fixture("dump1090-aircrafts-1.json")), pushdown_filter
+    )
+    # The custom predicate only runs on feed entries.
+    assert [data["mode_s"] for data in parsed] == ["7c6b28", "7c77f9"]
+    # Aircrafts without coordinates or callsign are kept for the final check.
+    parsed = parse_aircrafts(
+        json.loads(load_fixture("dump1090-aircrafts-1.json")),
+        FilterPipeline().radius(HOME_COORDINATES, 10).callsign("QFA").pushdown(),
+    )
+    assert [data["mode_s"] for data in parsed] == ["7c6bbe", "7c6c52", "7c6d99"]
+    assert FilterPipeline().pushdown() is None
+
+
+@pytest.mark.asyncio
+async def test_aggregator_pushdown(aresponses, event_loop):
+    """Test pushing the filters down into the feed of an aggregator."""
+    for fixture in ("dump1090-aircrafts-1.json", "dump1090-aircrafts-2.json") * 2:
+        aresponses.add(
+            "localhost:8888",
+            "/data/aircraft.json",
+            "get",
+            aresponses.Response(
+                text=load_fixture(fixture),
+                content_type="application/json",
+                status=200,
+            ),
+            match_querystring=True,
+        )
+    pipeline = FilterPipeline().altitude(10000, 30000).callsign("(QFA|JST|QLK)")
+
+    async with aiohttp.ClientSession(loop=event_loop) as websession:
+        expected_aggregator = Dump1090AircraftsFeedAggregator(
+            HOME_COORDINATES, websession
+        )
+        # A plain predicate is not pushed down.
+        expected_aggregator.add_filter(lambda entry: pipeline(entry))
+        assert expected_aggregator.feed.pushdown_filter is None
+        expected = [await expected_aggregator.update() for _ in range(2)]
+
+        aggregator = Dump1090AircraftsFeedAggregator(HOME_COORDINATES, websession)
+        aggregator.add_filter(pipeline)
+        aggregator.add_filter(FilterPipeline().speed(maximum=400))
+        assert repr(aggregator.feed.pushdown_filter) == "<PushdownFilter(stages=3)>"
+        for expected_status, expected_entries in expected:
+            status, entries = await aggregator.update()
+            assert status == expected_status
+            assert sorted(entries) == sorted(expected_entries)
+        assert sorted(entries) == ["7c5304", "7c6b28", "7c6d9a", "7c77f9"]
+        # Aircrafts dropped while parsing are still cached and counted.
+        assert set(aggregator.feed.dropped) - set(entries)
+        assert dict(aggregator.callsigns) == dict(expected_aggregator.callsigns)
+        assert dict(aggregator.coordinates) == dict(expected_aggregator.coordinates)
+        assert {
+            key: (data.retrievals, data.total)
+            for key, data in aggregator.statistics.entries.items()
+        } == {
+            key: (data.retrievals, data.total)
+            for key, data in expected_aggregator.statistics.entries.items()
+        }
+
+
+@pytest.mark.asyncio
+async def test_aggregator_pushdown_changed_pipeline(event_loop):
+    """Test that checks added to a pipeline later on are pushed down."""
+    async with aiohttp.ClientSession(loop=event_loop) as websession:
+        aggregator = Dump1090AircraftsFeedAggregator(HOME_COORDINATES, websession)
+    base = FilterPipeline().speed(maximum=400).pushdown()
+    aggregator.feed.pushdown_filter = base
+    pipeline = FilterPipeline()
+    aggregator.add_filter(pipeline)
+    assert aggregator.feed.pushdown_filter is base
+    pipeline.altitude(10000, 30000).callsign("(QFA|JST|QLK)")
+    aggregator._sync_pushdown()
+    assert repr(aggregator.feed.pushdown_filter) == "<PushdownFilter(stages=3)>"
+    pushdown_filter = aggregator.feed.pushdown_filter
+    # Unchanged pipelines are not pushed down again.
+    aggregator._sync_pushdown()
+    assert aggregator.feed.pushdown_filter is pushdown_filter
+    pipeline.speed(minimum=100)
+    aggregator._sync_pushdown()
+    assert repr(aggregator.feed.pushdown_filter) == "<PushdownFilter(stages=4)>"
+
+
+@pytest.mark.asyncio
+async def test_aggregator_radius_box(monkeypatch):
+    """Test that the radius bounding box is computed once per update."""
+    calls = []
+
+    def _radius_bounding_box(home_coordinates, radius):
+        calls.append(home_coordinates)
+        return radius_bounding_box(home_coordinates, radius)
+
+    monkeypatch.setattr(feed_aggregator, "radius_bounding_box", _radius_bounding_box)
+    aggregator = feed_aggregator.FeedAggregator(filter_radius=150)
+    snapshot = parse_aircrafts(json.loads(load_fixture("dump1090-aircrafts-1.json")))
+    entries = [FeedEntry(HOME_COORDINATES, data) for data in snapshot]
+    filtered = await aggregator._filter_entries(entries)
+    assert calls == [HOME_COORDINATES]
+    assert filtered
+    assert all(
+        haversine(HOME_COORDINATES, entry.coordinates) <= 150 for entry in filtered
+    )
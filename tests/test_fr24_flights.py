@@ -1,5 +1,6 @@
 """Test for the Flightsradar24 feed."""
 import asyncio
+import concurrent.futures
 import datetime
 
 import aiohttp
@@ -7,12 +8,14 @@ import pytest
 
 from flightradar_client.consts import UPDATE_ERROR, UPDATE_OK
 from flightradar_client.exceptions import FlightradarException
+from flightradar_client.feed import Feed
 from flightradar_client.feed_entry import FeedEntry
 from flightradar_client.fr24feed_flights import (
     FlightradarFlightsFeed,
     FlightradarFlightsFeedAggregator,
     FlightradarFlightsFeedManager,
 )
+from flightradar_client.utils import INTERN_TABLE, InternTable
 from tests.utils import load_fixture
 
 
@@ -146,6 +149,24 @@ async def test_missing_session(aresponses, event_loop):
             FlightradarFlightsFeed(home_coordinates, None)
 
 
+@pytest.mark.asyncio
+async def test_executor_without_parser(event_loop):
+    """Test rejecting an executor if the feed cannot parse in one."""
+
+    class _Feed(Feed):
+        """Feed without parser function."""
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        async with aiohttp.ClientSession(loop=event_loop) as websession:
+            with pytest.raises(FlightradarException):
+                _Feed(
+                    (-31.0, 151.0),
+                    websession,
+                    url="http://localhost/",
+                    executor=executor,
+                )
+
+
 @pytest.mark.asyncio
 async def test_update_error(aresponses, event_loop):
     """Test updating feed results in error."""
@@ -417,3 +438,382 @@ def test_entry_without_data():
     assert entry.squawk is None
     assert entry.vert_rate is None
     assert entry.updated is None
+
+
+@pytest.mark.asyncio
+async def test_feed_aggregator_process_pool(aresponses, event_loop):
+    """Test aggregating with parsing in a process pool."""
+    home_coordinates = (-31.0, 151.0)
+    for fixture in ("fr24feed-flights-1.json", "fr24feed-flights-2.json") * 2:
+        aresponses.add(
+            "localhost:8754",
+            "/flights.json",
+            "get",
+            aresponses.Response(
+                text=load_fixture(fixture),
+                content_type="application/json",
+                status=200,
+            ),
+            match_querystring=True,
+        )
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+        async with aiohttp.ClientSession(loop=event_loop) as websession:
+            inline_aggregator = FlightradarFlightsFeedAggregator(
+                home_coordinates, websession
+            )
+            expected = [await inline_aggregator.update() for _ in range(2)]
+            feed_aggregator = FlightradarFlightsFeedAggregator(
+                home_coordinates, websession, executor=executor
+            )
+            for expected_status, expected_entries in expected:
+                status, entries = await feed_aggregator.update()
+                assert status == expected_status
+                assert {key: entry.data for key, entry in entries.items()} == {
+                    key: entry.data for key, entry in expected_entries.items()
+                }
+
+
+@pytest.mark.asyncio
+async def test_feed_aggregator_reuse_entries(aresponses, event_loop):
+    """Test updating the same entries in place."""
+    home_coordinates = (-31.0, 151.0)
+    fixtures = (
+        "fr24feed-flights-1.json",
+        "fr24feed-flights-2.json",
+        "fr24feed-flights-3.json",
+    )
+    for fixture in fixtures * 2 + ("fr24feed-flights-3.json",):
+        aresponses.add(
+            "localhost:8754",
+            "/flights.json",
+            "get",
+            aresponses.Response(
+                text=load_fixture(fixture),
+                content_type="application/json",
+                status=200,
+            ),
+            match_querystring=True,
+        )
+
+    async with aiohttp.ClientSession(loop=event_loop) as websession:
+        inline_aggregator = FlightradarFlightsFeedAggregator(
+            home_coordinates, websession
+        )
+        expected = [await inline_aggregator.update() for _ in fixtures]
+        feed_aggregator = FlightradarFlightsFeedAggregator(
+            home_coordinates, websession, reuse_entries=True
+        )
+        # Entries are only created for aircrafts new in the feed.
+        created = []
+        new_entry = feed_aggregator.feed._new_entry
+
+        def _new_entry(home_coordinates, feed_data):
+            created.append(feed_data["mode_s"])
+            return new_entry(home_coordinates, feed_data)
+
+        feed_aggregator.feed._new_entry = _new_entry
+        previous_entries = {}
+        kept = {}
+        for _, expected_entries in expected:
+            status, entries = await feed_aggregator.update()
+            assert status == UPDATE_OK
+            assert {key: entry.data for key, entry in entries.items()} == {
+                key: entry.data for key, entry in expected_entries.items()
+            }
+            for key, entry in entries.items():
+                if key in previous_entries:
+                    assert entry is previous_entries[key]
+            assert sorted(created) == sorted(
+                feed_aggregator._entries.keys() - kept.keys()
+            )
+            created.clear()
+            kept = feed_aggregator._entries
+            previous_entries = entries
+        versions = {key: entry.version for key, entry in entries.items()}
+        # Values filled in from the cache do not count as changes.
+        assert versions["7C1469"] == 2
+        assert versions["7C5304"] == 1
+        # Unchanged data keeps the version.
+        status, entries = await feed_aggregator.update()
+        assert {key: entry.version for key, entry in entries.items()} == versions
+
+        # Entries of removed aircrafts are released.
+        aresponses.add(
+            "localhost:8754",
+            "/flights.json",
+            "get",
+            aresponses.Response(text="{}", content_type="application/json"),
+            match_querystring=True,
+        )
+        aresponses.add(
+            "localhost:8754",
+            "/flights.json",
+            "get",
+            aresponses.Response(
+                text=load_fixture("fr24feed-flights-3.json"),
+                content_type="application/json",
+                status=200,
+            ),
+            match_querystring=True,
+        )
+        status, entries = await feed_aggregator.update()
+        assert not entries
+        assert not feed_aggregator._entries
+        status, entries = await feed_aggregator.update()
+        assert all(entry.version == 1 for entry in entries.values())
+
+
+def test_entry_update_data():
+    """Test updating the data of an entry in place."""
+    entry = FeedEntry(None, None)
+    assert entry.version == 1
+    assert entry.update_data({"mode_s": "7C6B28", "callsign": "JST423"})
+    assert entry.version == 2
+    assert entry.airline_designator == "JST"
+    assert entry.country == "AU"
+    data = entry.data
+    assert not entry.update_data({"mode_s": "7C6B28", "callsign": "JST423"})
+    assert entry.version == 2
+    assert entry.update_data({"mode_s": "A00001", "callsign": "QFA1"})
+    assert entry.data is data
+    assert entry.version == 3
+    assert entry.airline_designator == "QFA"
+    assert entry.country == "US"
+
+
+@pytest.mark.asyncio
+async def test_feed_manager_coalesce_updates(aresponses, event_loop):
+    """Test that updates requested while one is running are merged."""
+    home_coordinates = (-31.0, 151.0)
+    for fixture in ("fr24feed-flights-1.json", "fr24feed-flights-3.json"):
+        aresponses.add(
+            "localhost:8754",
+            "/flights.json",
+            "get",
+            aresponses.Response(
+                text=load_fixture(fixture),
+                content_type="application/json",
+                status=200,
+            ),
+            match_querystring=True,
+        )
+
+    release = asyncio.Event()
+    running = []
+    generated_entity_external_ids = []
+
+    async def _generate_entity(external_id):
+        """Block the first update until released."""
+        assert not running
+        running.append(external_id)
+        await release.wait()
+        generated_entity_external_ids.append(external_id)
+        running.remove(external_id)
+
+    async def _ignore(external_id):
+        """Ignore callback."""
+        pass
+
+    async with aiohttp.ClientSession(loop=event_loop) as websession:
+        feed_manager = FlightradarFlightsFeedManager(
+            _generate_entity,
+            _ignore,
+            _ignore,
+            home_coordinates,
+            websession,
+            coalesce_updates=True,
+        )
+        coalesced = feed_manager._feed.metrics.updates_coalesced.value
+        update = asyncio.ensure_future(feed_manager.update(None))
+        while not running:
+            await asyncio.sleep(0)
+        # These return immediately and result in a single further update.
+        for _ in range(3):
+            await feed_manager.update(None)
+        assert not update.done()
+        release.set()
+        await update
+        assert feed_manager._feed.metrics.updates_coalesced.value == coalesced + 3
+        # The latest data has been applied.
+        assert feed_manager.feed_entries["7C1469"].coordinates == (-33.888, 151.2435)
+        assert "7C6B29" in generated_entity_external_ids
+
+
+@pytest.mark.asyncio
+async def test_feed_interns_identifiers(aresponses, event_loop):
+    """Test that identifiers are shared between updates."""
+    home_coordinates = (-31.0, 151.0)
+    for _ in range(2):
+        aresponses.add(
+            "localhost:8754",
+            "/flights.json",
+            "get",
+            aresponses.Response(
+                text=load_fixture("fr24feed-flights-1.json"),
+                content_type="application/json",
+                status=200,
+            ),
+            match_querystring=True,
+        )
+
+    async with aiohttp.ClientSession(loop=event_loop) as websession:
+        feed = FlightradarFlightsFeed(home_coordinates, websession)
+        _, first = await feed.update()
+        _, second = await feed.update()
+        for (key, entry), (other_key, other_entry) in zip(
+            first.items(), second.items()
+        ):
+            assert key is other_key
+            assert entry.squawk is other_entry.squawk
+            assert entry.callsign is other_entry.callsign
+
+
+def _slow_response(aresponses, fixture, seconds):
+    """Create a handler answering with the fixture after a delay."""
+
+    async def _handler(request):
+        await asyncio.sleep(seconds)
+        return aresponses.Response(
+            text=load_fixture(fixture),
+            content_type="application/json",
+            status=200,
+        )
+
+    return _handler
+
+
+@pytest.mark.asyncio
+async def test_update_hedged(aresponses, event_loop):
+    """Test hedging slow and failing requests with mirrors."""
+    home_coordinates = (-31.0, 151.0)
+    mirror_url = "http://mirror:8754/flights.json"
+    aresponses.add(
+        "localhost:8754",
+        "/flights.json",
+        "get",
+        _slow_response(aresponses, "fr24feed-flights-1.json", 5),
+    )
+    aresponses.add(
+        "mirror:8754",
+        "/flights.json",
+        "get",
+        aresponses.Response(
+            text=load_fixture("fr24feed-flights-3.json"),
+            content_type="application/json",
+            status=200,
+        ),
+    )
+    aresponses.add(
+        "localhost:8754", "/flights.json", "get", aresponses.Response(status=500)
+    )
+    aresponses.add(
+        "mirror:8754",
+        "/flights.json",
+        "get",
+        aresponses.Response(
+            text=load_fixture("fr24feed-flights-1.json"),
+            content_type="application/json",
+            status=200,
+        ),
+    )
+    aresponses.add(
+        "localhost:8754",
+        "/flights.json",
+        "get",
+        aresponses.Response(text="{", content_type="application/json", status=200),
+    )
+    aresponses.add(
+        "mirror:8754",
+        "/flights.json",
+        "get",
+        aresponses.Response(
+            text=load_fixture("fr24feed-flights-3.json"),
+            content_type="application/json",
+            status=200,
+        ),
+    )
+
+    async with aiohttp.ClientSession(loop=event_loop) as websession:
+        feed = FlightradarFlightsFeed(
+            home_coordinates, websession, mirror_urls=[mirror_url]
+        )
+        assert feed.mirror_urls == [mirror_url]
+        # Recent requests took 10 ms.
+        feed._latencies.extend([0.01] * 20)
+        assert feed._hedge_delay() == 0.01
+        hedged = feed.metrics.hedged_requests.value
+        start = event_loop.time()
+        status, entries = await feed.update()
+        assert event_loop.time() - start < 2
+        assert status == UPDATE_OK
+        # Answered by the mirror.
+        assert "7C6B29" in entries
+        assert feed.metrics.hedged_requests.value == hedged + 1
+        # The cancelled request counts with the time it took until then.
+        assert len(feed._latencies) == 22
+        assert feed._latencies[-1] >= 0.01
+
+        # Failed requests are retried with the mirror right away.
+        status, entries = await feed.update()
+        assert status == UPDATE_OK
+        assert "7C52F9" in entries
+        assert feed.metrics.hedged_requests.value == hedged + 1
+        # Failed requests have a latency too.
+        assert len(feed._latencies) == 24
+
+        # Invalid data is an error of that url only.
+        status, entries = await feed.update()
+        assert status == UPDATE_OK
+        assert "7C6B29" in entries
+
+
+@pytest.mark.asyncio
+async def test_update_timeout(aresponses, event_loop):
+    """Test configured request timeouts."""
+    home_coordinates = (-31.0, 151.0)
+    aresponses.add(
+        "localhost:8754",
+        "/flights.json",
+        "get",
+        _slow_response(aresponses, "fr24feed-flights-1.json", 5),
+    )
+
+    async with aiohttp.ClientSession(loop=event_loop) as websession:
+        timeout = aiohttp.ClientTimeout(total=10, sock_read=0.1)
+        feed = FlightradarFlightsFeed(home_coordinates, websession, timeout=timeout)
+        assert feed.timeout is timeout
+        status, entries = await feed.update()
+        assert status == UPDATE_ERROR
+        assert entries is None
+
+
+@pytest.mark.asyncio
+async def test_feed_aggregator_intern_table(aresponses, event_loop):
+    """Test interning identifiers through the table of the feed."""
+    home_coordinates = (-31.0, 151.0)
+    aresponses.add(
+        "localhost:8754",
+        "/flights.json",
+        "get",
+        aresponses.Response(
+            text=load_fixture("fr24feed-flights-1.json"),
+            content_type="application/json",
+            status=200,
+        ),
+        match_querystring=True,
+    )
+
+    async with aiohttp.ClientSession(loop=event_loop) as websession:
+        intern_table = InternTable.for_aircrafts(10)
+        feed_aggregator = FlightradarFlightsFeedAggregator(
+            home_coordinates, websession, intern_table=intern_table
+        )
+        assert feed_aggregator.feed.intern_table is intern_table
+        size = len(INTERN_TABLE)
+        status, entries = await feed_aggregator.update()
+        assert status == UPDATE_OK
+        entry = entries["7C1469"]
+        assert entry.external_id is intern_table.intern("".join(["7C", "1469"]))
+        assert entry.callsign is intern_table.intern("".join(["QFA", "456"]))
+        assert len(INTERN_TABLE) == size
@@ -0,0 +1,101 @@
+"""Test for the geofences."""
+import pytest
+
+from flightradar_client.exceptions import FlightradarException
+from flightradar_client.feed_entry import FeedEntry
+from flightradar_client.geofence import Geofence, GeofenceIndex, GeofenceMonitor
+
+SYDNEY_AIRPORT = Geofence(
+    "YSSY", [(-33.92, 151.15), (-33.92, 151.20), (-33.98, 151.20), (-33.98, 151.15)]
+)
+# Triangle overlapping the airport.
+CORRIDOR = Geofence("corridor", [(-33.80, 151.10), (-34.10, 151.10), (-34.10, 151.40)])
+NEWCASTLE = Geofence(
+    "YWLM", [(-32.78, 151.82), (-32.78, 151.86), (-32.82, 151.86), (-32.82, 151.82)]
+)
+
+
+def _entry(mode_s, latitude, longitude):
+    """Create a feed entry."""
+    return FeedEntry(
+        (-33.5, 151.0),
+        {"mode_s": mode_s, "latitude": latitude, "longitude": longitude},
+    )
+
+
+def test_geofence():
+    """Test point in polygon checks."""
+    assert repr(SYDNEY_AIRPORT) == "<Geofence(id=YSSY)>"
+    assert SYDNEY_AIRPORT.bbox == (-33.98, 151.15, -33.92, 151.20)
+    assert SYDNEY_AIRPORT.contains(-33.95, 151.17)
+    assert not SYDNEY_AIRPORT.contains(-33.95, 151.25)
+    assert CORRIDOR.contains(-34.05, 151.12)
+    # Inside the bounding box, but outside the triangle.
+    assert not CORRIDOR.contains(-33.85, 151.25)
+    with pytest.raises(FlightradarException):
+        Geofence("invalid", [(0, 0), (1, 1)])
+
+
+def test_geofence_index():
+    """Test looking up candidate geofences."""
+    index = GeofenceIndex([SYDNEY_AIRPORT, CORRIDOR, NEWCASTLE], cell_size=0.1)
+    assert len(index) == 3
+    assert index.candidates(-32.80, 151.84) == [NEWCASTLE]
+    assert index.candidates(-31.0, 151.0) == []
+    assert index.matches(-33.95, 151.17) == {"YSSY", "corridor"}
+    assert index.matches(-33.85, 151.25) == set()
+
+    index.remove("YSSY")
+    assert index.matches(-33.95, 151.17) == {"corridor"}
+    index.add(SYDNEY_AIRPORT)
+    index.add(SYDNEY_AIRPORT)
+    assert len(index) == 3
+    assert index.matches(-33.95, 151.17) == {"YSSY", "corridor"}
+    assert repr(index).startswith("<GeofenceIndex(geofences=3, cells=")
+
+
+@pytest.mark.asyncio
+async def test_geofence_monitor():
+    """Test reporting enter and exit events."""
+    events = []
+
+    async def _enter(external_id, geofence_id):
+        """Record enter event."""
+        events.append(("enter", external_id, geofence_id))
+
+    async def _exit(external_id, geofence_id):
+        """Record exit event."""
+        events.append(("exit", external_id, geofence_id))
+
+    monitor = GeofenceMonitor([SYDNEY_AIRPORT, CORRIDOR, NEWCASTLE], _enter, _exit)
+    assert repr(monitor).startswith("<GeofenceMonitor(index=<GeofenceIndex(")
+
+    await monitor.update(
+        {"a": _entry("a", -33.95, 151.17), "b": _entry("b", -33.0, 151.0)}
+    )
+    assert sorted(events) == [
+        ("enter", "a", "YSSY"),
+        ("enter", "a", "corridor"),
+    ]
+    assert monitor.memberships("a") == {"YSSY", "corridor"}
+    assert monitor.memberships("b") == set()
+
+    # Unknown positions keep the memberships.
+    events.clear()
+    await monitor.update({"a": _entry("a", None, None), "b": _entry("b", 0, 0)})
+    assert events == []
+
+    events.clear()
+    await monitor.update(
+        {"a": _entry("a", -34.05, 151.12), "b": _entry("b", -32.8, 151.84)}
+    )
+    assert sorted(events) == [("enter", "b", "YWLM"), ("exit", "a", "YSSY")]
+
+    events.clear()
+    await monitor.update({"a": _entry("a", -31.0, 151.0)})
+    assert sorted(events) == [("exit", "a", "corridor"), ("exit", "b", "YWLM")]
+    assert monitor.memberships("a") == set()
+
+    events.clear()
+    await monitor.update(None)
+    assert events == []
@@ -0,0 +1,142 @@
+"""Test for the position history."""
+import asyncio
+import datetime
+import sqlite3
+import threading
+
+import pytest
+
+from flightradar_client.exceptions import FlightradarException
+from flightradar_client.feed_entry import FeedEntry
+from flightradar_client.history import HistorySink
+
+
+def _entries(timestamp, *positions):
+    """Create feed entries from (mode_s, latitude, longitude) tuples."""
+    return {
+        mode_s: FeedEntry(
+            (-31.0, 151.0),
+            {
+                "mode_s": mode_s,
+                "latitude": latitude,
+                "longitude": longitude,
+                "altitude": 1000,
+                "track": 90,
+                "speed": 200,
+                "vert_rate": 0,
+                "squawk": "1234",
+                "callsign": "QFA1",
+                "updated": timestamp,
+            },
+        )
+        for mode_s, latitude, longitude in positions
+    }
+
+
+@pytest.mark.asyncio
+async def test_history_sink(tmp_path):
+    """Test writing and querying positions."""
+    path = str(tmp_path / "history.db")
+    sink = HistorySink(path, batch_size=2, flush_interval=0.05)
+    assert repr(sink) == "<HistorySink(path={})>".format(path)
+    await sink.update(_entries(1540539351, ("a", -32.0, 151.0), ("b", 0, 0)))
+    await sink.update(_entries(1540539352, ("a", -32.1, 151.1), ("b", -33.0, 151.5)))
+    await sink.update(_entries(None, ("c", -34.0, 150.0)))
+    await sink.update(None)
+    await sink.close()
+    assert sink.buffered == 0
+
+    rows = sink.positions()
+    assert len(rows) == 4
+    assert rows[0] == (
+        "a",
+        1540539351.0,
+        -32.0,
+        151.0,
+        1000,
+        90,
+        200,
+        0,
+        "1234",
+        "QFA1",
+    )
+    assert [row[0] for row in sink.positions(mode_s="a")] == ["a", "a"]
+    start = datetime.datetime.fromtimestamp(1540539352, tz=datetime.timezone.utc)
+    assert [row[0] for row in sink.positions(start=start)] == ["a", "b", "c"]
+    assert [row[0] for row in sink.positions(end=start)] == ["a"]
+
+    connection = sqlite3.connect(path)
+    assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    connection.close()
+
+    # Updates after closing are discarded.
+    await sink.update(_entries(1540539353, ("a", -32.2, 151.2)))
+    assert len(sink.positions()) == 4
+
+
+@pytest.mark.asyncio
+async def test_backpressure(tmp_path):
+    """Test waiting for room in the buffer."""
+    sink = HistorySink(
+        str(tmp_path / "history.db"),
+        batch_size=1000,
+        flush_interval=0.05,
+        max_buffer_size=2,
+    )
+    await sink.update(_entries(1, ("a", -32.0, 151.0), ("b", -32.0, 151.0)))
+    assert sink.buffered == 2
+    # Has to wait until the writer thread has written the buffered rows.
+    await asyncio.wait_for(sink.update(_entries(2, ("a", -32.0, 151.0))), timeout=5)
+    await sink.close()
+    assert len(sink.positions()) == 3
+
+
+def test_invalid_path(tmp_path):
+    """Test opening a database in a non-existing directory."""
+    with pytest.raises(sqlite3.Error):
+        HistorySink(str(tmp_path / "missing" / "history.db"))
+
+
+@pytest.mark.asyncio
+async def test_backpressure_timeout(tmp_path, monkeypatch):
+    """Test giving up waiting for room when the writer is stuck."""
+    written = threading.Event()
+    release = threading.Event()
+    write = HistorySink._write
+
+    def _write(self, connection, batch):
+        written.set()
+        release.wait()
+        write(self, connection, batch)
+
+    monkeypatch.setattr(HistorySink, "_write", _write)
+    sink = HistorySink(
+        str(tmp_path / "history.db"),
+        batch_size=1000,
+        flush_interval=0.05,
+        max_buffer_size=2,
+        timeout=0.1,
+    )
+    await sink.update(_entries(1, ("a", -32.0, 151.0), ("b", -32.0, 151.0)))
+    assert written.wait(5)
+    await sink.update(_entries(2, ("a", -32.0, 151.0), ("b", -32.0, 151.0)))
+    with pytest.raises(FlightradarException):
+        await sink.update(_entries(3, ("a", -32.0, 151.0)))
+    release.set()
+    await sink.close()
+    assert len(sink.positions()) == 4
+
+
+def test_open_timeout(tmp_path, monkeypatch):
+    """Test giving up waiting for the database to be opened."""
+    release = threading.Event()
+    connect = sqlite3.connect
+
+    def _connect(*args, **kwargs):
+        release.wait()
+        return connect(*args, **kwargs)
+
+    monkeypatch.setattr(sqlite3, "connect", _connect)
+    with pytest.raises(FlightradarException):
+        HistorySink(str(tmp_path / "history.db"), timeout=0.1)
+    release.set()
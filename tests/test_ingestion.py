@@ -0,0 +1,167 @@
+"""Test for the sharded ingestion."""
+import asyncio
+import datetime
+import json
+import queue
+import time
+
+import pytest
+from aiohttp import web
+
+from flightradar_client.consts import UPDATE_ERROR, UPDATE_OK
+from flightradar_client.encoding import SnapshotEncoder, decode
+from flightradar_client.exceptions import FlightradarException
+from flightradar_client.feed_entry import FeedEntry
+from flightradar_client.feed_manager import FeedManagerBase
+from flightradar_client.fr24feed_flights import parse_flights
+from flightradar_client.ingestion import (
+    IngestionSupervisor,
+    Receiver,
+    ShardedFeedAggregator,
+    _encode,
+)
+from tests.utils import load_fixture
+
+
+async def _start_server():
+    """Serve the feed fixtures."""
+
+    def _handler(fixture):
+        async def _handle(request):
+            return web.Response(
+                text=load_fixture(fixture), content_type="application/json"
+            )
+
+        return _handle
+
+    app = web.Application()
+    app.router.add_get("/data/aircraft.json", _handler("dump1090-aircrafts-1.json"))
+    app.router.add_get("/flights.json", _handler("fr24feed-flights-1.json"))
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, runner.addresses[0][1]
+
+
+async def _wait_for(condition, timeout=30):
+    """Wait until the condition is met."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        await asyncio.sleep(0.05)
+
+
+def test_receiver():
+    """Test receiver configuration."""
+    receiver = Receiver("fr24", hostname="receiver", port=1234)
+    assert repr(receiver) == (
+        "<Receiver(kind=fr24, url=None, hostname=receiver, port=1234)>"
+    )
+    with pytest.raises(FlightradarException):
+        Receiver("unknown")
+    with pytest.raises(FlightradarException):
+        IngestionSupervisor([])
+
+
+@pytest.mark.asyncio
+async def test_supervisor():
+    """Test ingesting from several receivers in worker processes."""
+    runner, port = await _start_server()
+    url = "http://127.0.0.1:{}".format(port)
+    supervisor = IngestionSupervisor(
+        [
+            Receiver("dump1090", url=url + "/data/aircraft.json"),
+            Receiver("fr24", url=url + "/flights.json"),
+            Receiver("fr24", url=url + "/missing.json"),
+        ],
+        home_coordinates=(-31.0, 151.0),
+        workers=2,
+        interval=0.2,
+        stale_after=datetime.timedelta(seconds=30),
+    )
+    assert repr(supervisor) == "<IngestionSupervisor(receivers=3, workers=2)>"
+    assert supervisor.health[0].receivers == [0, 2]
+    assert supervisor.health[1].receivers == [1]
+    await supervisor.start()
+    try:
+        await _wait_for(
+            lambda: all(health.updates > 0 for health in supervisor.health.values())
+        )
+        await _wait_for(lambda: supervisor.health[0].errors > 0)
+        assert supervisor.health[1].errors == 0
+        assert supervisor.health[0].alive
+
+        snapshot = supervisor.snapshot()
+        # Entries of both receivers are merged.
+        assert "7c6d9a" in snapshot
+        assert "7C1469" in snapshot
+        assert snapshot["7C1469"].home_coordinates == (-31.0, 151.0)
+
+        generated_entity_external_ids = []
+
+        async def _generate_entity(external_id):
+            """Generate new entity."""
+            generated_entity_external_ids.append(external_id)
+
+        async def _ignore(external_id):
+            """Ignore updates and removals."""
+
+        aggregator = ShardedFeedAggregator(supervisor)
+        assert repr(aggregator.feed).startswith("<ShardedFeed(supervisor=")
+        manager = FeedManagerBase(aggregator, _generate_entity, _ignore, _ignore)
+        await manager.update(None)
+        assert "7C1469" in manager.feed_entries
+        assert sorted(generated_entity_external_ids) == sorted(manager.feed_entries)
+
+        # Crashed workers are restarted.
+        pid = supervisor.health[1].pid
+        supervisor._processes[1].kill()
+        await _wait_for(lambda: supervisor.health[1].restarts == 1)
+        assert supervisor.health[1].pid != pid
+        updates = supervisor.health[1].updates
+        await _wait_for(lambda: supervisor.health[1].updates > updates)
+        assert "7C1469" in supervisor.snapshot()
+    finally:
+        await supervisor.stop()
+        await runner.cleanup()
+    assert not any(health.alive for health in supervisor.health.values())
+    assert repr(supervisor.health[1]).startswith(
+        "<WorkerHealth(worker=1, alive=False, restarts=1"
+    )
+
+
+def test_supervisor_resync():
+    """Test requesting a keyframe after an invalid snapshot."""
+    supervisor = IngestionSupervisor([Receiver("fr24", url="http://receiver")])
+    resync = queue.Queue()
+    supervisor._resync[0] = resync
+    encoder = SnapshotEncoder()
+    feed_entries = {
+        data["mode_s"]: FeedEntry(None, data)
+        for data in parse_flights(json.loads(load_fixture("fr24feed-flights-1.json")))
+    }
+    supervisor._process_result(0, 0, UPDATE_OK, encoder.encode(feed_entries), 0.1)
+    assert "7C1469" in supervisor.snapshot()
+    supervisor._process_result(0, 0, UPDATE_OK, b"invalid", 0.1)
+    assert supervisor.health[0].errors == 1
+    # The snapshot is discarded until the worker sends a keyframe.
+    assert not supervisor.snapshot()
+    assert resync.get_nowait() == 0
+
+
+def test_encode_out_of_range():
+    """Test that a record out of range only fails the update."""
+    encoder = SnapshotEncoder()
+    feed_entries = {
+        data["mode_s"]: FeedEntry(None, data)
+        for data in parse_flights(json.loads(load_fixture("fr24feed-flights-1.json")))
+    }
+    assert _encode(encoder, UPDATE_OK, feed_entries)[0] == UPDATE_OK
+    feed_entries["7C1469"].override("speed", 70000)
+    assert _encode(encoder, UPDATE_OK, feed_entries) == (UPDATE_ERROR, None)
+    # The next snapshot is a keyframe again.
+    feed_entries["7C1469"].override("speed", 400)
+    status, message = _encode(encoder, UPDATE_OK, feed_entries)
+    assert status == UPDATE_OK
+    assert decode(message)["7C1469"].speed == 400
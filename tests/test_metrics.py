@@ -0,0 +1,191 @@
+"""Test for the metrics."""
+import aiohttp
+import pytest
+
+from flightradar_client.dump1090_aircrafts import Dump1090AircraftsFeedAggregator
+from flightradar_client.exceptions import FlightradarException
+from flightradar_client.feed_aggregator import FeedAggregator
+from flightradar_client.feed_entry import FeedEntry
+from flightradar_client.feed_manager import FeedManagerBase
+from flightradar_client.metrics import (
+    DEFAULT_REGISTRY,
+    FeedMetrics,
+    MetricsRegistry,
+    start_http_server,
+)
+from tests.utils import load_fixture
+
+
+def test_render():
+    """Test rendering metrics in the text exposition format."""
+    registry = MetricsRegistry()
+    counter = registry.counter("test_requests", "Requests.", ("feed",))
+    assert registry.counter("test_requests", "Requests.", ("feed",)) is counter
+    assert repr(counter) == "<MetricFamily(name=test_requests, type=counter)>"
+    counter.labels('a"b\\c\nd').inc()
+    counter.labels("x").inc(2.5)
+    histogram = registry.histogram("test_duration_seconds", "Duration.", buckets=(1, 5))
+    child = histogram.labels()
+    child.observe(0.5)
+    child.observe(1)
+    child.observe(7)
+    assert registry.get("test_duration_seconds") is histogram
+    assert registry.get("unknown") is None
+    assert repr(registry) == "<MetricsRegistry(families=2)>"
+    assert registry.render() == (
+        "# HELP test_requests Requests.\n"
+        "# TYPE test_requests counter\n"
+        'test_requests_total{feed="a\\"b\\\\c\\nd"} 1\n'
+        'test_requests_total{feed="x"} 2.5\n'
+        "# HELP test_duration_seconds Duration.\n"
+        "# TYPE test_duration_seconds histogram\n"
+        'test_duration_seconds_bucket{le="1"} 2\n'
+        'test_duration_seconds_bucket{le="5"} 2\n'
+        'test_duration_seconds_bucket{le="+Inf"} 3\n'
+        "test_duration_seconds_sum 8.5\n"
+        "test_duration_seconds_count 3\n"
+    )
+
+    with pytest.raises(FlightradarException):
+        counter.labels()
+
+
+def test_feed_metrics():
+    """Test the metrics of a feed."""
+    registry = MetricsRegistry()
+    metrics = FeedMetrics("test", registry)
+    assert repr(metrics) == "<FeedMetrics(feed=test)>"
+    metrics.response(200)
+    metrics.error("timeout")
+    metrics.cache_lookup("callsign", True)
+    metrics.callback_duration("generate", 0.001)
+    output = registry.render()
+    assert 'flightradar_fetch_responses_total{feed="test",status="200"} 1' in output
+    assert 'flightradar_errors_total{feed="test",error="timeout"} 1' in output
+    assert (
+        'flightradar_cache_lookups_total{feed="test",cache="callsign",result="hit"} 1'
+        in output
+    )
+    assert (
+        'flightradar_callback_duration_seconds_count{feed="test",callback="generate"} 1'
+        in output
+    )
+
+
+@pytest.mark.asyncio
+async def test_feed_aggregator_metrics(aresponses, event_loop):
+    """Test metrics recorded while updating the feed aggregator."""
+    aresponses.add(
+        "metrics:8888",
+        "/data/aircraft.json",
+        "get",
+        aresponses.Response(
+            text=load_fixture("dump1090-aircrafts-1.json"),
+            content_type="application/json",
+            status=200,
+        ),
+        match_querystring=True,
+    )
+
+    async with aiohttp.ClientSession(loop=event_loop) as websession:
+        feed_aggregator = Dump1090AircraftsFeedAggregator(
+            (-31.0, 151.0), websession, hostname="metrics"
+        )
+        await feed_aggregator.update()
+
+    metrics = feed_aggregator.metrics
+    assert metrics is feed_aggregator.feed.metrics
+    assert metrics.aircrafts_parsed.value == 11
+    assert metrics.aircrafts_filtered.value == 7
+    assert metrics.aircrafts_kept.value == 4
+    assert metrics.fetch_duration.count == 1
+    assert metrics.payload_bytes.count == 1
+    output = DEFAULT_REGISTRY.render()
+    assert (
+        'flightradar_fetch_responses_total{feed="http://metrics:8888/data/aircraft.json",status="200"} 1'
+        in output
+    )
+    assert (
+        'flightradar_cache_lookups_total{feed="http://metrics:8888/data/aircraft.json",cache="coordinates",result="miss"} 6'
+        in output
+    )
+
+
+@pytest.mark.asyncio
+async def test_feed_manager_without_metrics():
+    """Test managing a feed that does not record metrics."""
+    statuses = ["OK", "ERROR"]
+    external_ids = []
+
+    class _Aggregator:
+        """Aggregator without metrics."""
+
+        async def update(self):
+            """Return an empty update, then fail."""
+            return statuses.pop(0), {}
+
+    class _Feed:
+        """Feed without metrics."""
+
+        async def update(self):
+            """Return fixed entries."""
+            return (
+                "OK",
+                {
+                    "a": FeedEntry(
+                        (-31.0, 151.0),
+                        {
+                            "mode_s": "a",
+                            "latitude": -32.0,
+                            "longitude": 151.0,
+                            "altitude": 1000,
+                            "callsign": None,
+                        },
+                    )
+                },
+            )
+
+    class _FeedAggregator(FeedAggregator):
+        """Aggregator of a feed without metrics."""
+
+        @property
+        def feed(self):
+            """Return the feed."""
+            return self._feed
+
+    async def _callback(external_id):
+        """Record entity changes."""
+        external_ids.append(external_id)
+
+    feed_manager = FeedManagerBase(
+        _Aggregator(), _callback, _callback, _callback, coalesce_updates=True
+    )
+    await feed_manager.update(None)
+    await feed_manager.update(None)
+
+    feed_aggregator = _FeedAggregator()
+    feed_aggregator._feed = _Feed()
+    assert feed_aggregator.metrics is None
+    feed_manager = FeedManagerBase(feed_aggregator, _callback, _callback, _callback)
+    await feed_manager.update(None)
+    await feed_manager.update(None)
+    assert external_ids == ["a", "a"]
+
+
+@pytest.mark.asyncio
+async def test_http_server(event_loop):
+    """Test serving the metrics over HTTP."""
+    registry = MetricsRegistry()
+    registry.counter("test_requests", "Requests.").labels().inc()
+    runner = await start_http_server(registry, port=0)
+    try:
+        port = runner.addresses[0][1]
+        async with aiohttp.ClientSession(loop=event_loop) as websession:
+            async with websession.get(
+                "http://127.0.0.1:{}/metrics".format(port)
+            ) as response:
+                assert response.status == 200
+                assert response.headers["Content-Type"].startswith("text/plain")
+                assert "test_requests_total 1" in await response.text()
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,187 @@
+"""Test for the state persistence."""
+import datetime
+
+import aiohttp
+import pytest
+
+from flightradar_client.fr24feed_flights import FlightradarFlightsFeedManager
+from flightradar_client.persistence import StatePersistence, _encode_record
+from tests.utils import load_fixture
+
+HOME_COORDINATES = (-31.0, 151.0)
+
+
+def _add_response(aresponses, fixture):
+    """Respond to the next request with the fixture."""
+    aresponses.add(
+        "localhost:8754",
+        "/flights.json",
+        "get",
+        aresponses.Response(
+            text=load_fixture(fixture),
+            content_type="application/json",
+            status=200,
+        ),
+        match_querystring=True,
+    )
+
+
+class _Callbacks:
+    """Records the external ids passed to the manager callbacks."""
+
+    def __init__(self):
+        self.generated = []
+        self.updated = []
+        self.removed = []
+
+    async def generate(self, external_id):
+        self.generated.append(external_id)
+
+    async def update(self, external_id):
+        self.updated.append(external_id)
+
+    async def remove(self, external_id):
+        self.removed.append(external_id)
+
+
+def _manager(websession, callbacks):
+    """Create a feed manager."""
+    return FlightradarFlightsFeedManager(
+        callbacks.generate,
+        callbacks.update,
+        callbacks.remove,
+        HOME_COORDINATES,
+        websession,
+        persistent_timestamp=True,
+    )
+
+
+def _state(manager):
+    """Return the persisted parts of the manager and aggregator state."""
+    aggregator = manager._feed
+    return (
+        list(aggregator.callsigns.items()),
+        list(aggregator.coordinates.items()),
+        [
+            (key, data.retrievals, data.total)
+            for key, data in aggregator.statistics.entries.items()
+        ],
+        set(manager.managed_external_ids),
+        manager.last_timestamp,
+    )
+
+
+@pytest.mark.asyncio
+async def test_warm_restart(aresponses, event_loop, tmp_path):
+    """Test that a restarted manager continues without regenerating."""
+    path = str(tmp_path / "state.json")
+    for fixture in ("fr24feed-flights-1.json", "fr24feed-flights-2.json"):
+        _add_response(aresponses, fixture)
+    _add_response(aresponses, "fr24feed-flights-3.json")
+
+    async with aiohttp.ClientSession(loop=event_loop) as websession:
+        callbacks = _Callbacks()
+        manager = _manager(websession, callbacks)
+        persistence = StatePersistence(path, manager._feed, manager, fsync=False)
+        assert not persistence.restore()
+        manager.add_listener(persistence.update)
+        await manager.update(None)
+        await manager.update(None)
+        assert persistence.sequence == 2
+        assert manager.last_timestamp == datetime.datetime(
+            2018, 10, 26, 7, 39, 51, tzinfo=datetime.timezone.utc
+        )
+        expected = _state(manager)
+
+        # Restart from the journal only.
+        restarted_callbacks = _Callbacks()
+        restarted = _manager(websession, restarted_callbacks)
+        persistence = StatePersistence(path, restarted._feed, restarted, fsync=False)
+        assert repr(persistence).endswith("sequence=0)>")
+        assert persistence.restore()
+        assert _state(restarted) == expected
+        restarted.add_listener(persistence.update)
+        await restarted.update(None)
+        # Same callbacks as without restart.
+        assert len(restarted_callbacks.generated) == 1
+        assert len(restarted_callbacks.updated) == 4
+        assert len(restarted_callbacks.removed) == 1
+        await persistence.close()
+        expected = _state(restarted)
+
+        # Restart from the snapshot.
+        restarted = _manager(websession, _Callbacks())
+        persistence = StatePersistence(path, restarted._feed, restarted)
+        assert persistence.restore()
+        assert _state(restarted) == expected
+        assert (tmp_path / "state.json.journal").read_bytes() == b""
+
+
+@pytest.mark.asyncio
+async def test_crash_recovery(aresponses, event_loop, tmp_path):
+    """Test restoring after crashes while writing."""
+    path = str(tmp_path / "state.json")
+    journal_path = tmp_path / "state.json.journal"
+    for fixture in ("fr24feed-flights-1.json", "fr24feed-flights-3.json"):
+        _add_response(aresponses, fixture)
+
+    async with aiohttp.ClientSession(loop=event_loop) as websession:
+        manager = _manager(websession, _Callbacks())
+        persistence = StatePersistence(
+            path, manager._feed, manager, snapshot_interval=datetime.timedelta(0)
+        )
+        # Every update writes a snapshot.
+        manager.add_listener(persistence.update)
+        await manager.update(None)
+        await manager.update(None)
+        assert persistence.sequence == 2
+        assert journal_path.read_bytes() == b""
+        expected = _state(manager)
+        assert "7C1469" in expected[3]
+
+        # Crash after the snapshot was replaced, before the journal was emptied.
+        journal_path.write_bytes(_encode_record(2, {"removed": ["7C1469"]}))
+        restarted = _manager(websession, _Callbacks())
+        assert StatePersistence(path, restarted._feed, restarted).restore()
+        assert _state(restarted) == expected
+
+        # Crash while appending to the journal.
+        journal_path.write_bytes(
+            _encode_record(3, {"added": ["7C0001"]})
+            + _encode_record(4, {"removed": ["7C1469"]})[:-5]
+        )
+        restarted = _manager(websession, _Callbacks())
+        persistence = StatePersistence(path, restarted._feed, restarted)
+        assert persistence.restore()
+        assert persistence.sequence == 3
+        assert restarted.managed_external_ids == expected[3] | {"7C0001"}
+
+
+@pytest.mark.asyncio
+async def test_update_without_restore(aresponses, event_loop, tmp_path):
+    """Test replacing the state on disk if it was not restored."""
+    path = str(tmp_path / "state.json")
+    journal_path = tmp_path / "state.json.journal"
+    for fixture in ("fr24feed-flights-1.json", "fr24feed-flights-3.json"):
+        _add_response(aresponses, fixture)
+    journal_path.write_bytes(
+        _encode_record(7, {"added": ["7C0001"]})
+        + _encode_record(8, {"added": ["7C0002"]})
+    )
+
+    async with aiohttp.ClientSession(loop=event_loop) as websession:
+        manager = _manager(websession, _Callbacks())
+        persistence = StatePersistence(path, manager._feed, manager)
+        manager.add_listener(persistence.update)
+        await manager.update(None)
+        # The first write continues after the records on disk and
+        # replaces them with a snapshot.
+        assert persistence.sequence == 9
+        assert journal_path.read_bytes() == b""
+        await manager.update(None)
+        assert persistence.sequence == 10
+        expected = _state(manager)
+
+        restarted = _manager(websession, _Callbacks())
+        assert StatePersistence(path, restarted._feed, restarted).restore()
+        assert _state(restarted) == expected
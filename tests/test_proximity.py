@@ -0,0 +1,128 @@
+"""Test for the proximity detection."""
+import datetime
+
+import pytest
+
+from flightradar_client.feed_entry import FeedEntry
+from flightradar_client.proximity import ProximityDetector
+
+
+def _entry(mode_s, latitude, longitude, altitude, track=None, speed=None):
+    """Create a feed entry."""
+    return FeedEntry(
+        (-33.5, 151.0),
+        {
+            "mode_s": mode_s,
+            "latitude": latitude,
+            "longitude": longitude,
+            "altitude": altitude,
+            "track": track,
+            "speed": speed,
+        },
+    )
+
+
+def _entries(*entries):
+    """Key the provided entries by external id."""
+    return {entry.external_id: entry for entry in entries}
+
+
+def test_detect():
+    """Test detecting aircrafts in proximity."""
+    detector = ProximityDetector(5.0, 1000)
+    assert (
+        repr(detector) == "<ProximityDetector(horizontal=5.0, vertical=1000, "
+        "look_ahead=None)>"
+    )
+    alerts = detector.detect(
+        _entries(
+            # Approaching each other head on.
+            _entry("b", -33.50, 151.00, 10000, 90, 400),
+            _entry("a", -33.50, 151.03, 10500, 270, 400),
+            # Close, but vertically separated.
+            _entry("c", -33.51, 151.01, 15000),
+            # Far away.
+            _entry("d", -34.50, 151.00, 10000),
+            _entry("e", None, None, 10000),
+            _entry("f", -33.50, 151.00, None),
+        )
+    )
+    assert len(alerts) == 1
+    alert = alerts[0]
+    assert alert.external_ids == ("a", "b")
+    assert alert.distance == pytest.approx(2.78, 0.01)
+    assert alert.vertical_separation == 500
+    assert alert.closing_rate == pytest.approx(800, 0.01)
+    assert not alert.projected
+    assert (
+        repr(alert) == "<ProximityAlert(ids=('a', 'b'), distance=2.78, vertical=500)>"
+    )
+
+    assert detector.detect(None) == []
+
+
+def test_detect_neighbouring_cells():
+    """Test detecting aircrafts across grid cell borders."""
+    detector = ProximityDetector(1.0, 500)
+    alerts = detector.detect(
+        _entries(
+            _entry("a", -0.0001, 0.0001, 999, 0, 100),
+            _entry("b", 0.0001, -0.0001, 1001, 0, 100),
+        )
+    )
+    assert len(alerts) == 1
+    # Same velocity, not closing in.
+    assert alerts[0].closing_rate == pytest.approx(0)
+
+
+@pytest.mark.asyncio
+async def test_look_ahead():
+    """Test detecting aircrafts in proximity after look-ahead."""
+    reported = []
+
+    async def _alert(alert):
+        """Record alert."""
+        reported.append(alert)
+
+    detector = ProximityDetector(
+        5.0, 1000, look_ahead=datetime.timedelta(seconds=30), alert_callback=_alert
+    )
+    entries = _entries(
+        _entry("a", -33.50, 151.00, 10000, 90, 400),
+        _entry("b", -33.50, 151.15, 10000, 270, 400),
+        _entry("c", -33.50, 152.00, 10000),
+    )
+    await detector.update(entries)
+    assert len(reported) == 1
+    assert reported[0].external_ids == ("a", "b")
+    assert reported[0].projected
+    assert reported[0].closing_rate == pytest.approx(800, 0.01)
+    assert detector.alerts == reported
+
+    # Without look-ahead the aircrafts are too far apart.
+    assert ProximityDetector(5.0, 1000).detect(entries) == []
+
+
+def test_look_ahead_closest_approach():
+    """Test detecting aircrafts passing each other within the look-ahead.
+
+    At the end of the look-ahead time both aircrafts are far apart again.
+    """
+    detector = ProximityDetector(5.0, 1000, look_ahead=datetime.timedelta(seconds=120))
+    entries = _entries(
+        _entry("a", -33.50, 151.00, 10000, 90, 400),
+        _entry("b", -33.52, 151.15, 10000, 270, 400),
+    )
+    alerts = detector.detect(entries)
+    assert len(alerts) == 1
+    assert alerts[0].external_ids == ("a", "b")
+    assert alerts[0].projected
+    assert alerts[0].distance == pytest.approx(2.2, 0.05)
+    assert alerts[0].closing_rate == pytest.approx(0, abs=5)
+
+    # Moving apart, so never closer than now.
+    entries = _entries(
+        _entry("a", -33.50, 151.00, 10000, 270, 400),
+        _entry("b", -33.52, 151.15, 10000, 90, 400),
+    )
+    assert detector.detect(entries) == []
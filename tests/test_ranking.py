@@ -0,0 +1,117 @@
+"""Test for the top-K ranking."""
+import random
+
+import pytest
+
+from flightradar_client.feed_entry import FeedEntry
+from flightradar_client.ranking import (
+    TopKView,
+    by_altitude,
+    by_distance,
+    by_time_to_closest_approach,
+)
+
+HOME_COORDINATES = (-33.86, 151.21)
+
+
+def _entry(mode_s, latitude, longitude, altitude=10000, speed=300, track=0):
+    """Create a feed entry."""
+    return FeedEntry(
+        HOME_COORDINATES,
+        {
+            "mode_s": mode_s,
+            "latitude": latitude,
+            "longitude": longitude,
+            "altitude": altitude,
+            "speed": speed,
+            "track": track,
+        },
+    )
+
+
+def test_keys():
+    """Test the ranking keys."""
+    south = _entry("a", -34.86, 151.21, track=0)
+    assert by_distance(south) == pytest.approx(111.2, abs=0.1)
+    assert by_distance(_entry("b", 0.0, 0.0)) is None
+    assert by_altitude(_entry("c", -34.0, 151.0, "ground")) == 0
+    # Flying north towards home at 300 knots.
+    assert by_time_to_closest_approach(south) == pytest.approx(720.6, abs=1)
+    # Flying away from home.
+    assert by_time_to_closest_approach(_entry("d", -34.86, 151.21, track=180)) is None
+    assert by_time_to_closest_approach(_entry("e", -34.86, 151.21, speed=0)) is None
+
+
+@pytest.mark.asyncio
+async def test_top_k_view():
+    """Test that the view matches a full sort after every update."""
+    rng = random.Random(1)
+    view = TopKView(5)
+    assert view.entries == []
+    aircrafts = {
+        "{:06X}".format(index): (
+            HOME_COORDINATES[0] + rng.uniform(-2, 2),
+            HOME_COORDINATES[1] + rng.uniform(-2, 2),
+        )
+        for index in range(200)
+    }
+    for _ in range(20):
+        # Move some aircrafts, remove and add others.
+        for external_id in rng.sample(sorted(aircrafts), 20):
+            latitude, longitude = aircrafts[external_id]
+            aircrafts[external_id] = (
+                latitude + rng.uniform(-0.5, 0.5),
+                longitude + rng.uniform(-0.5, 0.5),
+            )
+        for external_id in rng.sample(sorted(aircrafts), 5):
+            del aircrafts[external_id]
+        for _ in range(5):
+            aircrafts["{:06X}".format(rng.randrange(200, 10000))] = (0.0, 0.0)
+        feed_entries = {
+            external_id: _entry(external_id, *coordinates)
+            for external_id, coordinates in aircrafts.items()
+        }
+        await view.update(feed_entries)
+        expected = sorted(
+            (entry for entry in feed_entries.values() if by_distance(entry)),
+            key=by_distance,
+        )[:5]
+        assert view.entries == expected
+        assert view.external_ids == [entry.external_id for entry in expected]
+        # Outdated heap items are discarded over time.
+        assert len(view._heap) <= 2 * len(view._ranked) + 5
+    assert repr(view) == "<TopKView(size=5, key=by_distance, ranked={})>".format(
+        sum(1 for entry in feed_entries.values() if by_distance(entry))
+    )
+
+    await view.update(None)
+    assert view.entries == []
+
+
+@pytest.mark.asyncio
+async def test_top_k_view_reused_entries():
+    """Test that unchanged entries are not ranked again."""
+    calls = []
+
+    def _key(entry):
+        calls.append(entry.external_id)
+        return entry.altitude
+
+    view = TopKView(2, _key)
+    entries = {
+        "a": _entry("a", -33.0, 151.0, 30000),
+        "b": _entry("b", -33.0, 151.0, 20000),
+        "c": _entry("c", -33.0, 151.0, 10000),
+    }
+    await view.update(entries)
+    assert view.external_ids == ["c", "b"]
+    calls.clear()
+    data = dict(entries["a"].data, altitude=5000)
+    entries["a"].update_data(data)
+    await view.update(entries)
+    assert calls == ["a"]
+    assert view.external_ids == ["a", "c"]
+    # Back to the previous key.
+    entries["a"].update_data(dict(data, altitude=30000))
+    await view.update(entries)
+    assert view.external_ids == ["c", "b"]
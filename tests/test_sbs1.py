@@ -0,0 +1,82 @@
+"""Test for the SBS-1 message parser."""
+import datetime
+
+from flightradar_client.feed_entry import FeedEntry
+from flightradar_client.sbs1 import SBS1Parser
+from flightradar_client.utils import InternTable
+from tests.utils import load_fixture
+
+
+def test_parse():
+    """Test parsing messages into snapshots."""
+    parser = SBS1Parser()
+    assert repr(parser) == "<SBS1Parser(interval=1.0)>"
+    snapshots = list(parser.parse(load_fixture("sbs1-messages.txt").splitlines()))
+    assert len(snapshots) == 3
+
+    entries = {data["mode_s"]: FeedEntry((-31.0, 151.0), data) for data in snapshots[0]}
+    assert len(entries) == 3
+    feed_entry = entries["7C6DBB"]
+    assert feed_entry.coordinates == (-33.80535, 151.6186)
+    assert feed_entry.altitude == 19375
+    assert feed_entry.callsign == "VOZ123"
+    assert feed_entry.speed == 433
+    assert feed_entry.track == 16
+    assert feed_entry.vert_rate == 2304
+    assert feed_entry.updated == datetime.datetime(
+        2018, 10, 26, 19, 17, 38, 313000, tzinfo=datetime.timezone.utc
+    )
+    assert entries["7C4878"].squawk == "1062"
+    assert entries["7C52FC"].altitude == 0
+
+    # Values are carried over from previous messages.
+    entries = {data["mode_s"]: FeedEntry((-31.0, 151.0), data) for data in snapshots[1]}
+    assert len(entries) == 2
+    assert entries["7C6DBB"].coordinates == (-33.8, 151.62)
+    assert entries["7C6DBB"].callsign == "VOZ123"
+    assert entries["7C4878"].altitude == 3100
+    assert entries["7C4878"].squawk == "1062"
+
+    assert [data["mode_s"] for data in snapshots[2]] == ["7C6DBB"]
+
+
+def test_parse_invalid_lines():
+    """Test ignoring messages that cannot be parsed."""
+    parser = SBS1Parser()
+    assert parser.parse_line("") is None
+    assert parser.parse_line("MSG,3,111,11111,7C6DBB") is None
+    assert (
+        parser.parse_line(
+            "MSG,3,111,11111,,111111,2018/10/26,19:17:38.308,"
+            "2018/10/26,19:17:38.375,,19375,,,-33.80535,151.61860,,,,,,0"
+        )
+        is None
+    )
+    assert (
+        parser.parse_line(
+            "MSG,3,111,11111,7C6DBB,111111,invalid,19:17:38.308,"
+            "2018/10/26,19:17:38.375,,19375,,,-33.80535,151.61860,,,,,,0"
+        )
+        is None
+    )
+    assert (
+        parser.parse_line(
+            "MSG,3,111,11111,7C6DBB,111111,2018/10/26,19:17:38.308,"
+            "2018/10/26,19:17:38.375,,invalid,,,-33.80535,151.61860,,,,,,0"
+        )
+        is None
+    )
+    snapshot = parser.flush()
+    assert len(snapshot) == 1
+    assert snapshot[0]["altitude"] is None
+    assert snapshot[0]["latitude"] == -33.80535
+
+
+def test_parse_intern_table():
+    """Test interning identifiers through the table of the parser."""
+    intern_table = InternTable.for_aircrafts(10)
+    parser = SBS1Parser(intern_table=intern_table)
+    snapshots = list(parser.parse(load_fixture("sbs1-messages.txt").splitlines()))
+    data = next(data for data in snapshots[0] if data["mode_s"] == "7C6DBB")
+    assert data["mode_s"] is intern_table.intern("".join(["7C6", "DBB"]))
+    assert data["callsign"] is intern_table.intern("".join(["VOZ", "123"]))
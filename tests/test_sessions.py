@@ -0,0 +1,126 @@
+"""Test for the flight session tracker."""
+import datetime
+
+import pytest
+
+from flightradar_client.feed_entry import FeedEntry
+from flightradar_client.feed_manager import FeedManagerBase
+from flightradar_client.sessions import SessionTracker
+
+HOME_COORDINATES = (-31.0, 151.0)
+START = datetime.datetime(2018, 10, 26, 7, 35, tzinfo=datetime.timezone.utc)
+
+
+def _entry(mode_s, latitude, longitude, altitude, callsign=None):
+    """Create a feed entry."""
+    return FeedEntry(
+        HOME_COORDINATES,
+        {
+            "mode_s": mode_s,
+            "latitude": latitude,
+            "longitude": longitude,
+            "altitude": altitude,
+            "callsign": callsign,
+        },
+    )
+
+
+@pytest.mark.asyncio
+async def test_sessions():
+    """Test opening, updating and closing sessions."""
+    sink = []
+
+    async def _sink(session):
+        """Record closed session."""
+        sink.append(session)
+
+    tracker = SessionTracker(datetime.timedelta(seconds=60), sink=_sink)
+    assert repr(tracker) == "<SessionTracker(open=0, closed=0)>"
+
+    await tracker.update(
+        {
+            "a": _entry("a", -32.0, 151.0, 10000, "QFA1  "),
+            "b": _entry("b", -33.0, 151.0, 5000),
+        },
+        START,
+    )
+    await tracker.update(
+        {
+            "a": _entry("a", -31.5, 151.0, 8000, "QFA1"),
+            "b": _entry("b", 0, 0, 4000, "JST2"),
+        },
+        START + datetime.timedelta(seconds=30),
+    )
+    await tracker.update(
+        {"b": _entry("b", -33.5, 151.0, 3000)},
+        START + datetime.timedelta(seconds=60),
+    )
+    assert len(tracker.open_sessions) == 2
+
+    session = tracker.get("a")
+    assert session.entry_time == START
+    assert session.exit_time == START + datetime.timedelta(seconds=30)
+    assert session.duration == datetime.timedelta(seconds=30)
+    assert session.closest_distance == pytest.approx(55.6, 0.1)
+    assert session.closest_coordinates == (-31.5, 151.0)
+    assert session.min_altitude == 8000
+    assert session.max_altitude == 10000
+    assert session.callsigns == {"QFA1"}
+    assert session.samples == 2
+
+    # Aircraft "a" has not been seen for 60 seconds.
+    await tracker.update({}, START + datetime.timedelta(seconds=90))
+    assert tracker.get("a") is None
+    assert sink == [session]
+    assert tracker.closed_sessions() == [session]
+    assert repr(tracker) == "<SessionTracker(open=1, closed=1)>"
+
+    session = tracker.get("b")
+    assert session.closest_distance == pytest.approx(222.4, 0.1)
+    assert session.callsigns == {"JST2"}
+    assert session.samples == 3
+
+    await tracker.close_all()
+    assert tracker.open_sessions == {}
+    assert tracker.closed_sessions(clear=True) == sink
+    assert tracker.closed_sessions() == []
+
+
+@pytest.mark.asyncio
+async def test_closed_sessions_bounded():
+    """Test that only the most recently closed sessions are kept."""
+    tracker = SessionTracker(datetime.timedelta(seconds=1), closed_sessions_size=2)
+    for index in range(5):
+        await tracker.update(
+            {str(index): _entry(str(index), -32.0, 151.0, 1000)},
+            START + datetime.timedelta(seconds=index * 10),
+        )
+    assert [session.external_id for session in tracker.closed_sessions()] == [
+        "2",
+        "3",
+    ]
+    assert repr(tracker.get("4")).startswith("<FlightSession(id=4, entry=")
+
+
+@pytest.mark.asyncio
+async def test_feed_manager_listener():
+    """Test using the session tracker as feed manager listener."""
+
+    class _Aggregator:
+        """Aggregator returning fixed entries."""
+
+        async def update(self):
+            """Return fixed entries."""
+            return "OK", {"a": _entry("a", -32.0, 151.0, 1000)}
+
+    async def _callback(external_id):
+        """Ignore entity changes."""
+
+    tracker = SessionTracker()
+    feed_manager = FeedManagerBase(_Aggregator(), _callback, _callback, _callback)
+    feed_manager.add_listener(tracker.update)
+    await feed_manager.update(None)
+    assert tracker.get("a").samples == 1
+    feed_manager.remove_listener(tracker.update)
+    await feed_manager.update(None)
+    assert tracker.get("a").samples == 1
@@ -0,0 +1,130 @@
+"""Test for the track simplification."""
+import datetime
+
+import pytest
+
+from flightradar_client.feed_entry import FeedEntry
+from flightradar_client.simplification import (
+    TrackPoint,
+    TrackSimplifier,
+    altitude_deviation,
+    synchronized_distance,
+)
+
+
+def _entry(mode_s, timestamp, latitude, longitude, altitude=10000):
+    """Create a feed entry."""
+    return FeedEntry(
+        (-31.0, 151.0),
+        {
+            "mode_s": mode_s,
+            "latitude": latitude,
+            "longitude": longitude,
+            "altitude": altitude,
+            "track": None,
+            "speed": None,
+            "vert_rate": None,
+            "squawk": None,
+            "callsign": "QFA1 ",
+            "updated": timestamp,
+        },
+    )
+
+
+def test_synchronized_distance():
+    """Test the distance to the interpolated position."""
+    start = TrackPoint(0, -33.0, 151.0, 1000)
+    end = TrackPoint(10, -33.0, 151.1, 2000)
+    assert synchronized_distance(
+        TrackPoint(5, -33.0, 151.05, 1500), start, end
+    ) == pytest.approx(0.0)
+    # On the segment, but not where it should be at that time.
+    assert synchronized_distance(
+        TrackPoint(5, -33.0, 151.0, 1500), start, end
+    ) == pytest.approx(4664, rel=0.01)
+    assert altitude_deviation(TrackPoint(5, -33.0, 151.0, 1400), start, end) == 100
+    assert altitude_deviation(TrackPoint(5, -33.0, 151.0, None), start, end) == 0
+
+
+@pytest.mark.asyncio
+async def test_straight_track():
+    """Test keeping only the ends of a straight track."""
+    kept_entries = []
+
+    async def sink(entries):
+        kept_entries.append(entries)
+
+    simplifier = TrackSimplifier(sink=sink)
+    assert repr(simplifier) == "<TrackSimplifier(tolerance=50.0, tracks=0)>"
+    assert simplifier.ratio is None
+    for second in range(60):
+        kept = await simplifier.update(
+            {"7C1469": _entry("7C1469", 1000 + second, -33.0, 151.0 + second * 0.002)}
+        )
+        assert list(kept) == (["7C1469"] if second == 0 else [])
+        # Repeated polls without a new position are ignored.
+        await simplifier.update(
+            {"7C1469": _entry("7C1469", 1000 + second, -33.0, 151.0 + second * 0.002)}
+        )
+    kept = await simplifier.flush()
+    assert kept["7C1469"].coordinates == (-33.0, 151.0 + 59 * 0.002)
+    assert kept["7C1469"].callsign == "QFA1"
+    assert kept["7C1469"].updated.timestamp() == 1059
+    assert simplifier.received == 60
+    assert simplifier.kept == 2
+    assert simplifier.ratio == 30
+    assert len(kept_entries) == 2
+
+
+@pytest.mark.asyncio
+async def test_turn_and_climb():
+    """Test keeping the positions where the track changes."""
+    simplifier = TrackSimplifier(tolerance=50.0, altitude_tolerance=100)
+    kept = []
+    positions = [(-33.0, 151.0 + i * 0.002, 10000) for i in range(10)]
+    # Turn south.
+    positions += [(-33.0 - i * 0.002, 151.018, 10000) for i in range(1, 10)]
+    # Climb.
+    positions += [(-33.018 - i * 0.002, 151.018, 10000 + i * 500) for i in range(1, 5)]
+    for second, (latitude, longitude, altitude) in enumerate(positions):
+        result = await simplifier.update(
+            {"a": _entry("a", 1000 + second, latitude, longitude, altitude)}
+        )
+        kept += [entry.coordinates for entry in result.values()]
+    # Aircraft left the feed, its last position ends the track.
+    result = await simplifier.update({})
+    kept += [entry.coordinates for entry in result.values()]
+    assert kept == [
+        (-33.0, 151.0),
+        (-33.0, 151.018),
+        (-33.018, 151.018),
+        positions[-1][:2],
+    ]
+    assert repr(simplifier) == "<TrackSimplifier(tolerance=50.0, tracks=0)>"
+
+
+@pytest.mark.asyncio
+async def test_bounded_window():
+    """Test keeping positions at least every interval and window size."""
+    simplifier = TrackSimplifier(
+        max_interval=datetime.timedelta(seconds=10), max_window=100
+    )
+    kept = 0
+    for second in range(0, 31):
+        result = await simplifier.update(
+            {"a": _entry("a", 1000 + second, -33.0, 151.0)}
+        )
+        kept += len(result)
+    assert kept == 3
+
+    simplifier = TrackSimplifier(max_window=5)
+    kept = 0
+    for second in range(0, 13):
+        result = await simplifier.update(
+            {
+                "a": _entry("a", 1000 + second, -33.0, 151.0),
+                "b": _entry("b", None, 0, 0),
+            }
+        )
+        kept += len(result)
+    assert kept == 3
@@ -0,0 +1,163 @@
+"""Test for the receiver simulator."""
+import asyncio
+
+import aiohttp
+import pytest
+
+from flightradar_client.consts import UPDATE_OK
+from flightradar_client.dump1090_aircrafts import (
+    Dump1090AircraftsFeed,
+    parse_aircrafts,
+)
+from flightradar_client.fr24feed_flights import FlightradarFlightsFeed, parse_flights
+from flightradar_client.sbs1 import SBS1Parser
+from flightradar_client.simulator import (
+    ReceiverSimulator,
+    TrafficModel,
+    dump1090_json,
+    fr24_json,
+    sbs1_messages,
+)
+
+HOME_COORDINATES = (-33.86, 151.21)
+
+
+def _model(**kwargs):
+    """Create a reproducible traffic model."""
+    return TrafficModel(
+        home_coordinates=HOME_COORDINATES, seed=42, start=1540539351.0, **kwargs
+    )
+
+
+def test_traffic_model():
+    """Test the synthetic traffic."""
+    model = _model(aircraft_count=200, dropouts=0.0, missing_fields=0.0)
+    assert repr(model).startswith("<TrafficModel(aircrafts=200")
+    snapshot = model.snapshot()
+    assert len(snapshot) == 200
+    assert len({data["mode_s"] for data in snapshot}) == 200
+    assert any(data["altitude"] == "ground" for data in snapshot)
+    assert all(data["callsign"] is not None for data in snapshot)
+    positions = {data["mode_s"]: data["latitude"] for data in snapshot}
+    model.step(10.0)
+    assert model.now == 1540539361.0
+    moved = [
+        data
+        for data in model.snapshot()
+        if data["latitude"] not in (0.0, positions[data["mode_s"]])
+    ]
+    assert len(moved) > 150
+    # Same seed, same traffic.
+    assert (
+        _model(aircraft_count=200).snapshot() == _model(aircraft_count=200).snapshot()
+    )
+
+
+def test_traffic_model_imperfections():
+    """Test missing fields, invalid coordinates, ground and dropouts."""
+    model = _model(aircraft_count=100, invalid_coordinates=1.0, on_ground=1.0)
+    snapshot = model.snapshot()
+    assert all(data["latitude"] == 0.0 for data in snapshot)
+    assert all(data["altitude"] == "ground" for data in snapshot)
+    assert not _model(aircraft_count=100, dropouts=1.0).snapshot()
+    snapshot = _model(aircraft_count=100, missing_fields=1.0).snapshot()
+    assert all(data["callsign"] is None and data["squawk"] is None for data in snapshot)
+    assert all(data["latitude"] in (None, 0.0) for data in snapshot)
+
+
+def test_formats():
+    """Test that all formats parse into the same aircraft data."""
+    model = _model(aircraft_count=50, missing_fields=0.0, invalid_coordinates=0.0)
+    snapshot = {data["mode_s"]: data for data in model.snapshot()}
+
+    parsed = parse_aircrafts(dump1090_json(list(snapshot.values()), model.now))
+    assert len(parsed) == len(snapshot)
+    for data in parsed:
+        expected = snapshot[data["mode_s"].upper()]
+        assert data["latitude"] == expected["latitude"]
+        assert data["altitude"] == expected["altitude"]
+        assert data["callsign"].strip() == expected["callsign"]
+        assert data["updated"] == model.now
+
+    parsed = parse_flights(fr24_json(list(snapshot.values())))
+    assert {data["mode_s"] for data in parsed} == set(snapshot)
+    for data in parsed:
+        expected = snapshot[data["mode_s"]]
+        assert data["longitude"] == expected["longitude"]
+        assert data["squawk"] == expected["squawk"]
+
+    parser = SBS1Parser()
+    for line in sbs1_messages(list(snapshot.values())):
+        assert parser.parse_line(line) is None
+    parsed = parser.flush()
+    assert len(parsed) == len(snapshot)
+    for data in parsed:
+        expected = snapshot[data["mode_s"]]
+        assert data["latitude"] == expected["latitude"]
+        assert data["altitude"] == expected["altitude"]
+        assert data["track"] == expected["track"]
+        assert data["squawk"] == expected["squawk"]
+        assert data["callsign"] == expected["callsign"]
+        assert data["updated"] == model.now
+
+
+@pytest.mark.asyncio
+async def test_simulator(event_loop):
+    """Test serving the simulated traffic."""
+    model = _model(
+        aircraft_count=20,
+        dropouts=0.0,
+        missing_fields=0.0,
+        invalid_coordinates=0.0,
+        on_ground=0.0,
+    )
+    simulator = ReceiverSimulator(model, http_port=0, sbs1_port=0, interval=3600)
+    assert simulator.http_port is None
+    await simulator.start()
+    try:
+        assert simulator.http_port
+        assert simulator.sbs1_port
+        async with aiohttp.ClientSession(loop=event_loop) as websession:
+            feed = Dump1090AircraftsFeed(
+                HOME_COORDINATES, websession, url=simulator.dump1090_url
+            )
+            status, entries = await feed.update()
+            assert status == UPDATE_OK
+            assert len(entries) == 20
+            feed = FlightradarFlightsFeed(
+                HOME_COORDINATES, websession, url=simulator.fr24_url
+            )
+            status, entries = await feed.update()
+            assert status == UPDATE_OK
+            assert len(entries) == 20
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", simulator.sbs1_port)
+        # Wait for the client to be registered.
+        while not simulator._clients:
+            await asyncio.sleep(0.01)
+        await simulator.tick()
+        parser = SBS1Parser()
+        # Callsign, position, velocity and squawk messages per aircraft.
+        for _ in range(4 * 20):
+            line = await asyncio.wait_for(reader.readline(), 5)
+            parser.parse_line(line.decode("ascii"))
+        assert len(parser.flush()) == 20
+        writer.close()
+
+        # Clients falling behind are disconnected instead of waited for.
+        previous = set(simulator._clients)
+        reader, writer = await asyncio.open_connection("127.0.0.1", simulator.sbs1_port)
+        while not simulator._clients - previous:
+            await asyncio.sleep(0.01)
+        (client,) = simulator._clients - previous
+        simulator._high_water_mark = 0
+        client.transport.get_write_buffer_size = lambda: 1
+        await simulator.tick()
+        assert client not in simulator._clients
+        # The connection has been closed.
+        await asyncio.wait_for(reader.read(), 5)
+        assert reader.at_eof()
+        writer.close()
+    finally:
+        await simulator.stop()
+    assert simulator.sbs1_port is None
@@ -0,0 +1,157 @@
+"""Test for the position smoothing."""
+import math
+import random
+
+import aiohttp
+import pytest
+
+from flightradar_client.consts import UPDATE_OK
+from flightradar_client.feed_entry import FeedEntry
+from flightradar_client.fr24feed_flights import FlightradarFlightsFeedAggregator
+from flightradar_client.proximity import KM_PER_DEGREE, KNOTS_TO_KM_PER_SECOND
+from flightradar_client.smoothing import PositionSmoother
+from tests.utils import load_fixture
+
+HOME_COORDINATES = (-31.0, 151.0)
+
+
+def _entry(mode_s, latitude, longitude, speed=None, track=None):
+    """Create a feed entry."""
+    return FeedEntry(
+        HOME_COORDINATES,
+        {
+            "mode_s": mode_s,
+            "latitude": latitude,
+            "longitude": longitude,
+            "speed": speed,
+            "track": track,
+        },
+    )
+
+
+def test_smoothing():
+    """Test smoothing jittering positions of an aircraft flying north."""
+    rng = random.Random(1)
+    smoother = PositionSmoother()
+    assert smoother.estimate("a") is None
+    # 300 knots north, reported with up to 0.5 km of noise.
+    step = 300 * KNOTS_TO_KM_PER_SECOND / KM_PER_DEGREE
+    raw_errors = []
+    smoothed_errors = []
+    for tick in range(60):
+        latitude = -33.0 + tick * step
+        noise = rng.uniform(-0.5, 0.5) / KM_PER_DEGREE
+        smoother.update({"a": _entry("a", latitude + noise, 151.0)}, now=float(tick))
+        if tick >= 30:
+            raw_errors.append(abs(noise))
+            smoothed_errors.append(abs(smoother.estimate("a").latitude - latitude))
+    assert sum(smoothed_errors) < sum(raw_errors)
+    estimate = smoother.estimate("a")
+    assert estimate.speed == pytest.approx(300, rel=0.15)
+    assert min(estimate.track, 360 - estimate.track) < 10
+    assert len(smoother) == 1
+    assert repr(smoother) == "<PositionSmoother(alpha=0.5, beta=0.2, aircrafts=1)>"
+
+    # Cached coordinates are not used, the position is predicted instead.
+    previous = estimate.latitude
+    smoother.update({"a": _entry("a", -40.0, 151.0)}, filled={"a"}, now=61.0)
+    assert smoother.estimate("a").latitude == pytest.approx(
+        previous + 2 * estimate.speed * KNOTS_TO_KM_PER_SECOND / KM_PER_DEGREE,
+        abs=1e-6,
+    )
+    # Positions far from the prediction restart the filter.
+    smoother.update({"a": _entry("a", -40.0, 151.0, 100, 90)}, now=62.0)
+    estimate = smoother.estimate("a")
+    assert (estimate.latitude, estimate.longitude) == (-40.0, 151.0)
+    assert estimate.speed == pytest.approx(100)
+    assert estimate.track == pytest.approx(90)
+
+    # Aircrafts no longer received are released, and slots reused.
+    smoother.update({"b": _entry("b", -33.0, 151.0)}, now=63.0)
+    assert smoother.estimate("a") is None
+    assert len(smoother._latitudes) == 1
+    smoother.update(None, now=64.0)
+    assert len(smoother) == 0
+
+
+def test_apply():
+    """Test writing estimates into the entries."""
+    smoother = PositionSmoother()
+    smoother.apply({"a": _entry("a", -33.0, 151.0)}, now=0.0)
+    entries = {"a": _entry("a", -33.01, 151.0)}
+    smoother.apply(entries, now=10.0)
+    entry = entries["a"]
+    assert entry.coordinates == pytest.approx((-33.005, 151.0))
+    # Moving south.
+    assert entry.track == 180
+    assert entry.speed == round(
+        0.2 * 0.01 * KM_PER_DEGREE / 10 / KNOTS_TO_KM_PER_SECOND
+    )
+    # Reported values are kept.
+    entries = {"a": _entry("a", -33.02, 151.0, 250, 175)}
+    smoother.apply(entries, now=20.0)
+    assert (entries["a"].speed, entries["a"].track) == (250, 175)
+    assert not math.isclose(entries["a"].coordinates[0], -33.02)
+    # The data received is kept apart from the estimates.
+    assert entries["a"].data["latitude"] == -33.02
+    assert entries["a"].update_data(dict(entries["a"].data)) is False
+
+
+@pytest.mark.asyncio
+async def test_feed_aggregator_smoother(aresponses, event_loop):
+    """Test that the aggregator returns smoothed positions."""
+    for fixture in ("fr24feed-flights-1.json", "fr24feed-flights-2.json"):
+        aresponses.add(
+            "localhost:8754",
+            "/flights.json",
+            "get",
+            aresponses.Response(
+                text=load_fixture(fixture),
+                content_type="application/json",
+                status=200,
+            ),
+            match_querystring=True,
+        )
+
+    async with aiohttp.ClientSession(loop=event_loop) as websession:
+        feed_aggregator = FlightradarFlightsFeedAggregator(HOME_COORDINATES, websession)
+        assert feed_aggregator.smoother is None
+        smoother = PositionSmoother()
+        feed_aggregator.smoother = smoother
+        for _ in range(2):
+            status, entries = await feed_aggregator.update()
+            assert status == UPDATE_OK
+            assert entries
+            for external_id, entry in entries.items():
+                estimate = smoother.estimate(external_id)
+                assert entry.coordinates == (estimate.latitude, estimate.longitude)
+
+
+@pytest.mark.asyncio
+async def test_feed_aggregator_smoother_reuse_entries(aresponses, event_loop):
+    """Test that smoothing does not change entries updated in place."""
+    for _ in range(2):
+        aresponses.add(
+            "localhost:8754",
+            "/flights.json",
+            "get",
+            aresponses.Response(
+                text=load_fixture("fr24feed-flights-1.json"),
+                content_type="application/json",
+                status=200,
+            ),
+            match_querystring=True,
+        )
+
+    async with aiohttp.ClientSession(loop=event_loop) as websession:
+        feed_aggregator = FlightradarFlightsFeedAggregator(
+            HOME_COORDINATES, websession, reuse_entries=True
+        )
+        feed_aggregator.smoother = PositionSmoother()
+        status, entries = await feed_aggregator.update()
+        versions = {key: entry.version for key, entry in entries.items()}
+        status, entries = await feed_aggregator.update()
+        assert status == UPDATE_OK
+        # Unchanged data keeps the version, despite the estimates.
+        assert {key: entry.version for key, entry in entries.items()} == versions
+        assert all(entry.estimates for entry in entries.values())
@@ -1,7 +1,7 @@
 """Test for the library utils."""
 import unittest
 
-from flightradar_client.utils import FixedSizeDict
+from flightradar_client.utils import FixedSizeDict, InternTable, intern_data
 
 
 class TestFixedSizeDict(unittest.TestCase):
@@ -18,3 +18,44 @@ class TestFixedSizeDict(unittest.TestCase):
         test_dict["key3"] = "value3"
         assert len(test_dict) == 2
         assert "key1" not in test_dict
+
+
+class TestInternTable(unittest.TestCase):
+    """Test the InternTable."""
+
+    def test_intern(self):
+        """Test that equal strings share one object."""
+        table = InternTable(max_size=2)
+        first = "".join(["7C", "6B28"])
+        second = "".join(["7C6", "B28"])
+        assert first is not second
+        assert table.intern(first) is first
+        assert table.intern(second) is first
+        assert table.intern(None) is None
+        assert len(table) == 1
+        assert repr(table) == "<InternTable(size=1)>"
+        other = table.intern("".join(["7C", "1469"]))
+        assert table.intern(second) is first
+        table.intern("7C5304")
+        assert len(table) == 2
+        # The least recently used string has been dropped.
+        assert table.intern(second) is first
+        assert table.intern("".join(["7C", "1469"])) is not other
+        assert repr(InternTable.for_aircrafts(10)) == "<InternTable(size=0)>"
+
+    def test_intern_data(self):
+        """Test interning the identifiers of aircraft data."""
+        table = InternTable()
+        callsign = "".join(["QLK", "231D "])
+        first = intern_data(
+            {"mode_s": "7C6B28", "callsign": "QLK231D ", "squawk": None}, table
+        )
+        second = intern_data(
+            {"mode_s": "7C6B28", "callsign": callsign, "altitude": 1000}, table
+        )
+        # Callsigns are only interned once stripped.
+        assert second["callsign"] is callsign
+        assert len(table) == 1
+        assert second["mode_s"] is first["mode_s"]
+        assert second["altitude"] == 1000
+        assert first["squawk"] is None
@@ -0,0 +1,108 @@
+"""Test for the recent snapshot window."""
+import datetime
+
+import aiohttp
+import pytest
+
+from flightradar_client.consts import UPDATE_OK
+from flightradar_client.feed_entry import FeedEntry
+from flightradar_client.fr24feed_flights import FlightradarFlightsFeedAggregator
+from flightradar_client.window import SnapshotWindow
+from tests.utils import load_fixture
+
+HOME_COORDINATES = (-31.0, 151.0)
+
+
+def _entries(*external_ids):
+    """Create feed entries."""
+    return {
+        external_id: FeedEntry(HOME_COORDINATES, {"mode_s": external_id})
+        for external_id in external_ids
+    }
+
+
+def _datetime(timestamp):
+    """Convert a timestamp into a datetime."""
+    return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc)
+
+
+def test_window():
+    """Test the window queries and expiry."""
+    window = SnapshotWindow(datetime.timedelta(minutes=5))
+    assert len(window) == 0
+    assert window.sightings("a") is None
+    window.add(_entries("a", "b"), now=1000.0)
+    window.add(_entries("b", "c"), now=1060.0)
+    latest = _entries("c")
+    window.add(latest, now=1120.0)
+    assert len(window) == 3
+    assert repr(window) == "<SnapshotWindow(duration=0:05:00, aircrafts=3)>"
+    assert window.seen_since(datetime.timedelta(minutes=1), now=1120.0) == [
+        "c",
+        "b",
+    ]
+    assert window.seen_since(datetime.timedelta(minutes=5), now=1120.0) == [
+        "c",
+        "b",
+        "a",
+    ]
+    assert window.last_state("c") is latest["c"]
+    assert window.sightings("b") == (_datetime(1000.0), _datetime(1060.0))
+    assert window.sightings("c") == (_datetime(1060.0), _datetime(1120.0))
+
+    # "a" expires first, "b" later.
+    window.add(None, now=1330.0)
+    assert "a" not in window
+    assert window.last_state("a") is None
+    assert list(window.seen_since(datetime.timedelta(hours=1), now=1330.0)) == [
+        "c",
+        "b",
+    ]
+    # Seen again after expiry starts a new sighting.
+    window.add(_entries("a"), now=1340.0)
+    assert window.sightings("a") == (_datetime(1340.0), _datetime(1340.0))
+
+    # A shorter duration drops older aircrafts immediately.
+    window.duration = datetime.timedelta(seconds=100)
+    assert window.duration == datetime.timedelta(seconds=100)
+    assert window.seen_since(datetime.timedelta(hours=1), now=1340.0) == ["a"]
+
+    # Time going backwards does not break the order.
+    window.add(_entries("d"), now=1300.0)
+    assert window.sightings("d") == (_datetime(1340.0), _datetime(1340.0))
+
+
+@pytest.mark.asyncio
+async def test_feed_aggregator_window(aresponses, event_loop):
+    """Test that the aggregator records all aircrafts received."""
+    for fixture in ("fr24feed-flights-1.json", "fr24feed-flights-3.json"):
+        aresponses.add(
+            "localhost:8754",
+            "/flights.json",
+            "get",
+            aresponses.Response(
+                text=load_fixture(fixture),
+                content_type="application/json",
+                status=200,
+            ),
+            match_querystring=True,
+        )
+
+    async with aiohttp.ClientSession(loop=event_loop) as websession:
+        feed_aggregator = FlightradarFlightsFeedAggregator(
+            HOME_COORDINATES,
+            websession,
+        )
+        assert feed_aggregator.window.duration == datetime.timedelta(minutes=10)
+        status, first = await feed_aggregator.update()
+        assert status == UPDATE_OK
+        status, second = await feed_aggregator.update()
+        assert status == UPDATE_OK
+        window = feed_aggregator.window
+        # Aircrafts no longer in the feed are still in the window.
+        assert set(first) - set(second)
+        assert set(first) | set(second) <= set(
+            window.seen_since(datetime.timedelta(minutes=10))
+        )
+        for external_id, entry in second.items():
+            assert window.last_state(external_id) is entry